@@ -0,0 +1,43 @@
+"""Add reporting materialized views
+
+Revision ID: 3c7f2a9d1e54
+Revises: a93c5e1d7b20
+Create Date: 2026-10-19 18:41:07.392518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c7f2a9d1e54'
+down_revision: Union[str, None] = 'a93c5e1d7b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Category and unassigned staff are 0 rather than NULL so every row is matched by
+    # the unique index that REFRESH MATERIALIZED VIEW CONCURRENTLY requires
+    op.execute("""
+        CREATE MATERIALIZED VIEW report_daily_service_stats AS
+        SELECT (a.appointment_time AT TIME ZONE 'UTC')::date AS day,
+               a.service_id,
+               coalesce(s.category_id, 0) AS category_id,
+               coalesce(a.staff_id, 0) AS staff_id,
+               count(*) AS bookings,
+               count(*) FILTER (WHERE a.status = 'CANCELLED') AS cancellations,
+               count(*) FILTER (WHERE a.status = 'COMPLETED') AS completions,
+               coalesce(sum(s.price) FILTER (WHERE a.status = 'COMPLETED'), 0) AS revenue,
+               coalesce(sum(s.duration_minutes) FILTER (WHERE a.status IS DISTINCT FROM 'CANCELLED'), 0) AS booked_minutes
+        FROM appointments a
+        JOIN services s ON s.id = a.service_id
+        GROUP BY 1, 2, 3, 4
+    """)
+    op.create_index('ux_report_daily_service_stats', 'report_daily_service_stats', ['day', 'service_id', 'staff_id'], unique=True)
+    op.create_index('ix_report_daily_service_stats_staff', 'report_daily_service_stats', ['staff_id', 'day'])
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW report_daily_service_stats")
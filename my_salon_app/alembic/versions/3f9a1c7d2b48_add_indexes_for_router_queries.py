@@ -0,0 +1,38 @@
+"""Add indexes for router queries
+
+Revision ID: 3f9a1c7d2b48
+Revises: e9ebb5a910cb
+Create Date: 2026-10-19 09:12:44.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a1c7d2b48'
+down_revision: Union[str, None] = 'e9ebb5a910cb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_appointments_appointment_time', 'appointments', ['appointment_time']),
+    ('ix_appointments_customer_id', 'appointments', ['customer_id']),
+    ('ix_appointments_service_id', 'appointments', ['service_id']),
+    ('ix_appointments_staff_id', 'appointments', ['staff_id']),
+    ('ix_feedback_customer_id', 'feedback', ['customer_id']),
+]
+
+
+def upgrade() -> None:
+    # Build the indexes without blocking writes on large tables
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,44 @@
+"""Customer preferences as JSONB
+
+Revision ID: 5a8e3c1f9d62
+Revises: c2d7a91e5f36
+Create Date: 2026-10-19 16:12:45.903318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a8e3c1f9d62'
+down_revision: Union[str, None] = 'c2d7a91e5f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Rewrites the table under an exclusive lock; plan it for a quiet period on large tables
+    op.alter_column(
+        'customers', 'preferences',
+        existing_type=sa.JSON(), type_=postgresql.JSONB(), postgresql_using='preferences::jsonb'
+    )
+    # jsonb_path_ops only supports containment, which is what the preference filters use,
+    # and is smaller and faster than the default operator class
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_customers_preferences', 'customers', ['preferences'],
+            postgresql_using='gin', postgresql_ops={'preferences': 'jsonb_path_ops'},
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_customers_preferences', table_name='customers', postgresql_concurrently=True)
+    op.alter_column(
+        'customers', 'preferences',
+        existing_type=postgresql.JSONB(), type_=sa.JSON(), postgresql_using='preferences::json'
+    )
@@ -0,0 +1,59 @@
+"""Add appointment price snapshot
+
+Revision ID: 5e2b8d4f7a91
+Revises: 3c7f2a9d1e54
+Create Date: 2026-10-19 19:15:52.804163
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2b8d4f7a91'
+down_revision: Union[str, None] = '3c7f2a9d1e54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+REPORT_VIEW = """
+    CREATE MATERIALIZED VIEW report_daily_service_stats AS
+    SELECT (a.appointment_time AT TIME ZONE 'UTC')::date AS day,
+           a.service_id,
+           coalesce(s.category_id, 0) AS category_id,
+           coalesce(a.staff_id, 0) AS staff_id,
+           count(*) AS bookings,
+           count(*) FILTER (WHERE a.status = 'CANCELLED') AS cancellations,
+           count(*) FILTER (WHERE a.status = 'COMPLETED') AS completions,
+           coalesce(sum({revenue}) FILTER (WHERE a.status = 'COMPLETED'), 0) AS revenue,
+           coalesce(sum({minutes}) FILTER (WHERE a.status IS DISTINCT FROM 'CANCELLED'), 0) AS booked_minutes
+    FROM appointments a
+    JOIN services s ON s.id = a.service_id
+    GROUP BY 1, 2, 3, 4
+"""
+
+
+def create_report_view(revenue: str, minutes: str) -> None:
+    op.execute("DROP MATERIALIZED VIEW report_daily_service_stats")
+    op.execute(REPORT_VIEW.format(revenue=revenue, minutes=minutes))
+    op.create_index('ux_report_daily_service_stats', 'report_daily_service_stats', ['day', 'service_id', 'staff_id'], unique=True)
+    op.create_index('ix_report_daily_service_stats_staff', 'report_daily_service_stats', ['staff_id', 'day'])
+
+
+def upgrade() -> None:
+    # Nullable columns and a constant default are catalog-only changes, so the table is
+    # not rewritten; existing rows are filled by scripts/backfill_price_snapshots.py
+    op.add_column('appointments', sa.Column('price_at_booking', sa.Float(), nullable=True))
+    op.add_column('appointments', sa.Column('duration_at_booking', sa.Integer(), nullable=True))
+    op.add_column('appointments', sa.Column('discount_percent', sa.Float(), server_default='0', nullable=False))
+
+    # Revenue and booked minutes now come from the snapshot; services only supply the category
+    create_report_view("a.price_at_booking * (1 - a.discount_percent / 100)", "a.duration_at_booking")
+
+
+def downgrade() -> None:
+    create_report_view("s.price", "s.duration_minutes")
+    op.drop_column('appointments', 'discount_percent')
+    op.drop_column('appointments', 'duration_at_booking')
+    op.drop_column('appointments', 'price_at_booking')
@@ -0,0 +1,34 @@
+"""Add unscored feedback index
+
+Revision ID: 7d2f6b84e0c1
+Revises: e4b19f07c3a8
+Create Date: 2026-10-19 17:20:52.641087
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2f6b84e0c1'
+down_revision: Union[str, None] = 'e4b19f07c3a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Only rows waiting for the sentiment pipeline are indexed, so the index stays
+    # small once the history has been backfilled
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_feedback_unscored', 'feedback', ['id'],
+            postgresql_where=sa.text('sentiment_score IS NULL AND comments IS NOT NULL'),
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_feedback_unscored', table_name='feedback', postgresql_concurrently=True)
@@ -0,0 +1,38 @@
+"""Add snapshot watermark indexes
+
+Revision ID: 8b5d0e2f4a17
+Revises: 3f9a1c7d2b48
+Create Date: 2026-10-19 14:03:27.559120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b5d0e2f4a17'
+down_revision: Union[str, None] = '3f9a1c7d2b48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Incremental snapshots read rows changed since the last watermark; the expressions
+# must match app.snapshots.watermark_column for the planner to use them
+INDEXES = [
+    ('ix_appointments_watermark', 'appointments', [sa.text('coalesce(updated_at, created_at)')]),
+    ('ix_customers_watermark', 'customers', [sa.text('coalesce(updated_at, created_at)')]),
+    ('ix_feedback_created_at', 'feedback', ['created_at']),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,68 @@
+"""Add promotion redemptions
+
+Revision ID: 9c4e1f6a2d83
+Revises: b61d4e8a2f07
+Create Date: 2026-10-19 20:37:12.508194
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4e1f6a2d83'
+down_revision: Union[str, None] = 'b61d4e8a2f07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('promotions', sa.Column('max_redemptions', sa.Integer(), nullable=True))
+    op.add_column('promotions', sa.Column('max_redemptions_per_customer', sa.Integer(), nullable=True))
+    op.add_column('promotions', sa.Column('redemption_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.create_table(
+        'promotion_redemptions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('promotion_id', sa.Integer(), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('appointment_id', sa.Integer(), nullable=False),
+        sa.Column('discount_percent', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['promotion_id'], ['promotions.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['appointment_id'], ['appointments.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('appointment_id')
+    )
+    op.create_index(op.f('ix_promotion_redemptions_id'), 'promotion_redemptions', ['id'], unique=False)
+    op.create_index(op.f('ix_promotion_redemptions_promotion_id'), 'promotion_redemptions', ['promotion_id'], unique=False)
+    op.create_index(op.f('ix_promotion_redemptions_customer_id'), 'promotion_redemptions', ['customer_id'], unique=False)
+
+    op.create_table(
+        'promotion_customer_redemptions',
+        sa.Column('promotion_id', sa.Integer(), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('redemptions', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['promotion_id'], ['promotions.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('promotion_id', 'customer_id')
+    )
+    op.create_index(
+        op.f('ix_promotion_customer_redemptions_customer_id'), 'promotion_customer_redemptions', ['customer_id'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_promotion_customer_redemptions_customer_id'), table_name='promotion_customer_redemptions')
+    op.drop_table('promotion_customer_redemptions')
+    op.drop_index(op.f('ix_promotion_redemptions_customer_id'), table_name='promotion_redemptions')
+    op.drop_index(op.f('ix_promotion_redemptions_promotion_id'), table_name='promotion_redemptions')
+    op.drop_index(op.f('ix_promotion_redemptions_id'), table_name='promotion_redemptions')
+    op.drop_table('promotion_redemptions')
+    op.drop_column('promotions', 'redemption_count')
+    op.drop_column('promotions', 'max_redemptions_per_customer')
+    op.drop_column('promotions', 'max_redemptions')
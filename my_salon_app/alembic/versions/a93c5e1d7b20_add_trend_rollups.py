@@ -0,0 +1,52 @@
+"""Add trend rollups
+
+Revision ID: a93c5e1d7b20
+Revises: 7d2f6b84e0c1
+Create Date: 2026-10-19 18:02:44.615209
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a93c5e1d7b20'
+down_revision: Union[str, None] = '7d2f6b84e0c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'trend_rollups',
+        sa.Column('granularity', sa.String(), nullable=False),
+        sa.Column('dimension', sa.String(), nullable=False),
+        sa.Column('key', sa.Integer(), nullable=False),
+        sa.Column('bucket', sa.Date(), nullable=False),
+        sa.Column('bookings', sa.Integer(), nullable=False),
+        sa.Column('cancellations', sa.Integer(), nullable=False),
+        sa.Column('completions', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.Column('rating_count', sa.Integer(), nullable=False),
+        sa.Column('rating_sum', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('granularity', 'dimension', 'key', 'bucket')
+    )
+    op.create_table(
+        'rollup_dirty_days',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('marked_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('day')
+    )
+
+    # Queue every existing day; the refresh (or scripts/refresh_rollups.py) fills the rollups
+    op.execute("""
+        INSERT INTO rollup_dirty_days (day)
+        SELECT DISTINCT (appointment_time AT TIME ZONE 'UTC')::date FROM appointments
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('rollup_dirty_days')
+    op.drop_table('trend_rollups')
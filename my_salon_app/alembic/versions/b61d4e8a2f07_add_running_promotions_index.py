@@ -0,0 +1,35 @@
+"""Add running promotions index
+
+Revision ID: b61d4e8a2f07
+Revises: 5e2b8d4f7a91
+Create Date: 2026-10-19 19:48:31.276940
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b61d4e8a2f07'
+down_revision: Union[str, None] = '5e2b8d4f7a91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Switched-off promotions are not indexed, and past ones sort before every
+    # "ends after now" range scan, so lookups only read running and upcoming rows
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_promotions_running', 'promotions',
+            [sa.text("coalesce(end_date, 'infinity'::timestamptz)"), 'start_date'],
+            postgresql_where=sa.text('is_active'),
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_promotions_running', table_name='promotions', postgresql_concurrently=True)
@@ -0,0 +1,75 @@
+"""Add loyalty ledger
+
+Revision ID: c2d7a91e5f36
+Revises: 8b5d0e2f4a17
+Create Date: 2026-10-19 15:41:08.214653
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2d7a91e5f36'
+down_revision: Union[str, None] = '8b5d0e2f4a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'loyalty_transactions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('appointment_id', sa.Integer(), nullable=True),
+        sa.Column('type', sa.Enum('ACCRUAL', 'REDEMPTION', 'ADJUSTMENT', 'EXPIRY', name='loyaltytransactiontype'), nullable=False),
+        sa.Column('points', sa.Integer(), nullable=False),
+        sa.Column('note', sa.Text(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('expired_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['appointment_id'], ['appointments.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_loyalty_transactions_id'), 'loyalty_transactions', ['id'], unique=False)
+    op.create_index(op.f('ix_loyalty_transactions_customer_id'), 'loyalty_transactions', ['customer_id'], unique=False)
+    op.create_index(
+        'uq_loyalty_transactions_accrual', 'loyalty_transactions', ['appointment_id'],
+        unique=True, postgresql_where=sa.text("type = 'ACCRUAL'")
+    )
+    op.create_index(
+        'ix_loyalty_transactions_expiring', 'loyalty_transactions', ['expires_at'],
+        postgresql_where=sa.text("type = 'ACCRUAL' AND expired_at IS NULL AND expires_at IS NOT NULL")
+    )
+
+    # Balances become the sum of the ledger and can no longer be NULL
+    op.execute("UPDATE customers SET loyalty_points = 0 WHERE loyalty_points IS NULL")
+    op.alter_column('customers', 'loyalty_points', existing_type=sa.Integer(), nullable=False, server_default='0')
+
+    # Open the ledger with the existing balances, and mark appointments completed so far
+    # as accrued so the batch job does not credit them a second time
+    op.execute("""
+        INSERT INTO loyalty_transactions (customer_id, type, points, note)
+        SELECT id, 'ADJUSTMENT', loyalty_points, 'Opening balance'
+        FROM customers
+        WHERE loyalty_points <> 0
+    """)
+    op.execute("""
+        INSERT INTO loyalty_transactions (customer_id, appointment_id, type, points, note)
+        SELECT customer_id, id, 'ACCRUAL', 0, 'Included in the opening balance'
+        FROM appointments
+        WHERE status = 'COMPLETED'
+    """)
+
+
+def downgrade() -> None:
+    op.alter_column('customers', 'loyalty_points', existing_type=sa.Integer(), nullable=True, server_default=None)
+    op.drop_index('ix_loyalty_transactions_expiring', table_name='loyalty_transactions')
+    op.drop_index('uq_loyalty_transactions_accrual', table_name='loyalty_transactions')
+    op.drop_index(op.f('ix_loyalty_transactions_customer_id'), table_name='loyalty_transactions')
+    op.drop_index(op.f('ix_loyalty_transactions_id'), table_name='loyalty_transactions')
+    op.drop_table('loyalty_transactions')
+    sa.Enum(name='loyaltytransactiontype').drop(op.get_bind())
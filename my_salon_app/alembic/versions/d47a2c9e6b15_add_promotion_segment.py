@@ -0,0 +1,26 @@
+"""Add promotion segment
+
+Revision ID: d47a2c9e6b15
+Revises: 9c4e1f6a2d83
+Create Date: 2026-10-19 21:14:52.631870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd47a2c9e6b15'
+down_revision: Union[str, None] = '9c4e1f6a2d83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('promotions', sa.Column('segment', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('promotions', 'segment')
@@ -0,0 +1,58 @@
+"""Add rating aggregates
+
+Revision ID: e4b19f07c3a8
+Revises: 5a8e3c1f9d62
+Create Date: 2026-10-19 16:48:19.027731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b19f07c3a8'
+down_revision: Union[str, None] = '5a8e3c1f9d62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'rating_aggregates',
+        sa.Column('dimension', sa.String(), nullable=False),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('rating_count', sa.Integer(), nullable=False),
+        sa.Column('rating_sum', sa.Integer(), nullable=False),
+        sa.Column('rating_1', sa.Integer(), nullable=False),
+        sa.Column('rating_2', sa.Integer(), nullable=False),
+        sa.Column('rating_3', sa.Integer(), nullable=False),
+        sa.Column('rating_4', sa.Integer(), nullable=False),
+        sa.Column('rating_5', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('dimension', 'key')
+    )
+
+    # Seed the aggregates from the existing feedback; from here on the API maintains them
+    op.execute("""
+        INSERT INTO rating_aggregates (dimension, key, rating_count, rating_sum, rating_1, rating_2, rating_3, rating_4, rating_5)
+        SELECT d.dimension, d.key, count(*), sum(f.rating),
+               count(*) FILTER (WHERE f.rating = 1), count(*) FILTER (WHERE f.rating = 2),
+               count(*) FILTER (WHERE f.rating = 3), count(*) FILTER (WHERE f.rating = 4),
+               count(*) FILTER (WHERE f.rating = 5)
+        FROM feedback f
+        JOIN appointments a ON a.id = f.appointment_id
+        CROSS JOIN LATERAL (VALUES
+            ('overall', ''),
+            ('staff', a.staff_id::text),
+            ('service', a.service_id::text),
+            ('day', (f.created_at AT TIME ZONE 'UTC')::date::text)
+        ) d(dimension, key)
+        WHERE d.key IS NOT NULL
+        GROUP BY d.dimension, d.key
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('rating_aggregates')
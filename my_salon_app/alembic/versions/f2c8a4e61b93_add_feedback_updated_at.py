@@ -0,0 +1,38 @@
+"""Add feedback updated_at
+
+Revision ID: f2c8a4e61b93
+Revises: d47a2c9e6b15
+Create Date: 2026-10-19 22:41:05.318274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8a4e61b93'
+down_revision: Union[str, None] = 'd47a2c9e6b15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Nullable without a default, so existing rows are not rewritten
+    op.add_column('feedback', sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+    # Edited feedback is now picked up by incremental snapshots, whose watermark
+    # must match app.snapshots.watermark_column for the planner to use the index
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_feedback_watermark', 'feedback', [sa.text('coalesce(updated_at, created_at)')],
+            postgresql_concurrently=True,
+        )
+        op.drop_index('ix_feedback_created_at', table_name='feedback', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_feedback_created_at', 'feedback', ['created_at'], postgresql_concurrently=True)
+        op.drop_index('ix_feedback_watermark', table_name='feedback', postgresql_concurrently=True)
+    op.drop_column('feedback', 'updated_at')
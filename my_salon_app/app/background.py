@@ -0,0 +1,41 @@
+import asyncio
+import contextlib
+import logging
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+class PeriodicTask:
+    """
+    Run an async callable every `interval` seconds on the event loop.
+
+    Failures are logged and the loop keeps going; an interval of 0 disables the task.
+    """
+
+    def __init__(self, name: str, func: Callable[[], Awaitable[None]], interval: float):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.func()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Background task %s failed", self.name)
+            await asyncio.sleep(self.interval)
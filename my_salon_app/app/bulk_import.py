@@ -0,0 +1,307 @@
+import asyncio
+import csv
+import enum
+import itertools
+import json
+import os
+import time
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from .database import raw_connection
+from .models import Appointment, Customer, Service, Staff
+from .schemas import AppointmentImport, CustomerCreate, ServiceCreate, StaffCreate
+
+# Rows validated and copied into the staging table per batch
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 10000))
+# Row errors listed in the import report; the total is always counted
+IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("IMPORT_MAX_REPORTED_ERRORS", 1000))
+
+IMPORT_FORMATS = ("csv", "ndjson")
+CONFLICT_ACTIONS = ("update", "skip")
+
+class ImportSpec:
+    """How rows of one entity are validated, checked in staging and merged into its table."""
+
+    def __init__(self, schema, model, conflict_key=None, unique=(), references=None, json_fields=(), balance=None, rollup_column=None, defaults=None):
+        self.schema = schema
+        self.table = model.__table__.name
+        self.columns = list(schema.model_fields)
+        # Natural key used for ON CONFLICT; without one every row is inserted
+        self.conflict_key = conflict_key
+        # Other unique columns that must not collide with existing rows
+        self.unique = unique
+        # Foreign key columns -> referenced table
+        self.references = references or {}
+        # Columns holding JSON, which CSV files carry as JSON text
+        self.json_fields = json_fields
+        # Loyalty balance column: opened in the ledger on insert and left alone on update,
+        # since balances only change through ledger entries
+        self.balance = balance
+        # Timestamp column whose UTC days are queued for the trend rollups refresh
+        self.rollup_column = rollup_column
+        # Column -> SQL expression over the staged row ("staged") filling a missing value
+        self.defaults = defaults or {}
+
+IMPORTS = {
+    "customers": ImportSpec(
+        CustomerCreate,
+        Customer,
+        conflict_key="phone",
+        unique=("email",),
+        json_fields=("preferences",),
+        balance="loyalty_points",
+    ),
+    "services": ImportSpec(
+        ServiceCreate, Service, conflict_key="name", references={"category_id": "service_categories"}
+    ),
+    "staff": ImportSpec(StaffCreate, Staff, json_fields=("skills",)),
+    "appointments": ImportSpec(
+        AppointmentImport,
+        Appointment,
+        references={"customer_id": "customers", "service_id": "services", "staff_id": "staff"},
+        rollup_column="appointment_time",
+        defaults={
+            "price_at_booking": "(SELECT price FROM services WHERE services.id = staged.service_id)",
+            "duration_at_booking": "(SELECT duration_minutes FROM services WHERE services.id = staged.service_id)",
+        },
+    ),
+}
+
+def import_format(filename: Optional[str]) -> str:
+    """Guess the format from a file name, defaulting to CSV."""
+    name = (filename or "").lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return "ndjson" if name.endswith((".ndjson", ".jsonl")) else "csv"
+
+def read_records(file: IO[str], format: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Yield (row, record) pairs from a text stream.
+
+    `row` is the data row for CSV (header excluded) and the line number for NDJSON.
+    NDJSON lines are decoded during validation so a bad line becomes a row error.
+    """
+    if format == "csv":
+        yield from enumerate(csv.DictReader(file), start=1)
+    else:
+        for line_number, line in enumerate(file, start=1):
+            if line.strip():
+                yield line_number, line
+
+def describe(error: Exception) -> List[str]:
+    if isinstance(error, ValidationError):
+        return [f"{'.'.join(str(part) for part in e['loc']) or 'row'}: {e['msg']}" for e in error.errors()]
+    return [str(error)]
+
+def db_value(value):
+    # Enums are stored by name and JSON columns as JSON text, as the ORM does
+    if isinstance(value, enum.Enum):
+        return value.name
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+def validate_batch(spec: ImportSpec, batch: List[Tuple[int, Any]]) -> Tuple[List[tuple], List[Dict[str, Any]]]:
+    """Validate raw records against the entity schema; return staging tuples and row errors."""
+    records, errors = [], []
+    for row, raw in batch:
+        try:
+            if isinstance(raw, str):
+                data = json.loads(raw)
+            else:
+                # CSV cells are strings: empty cells are missing values
+                data = {key: value for key, value in raw.items() if key is not None and value != ""}
+                for field in spec.json_fields:
+                    if field in data:
+                        data[field] = json.loads(data[field])
+            item = spec.schema.model_validate(data)
+        except ValueError as e:
+            # ValidationError and JSONDecodeError are both ValueErrors
+            errors.append({"row": row, "errors": describe(e)})
+            continue
+        records.append((row, *(db_value(getattr(item, column)) for column in spec.columns)))
+    return records, errors
+
+def next_batch(records: Iterator[Tuple[int, Any]], spec: ImportSpec):
+    batch = list(itertools.islice(records, IMPORT_BATCH_SIZE))
+    return len(batch), validate_batch(spec, batch)
+
+def staging_checks(spec: ImportSpec, staging: str) -> List[Tuple[str, str]]:
+    """Set-based checks run on the staging table: (query returning source_row, error message)."""
+    checks = []
+    key = spec.conflict_key
+    if key:
+        checks.append((f"""
+            SELECT source_row FROM (
+                SELECT source_row, row_number() OVER (PARTITION BY {key} ORDER BY source_row DESC) AS position
+                FROM {staging}
+            ) ranked WHERE position > 1
+        """, f"duplicate {key} in import; superseded by a later row"))
+    for column in spec.unique:
+        checks.append((f"""
+            SELECT source_row FROM (
+                SELECT source_row, count(*) OVER (PARTITION BY {column}) AS copies
+                FROM {staging} WHERE {column} IS NOT NULL
+            ) counted WHERE copies > 1
+        """, f"duplicate {column} in import"))
+        other_row = f"existing.{key} <> staged.{key}" if key else "true"
+        checks.append((f"""
+            SELECT staged.source_row FROM {staging} staged
+            JOIN {spec.table} existing ON existing.{column} = staged.{column}
+            WHERE {other_row}
+        """, f"{column} already belongs to another row in {spec.table}"))
+    for column, table in spec.references.items():
+        checks.append((f"""
+            SELECT source_row FROM {staging} staged
+            WHERE {column} IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {table} WHERE {table}.id = staged.{column})
+        """, f"{column} does not exist in {table}"))
+    return checks
+
+async def reject_invalid(conn, spec: ImportSpec, staging: str) -> List[Dict[str, Any]]:
+    """Report staged rows that would violate a constraint and remove them before the merge."""
+    errors = []
+    for query, message in staging_checks(spec, staging):
+        rows = [record["source_row"] for record in await conn.fetch(query)]
+        if rows:
+            await conn.execute(f"DELETE FROM {staging} WHERE source_row = ANY($1::integer[])", rows)
+            errors += [{"row": row, "errors": [message]} for row in rows]
+    return errors
+
+async def merge(conn, spec: ImportSpec, staging: str, on_conflict: str) -> Dict[str, int]:
+    """Insert the staged rows in one statement, upserting or skipping on the natural key."""
+    columns = ", ".join(spec.columns)
+    values = ", ".join(
+        f"coalesce(staged.{column}, {spec.defaults[column]})" if column in spec.defaults else f"staged.{column}"
+        for column in spec.columns
+    )
+    conflict = ""
+    if spec.conflict_key and on_conflict == "skip":
+        conflict = f"ON CONFLICT ({spec.conflict_key}) DO NOTHING"
+    elif spec.conflict_key:
+        updates = ", ".join(
+            f"{column} = EXCLUDED.{column}"
+            for column in spec.columns
+            if column not in (spec.conflict_key, spec.balance)
+        )
+        conflict = f"ON CONFLICT ({spec.conflict_key}) DO UPDATE SET {updates}, updated_at = now()"
+
+    returning = "xmax = 0 AS inserted"
+    ctes = ""
+    if spec.balance:
+        returning += f", id, {spec.balance} AS balance"
+        ctes += """
+        , opened AS (
+            INSERT INTO loyalty_transactions (customer_id, type, points, note)
+            SELECT id, 'ADJUSTMENT', balance, 'Opening balance'
+            FROM merged WHERE inserted AND balance <> 0
+        )"""
+    if spec.rollup_column:
+        returning += f", {spec.rollup_column} AS rollup_time"
+        ctes += """
+        , dirtied AS (
+            INSERT INTO rollup_dirty_days (day)
+            SELECT DISTINCT (rollup_time AT TIME ZONE 'UTC')::date FROM merged
+            ON CONFLICT (day) DO UPDATE SET marked_at = now()
+        )"""
+
+    # xmax is 0 for freshly inserted tuples and set for rows updated by ON CONFLICT
+    result = await conn.fetchrow(f"""
+        WITH merged AS (
+            INSERT INTO {spec.table} ({columns})
+            SELECT {values} FROM {staging} staged ORDER BY source_row
+            {conflict}
+            RETURNING {returning}
+        ){ctes}
+        SELECT
+            count(*) FILTER (WHERE inserted) AS inserted,
+            count(*) FILTER (WHERE NOT inserted) AS updated,
+            (SELECT count(*) FROM {staging}) AS staged
+        FROM merged
+    """)
+    return {
+        "inserted": result["inserted"],
+        "updated": result["updated"],
+        "skipped": result["staged"] - result["inserted"] - result["updated"],
+    }
+
+async def import_records(
+    entity: str,
+    file: IO[str],
+    format: str = "csv",
+    on_conflict: str = "update",
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """
+    Import CSV or NDJSON rows of `entity` from a text stream.
+
+    The stream is read and validated in batches in a worker thread while the
+    previous batch is copied into a temporary staging table with COPY. Constraint
+    checks and the merge into the real table are then single set-based statements.
+    Invalid rows are skipped and reported; everything else is committed in one
+    transaction, or rolled back with `dry_run`.
+    """
+    if entity not in IMPORTS:
+        raise ValueError(f"Unknown import entity '{entity}'; expected one of: {', '.join(IMPORTS)}")
+    if format not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format '{format}'; expected one of: {', '.join(IMPORT_FORMATS)}")
+    if on_conflict not in CONFLICT_ACTIONS:
+        raise ValueError(f"Unsupported conflict action '{on_conflict}'; expected one of: {', '.join(CONFLICT_ACTIONS)}")
+
+    spec = IMPORTS[entity]
+    staging = f"import_{spec.table}"
+    records = read_records(file, format)
+    started = time.perf_counter()
+    total_rows = 0
+    errors: List[Dict[str, Any]] = []
+
+    async with raw_connection() as conn:
+        transaction = conn.transaction()
+        await transaction.start()
+        pending = None
+        try:
+            await conn.execute(
+                f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+                f"SELECT {', '.join(spec.columns)} FROM {spec.table} WITH NO DATA"
+            )
+            await conn.execute(f"ALTER TABLE {staging} ADD COLUMN source_row integer")
+
+            pending = asyncio.ensure_future(asyncio.to_thread(next_batch, records, spec))
+            while True:
+                size, (valid, batch_errors) = await pending
+                if not size:
+                    break
+                # Parse and validate the next batch while this one is copied
+                pending = asyncio.ensure_future(asyncio.to_thread(next_batch, records, spec))
+                total_rows += size
+                errors += batch_errors
+                if valid:
+                    await conn.copy_records_to_table(staging, records=valid, columns=["source_row", *spec.columns])
+            pending = None
+
+            errors += await reject_invalid(conn, spec, staging)
+            counts = await merge(conn, spec, staging, on_conflict)
+        except BaseException:
+            if pending is not None:
+                pending.cancel()
+            await transaction.rollback()
+            raise
+
+        if dry_run:
+            await transaction.rollback()
+        else:
+            await transaction.commit()
+
+    elapsed = time.perf_counter() - started
+    errors.sort(key=lambda error: error["row"])
+    return {
+        "entity": entity,
+        "dry_run": dry_run,
+        "rows": total_rows,
+        **counts,
+        "error_count": len(errors),
+        "errors": errors[:IMPORT_MAX_REPORTED_ERRORS],
+        "duration_ms": round(elapsed * 1000, 2),
+        "rows_per_second": round(total_rows / elapsed) if elapsed else None,
+    }
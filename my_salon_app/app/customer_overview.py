@@ -0,0 +1,176 @@
+import itertools
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .models import Appointment, Customer, Feedback, Service, Staff
+
+# Seconds a cached overview is served; bounds staleness for writes made by other
+# workers or scripts, which this process cannot see
+OVERVIEW_CACHE_TTL_SECONDS = float(os.getenv("OVERVIEW_CACHE_TTL_SECONDS", 30))
+# Overviews kept in memory per process (least recently used are evicted)
+OVERVIEW_CACHE_SIZE = int(os.getenv("OVERVIEW_CACHE_SIZE", 10000))
+
+# session.info key collecting the customers whose overview a transaction changes
+PENDING_KEY = "overview_changed_customers"
+# Marker for changes that affect every overview, such as a renamed service
+ALL_CUSTOMERS = object()
+
+# Profile, visit statistics, rating and both appointment lists in one round trip.
+# Enum columns are stored by name, so they are lowercased to the API values.
+OVERVIEW_QUERY = text("""
+    SELECT
+        c.id, c.name, c.phone, c.email, lower(c.type::text) AS type, c.preferences,
+        coalesce(c.loyalty_points, 0) AS loyalty_points, c.created_at, c.updated_at,
+        visits.lifetime_visits, visits.total_spend, visits.last_visit_at,
+        ratings.average_rating, ratings.feedback_count,
+        coalesce(upcoming.items, '[]'::json) AS upcoming_appointments,
+        coalesce(recent.items, '[]'::json) AS recent_appointments
+    FROM customers c
+    CROSS JOIN LATERAL (
+        SELECT
+            count(*) AS lifetime_visits,
+            coalesce(sum(a.price_at_booking * (1 - a.discount_percent / 100)), 0)::float AS total_spend,
+            max(a.appointment_time) AS last_visit_at
+        FROM appointments a
+        WHERE a.customer_id = c.id AND a.status = 'COMPLETED'
+    ) visits
+    CROSS JOIN LATERAL (
+        SELECT avg(f.rating)::float AS average_rating, count(*) AS feedback_count
+        FROM feedback f
+        WHERE f.customer_id = c.id
+    ) ratings
+    LEFT JOIN LATERAL (
+        SELECT json_agg(item ORDER BY item.appointment_time) AS items
+        FROM (
+            SELECT a.id, a.appointment_time, lower(a.status::text) AS status, a.notes,
+                   a.service_id, s.name AS service_name, s.duration_minutes,
+                   a.staff_id, st.name AS staff_name, NULL::integer AS rating
+            FROM appointments a
+            JOIN services s ON s.id = a.service_id
+            LEFT JOIN staff st ON st.id = a.staff_id
+            WHERE a.customer_id = c.id AND a.status = 'UPCOMING' AND a.appointment_time >= now()
+            ORDER BY a.appointment_time
+            LIMIT :limit
+        ) item
+    ) upcoming ON true
+    LEFT JOIN LATERAL (
+        SELECT json_agg(item ORDER BY item.appointment_time DESC) AS items
+        FROM (
+            SELECT a.id, a.appointment_time, lower(a.status::text) AS status, a.notes,
+                   a.service_id, s.name AS service_name, s.duration_minutes,
+                   a.staff_id, st.name AS staff_name, f.rating
+            FROM appointments a
+            JOIN services s ON s.id = a.service_id
+            LEFT JOIN staff st ON st.id = a.staff_id
+            LEFT JOIN feedback f ON f.appointment_id = a.id
+            WHERE a.customer_id = c.id AND a.appointment_time < now()
+            ORDER BY a.appointment_time DESC
+            LIMIT :limit
+        ) item
+    ) recent ON true
+    WHERE c.id = :customer_id
+""")
+
+CUSTOMER_FIELDS = ("id", "name", "phone", "email", "type", "preferences", "loyalty_points", "created_at", "updated_at")
+
+class OverviewCache:
+    """
+    Per-process LRU cache of customer overviews with a TTL.
+
+    Entries are dropped when a committed transaction touches the customer, its
+    appointments or its feedback, and all entries when services or staff change.
+    """
+
+    def __init__(self, ttl: float = OVERVIEW_CACHE_TTL_SECONDS, size: int = OVERVIEW_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._entries: "OrderedDict[Tuple[int, int], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, customer_id: int, limit: int) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get((customer_id, limit))
+        if entry is None:
+            return None
+        expires_at, overview = entry
+        if expires_at < time.monotonic():
+            del self._entries[(customer_id, limit)]
+            return None
+        self._entries.move_to_end((customer_id, limit))
+        return overview
+
+    def set(self, customer_id: int, limit: int, overview: Dict[str, Any]):
+        if self.ttl <= 0:
+            return
+        self._entries[(customer_id, limit)] = (time.monotonic() + self.ttl, overview)
+        self._entries.move_to_end((customer_id, limit))
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, customer_ids: Iterable):
+        customer_ids = set(customer_ids)
+        if ALL_CUSTOMERS in customer_ids:
+            self._entries.clear()
+            return
+        for key in [key for key in self._entries if key[0] in customer_ids]:
+            del self._entries[key]
+
+overview_cache = OverviewCache()
+
+async def get_customer_overview(db: AsyncSession, customer_id: int, limit: int) -> Optional[Dict[str, Any]]:
+    """Return the overview of a customer, from the cache when possible; None if it does not exist."""
+    overview = overview_cache.get(customer_id, limit)
+    if overview is not None:
+        return overview
+
+    result = await db.execute(OVERVIEW_QUERY, {"customer_id": customer_id, "limit": limit})
+    row = result.mappings().first()
+    if row is None:
+        return None
+    overview = {
+        "customer": {field: row[field] for field in CUSTOMER_FIELDS},
+        "upcoming_appointments": row["upcoming_appointments"],
+        "recent_appointments": row["recent_appointments"],
+        "lifetime_visits": row["lifetime_visits"],
+        "total_spend": row["total_spend"],
+        "last_visit_at": row["last_visit_at"],
+        "average_rating": row["average_rating"],
+        "feedback_count": row["feedback_count"],
+        "loyalty_points": row["loyalty_points"],
+    }
+    overview_cache.set(customer_id, limit, overview)
+    return overview
+
+def mark_customers_changed(session, customer_ids: Iterable[int]):
+    """
+    Record customers changed outside the ORM unit of work, e.g. by bulk UPDATE
+    statements, so their overviews are invalidated when the session commits.
+    """
+    session.info.setdefault(PENDING_KEY, set()).update(customer_ids)
+
+@event.listens_for(Session, "after_flush")
+def _collect_overview_changes(session, flush_context):
+    changed = session.info.setdefault(PENDING_KEY, set())
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Customer):
+            changed.add(obj.id)
+        elif isinstance(obj, (Appointment, Feedback)):
+            # Both the new and, if it was re-pointed, the previous customer are affected
+            changed.add(obj.customer_id)
+            changed.update(inspect(obj).attrs.customer_id.history.deleted)
+        elif isinstance(obj, (Service, Staff)):
+            changed.add(ALL_CUSTOMERS)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_overviews(session):
+    changed = session.info.pop(PENDING_KEY, None)
+    if changed:
+        overview_cache.invalidate(changed)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_overview_changes(session):
+    session.info.pop(PENDING_KEY, None)
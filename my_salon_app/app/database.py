@@ -1,7 +1,9 @@
 import os
+from contextlib import asynccontextmanager
 from urllib.parse import urlparse
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, declarative_base
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -11,23 +13,107 @@ load_dotenv()
 tmpPostgres = urlparse(os.getenv("DATABASE_URL"))
 DATABASE_URL = f"postgresql+asyncpg://{tmpPostgres.username}:{tmpPostgres.password}@{tmpPostgres.hostname}{tmpPostgres.path}?ssl=require"
 
-# Create async engine
-engine = create_async_engine(DATABASE_URL, echo=True)
+# Default statement timeout for every session in milliseconds (0 disables it)
+STATEMENT_TIMEOUT_MS = int(os.getenv("STATEMENT_TIMEOUT_MS", 0))
 
-# Create async session maker
-AsyncSessionLocal = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
+# SQLSTATE raised by Postgres when statement_timeout cancels a query
+QUERY_CANCELED_SQLSTATE = "57014"
+
+# Connection pool settings; run.py splits DB_MAX_CONNECTIONS across workers in production
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_ECHO = os.getenv("DB_ECHO", "true").lower() in ("1", "true", "yes")
 
 # Create Base class for declarative models
 Base = declarative_base()
 
+# The engine and session maker are created on first use, so importing the models
+# (Alembic, benchmarks, scripts that only need metadata) does not load the async
+# driver stack
+_engine = None
+_session_factory = None
+
+def get_engine():
+    """Return the process-wide async engine, creating it on first use."""
+    global _engine
+    if _engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        _engine = create_async_engine(
+            DATABASE_URL,
+            echo=DB_ECHO,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+        )
+    return _engine
+
+def get_session_factory():
+    """Return the async session maker bound to the engine, creating it on first use."""
+    global _session_factory
+    if _session_factory is None:
+        from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+        _session_factory = async_sessionmaker(
+            get_engine(),
+            class_=AsyncSession,
+            expire_on_commit=False,
+        )
+    return _session_factory
+
+def __getattr__(name):
+    # Keep `from app.database import engine, AsyncSessionLocal` working
+    if name == "engine":
+        return get_engine()
+    if name == "AsyncSessionLocal":
+        return get_session_factory()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+@asynccontextmanager
+async def raw_connection():
+    """
+    Yield the asyncpg connection behind a pooled connection.
+
+    Used for driver-level APIs such as COPY that SQLAlchemy does not expose.
+    """
+    async with get_engine().connect() as conn:
+        raw = await conn.get_raw_connection()
+        yield raw.driver_connection
+
+@event.listens_for(Session, "after_begin")
+def _apply_statement_timeout(session, transaction, connection):
+    # SET LOCAL only lasts for the current transaction, so re-apply it on every begin
+    timeout_ms = session.info.get("statement_timeout_ms")
+    if timeout_ms:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+def is_statement_timeout(exc: DBAPIError) -> bool:
+    """Return True if the database error was raised by statement_timeout."""
+    sqlstate = getattr(exc.orig, "sqlstate", None) or getattr(exc.orig, "pgcode", None)
+    return sqlstate == QUERY_CANCELED_SQLSTATE
+
 # Dependency to get DB session
 async def get_db():
-    async with AsyncSessionLocal() as session:
+    async with get_session_factory()() as session:
+        session.info["statement_timeout_ms"] = STATEMENT_TIMEOUT_MS
         try:
             yield session
         finally:
             await session.close()
+
+def get_db_with_timeout(route_name: str, default_ms: int):
+    """
+    Build a session dependency whose transactions run under a statement timeout.
+
+    The timeout can be overridden per route with STATEMENT_TIMEOUT_<ROUTE_NAME>_MS.
+    """
+    timeout_ms = int(os.getenv(f"STATEMENT_TIMEOUT_{route_name.upper()}_MS", default_ms))
+
+    async def _get_db():
+        async with get_session_factory()() as session:
+            session.info["statement_timeout_ms"] = timeout_ms
+            try:
+                yield session
+            finally:
+                await session.close()
+
+    return _get_db
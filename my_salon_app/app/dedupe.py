@@ -0,0 +1,265 @@
+import os
+import re
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .customer_overview import mark_customers_changed
+from .database import raw_connection
+from .models import Appointment, Customer, Feedback, LoyaltyTransaction
+from .redemptions import merge_redemptions
+from .segments import mark_customers_merged
+
+# Blocks with more customers than this are skipped: a very common name or a shared
+# reception phone number says little on its own and would produce quadratic pairs
+DEDUPE_MAX_BLOCK_SIZE = int(os.getenv("DEDUPE_MAX_BLOCK_SIZE", 100))
+# Customers read and blocking keys copied per round trip
+DEDUPE_CHUNK_ROWS = int(os.getenv("DEDUPE_CHUNK_ROWS", 50000))
+
+# MinHash over name trigrams: BANDS bands of ROWS_PER_BAND hashes each. Two names
+# with trigram similarity s share at least one band with probability 1 - (1 - s^2)^4
+BANDS = 4
+ROWS_PER_BAND = 2
+# Fixed (multiplier, offset) pairs so blocking keys are the same in every run
+HASH_PARAMS = [(2654435761 + 2 * i * 40503, 97 * i + 1) for i in range(BANDS * ROWS_PER_BAND)]
+
+# Weights of the pair score; a sum of at least the threshold counts as a match
+PHONE_WEIGHT = 0.45
+EMAIL_WEIGHT = 0.35
+NAME_WEIGHT = 0.35
+
+NON_DIGITS = re.compile(r"\D")
+NON_LETTERS = re.compile(r"[^a-z ]")
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    # Compare national numbers: "+1 (555) 000-1234" and "5550001234" are the same phone
+    digits = NON_DIGITS.sub("", phone or "")
+    return digits[-10:] if len(digits) >= 7 else None
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    email = (email or "").strip().lower()
+    return email or None
+
+def normalize_name(name: Optional[str]) -> str:
+    # Token order is ignored so "Smith John" matches "John Smith"
+    return " ".join(sorted(NON_LETTERS.sub(" ", (name or "").lower()).split()))
+
+def trigrams(name: str) -> set:
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def name_similarity(left: str, right: str) -> float:
+    """Trigram Jaccard similarity of two normalized names."""
+    a, b = trigrams(left), trigrams(right)
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def name_band_keys(name: str) -> List[str]:
+    """MinHash LSH band keys of a normalized name."""
+    if not name:
+        return []
+    hashes = [zlib.crc32(trigram.encode()) for trigram in trigrams(name)]
+    signature = [min((h * a + b) & 0xFFFFFFFF for h in hashes) for a, b in HASH_PARAMS]
+    return [
+        f"n{band}:" + "-".join(map(str, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]))
+        for band in range(BANDS)
+    ]
+
+def blocking_keys(name: str, phone: Optional[str], email: Optional[str]) -> Iterator[str]:
+    phone_key = normalize_phone(phone)
+    if phone_key:
+        yield f"p:{phone_key}"
+    email_key = normalize_email(email)
+    if email_key:
+        yield f"e:{email_key}"
+    yield from name_band_keys(normalize_name(name))
+
+def score_pair(left: Tuple, right: Tuple) -> Tuple[float, List[str]]:
+    """Score two (name, phone, email) tuples; return the score and the evidence used."""
+    score, reasons = 0.0, []
+    phone = normalize_phone(left[1])
+    if phone and phone == normalize_phone(right[1]):
+        score += PHONE_WEIGHT
+        reasons.append("phone")
+    email = normalize_email(left[2])
+    if email and email == normalize_email(right[2]):
+        score += EMAIL_WEIGHT
+        reasons.append("email")
+    similarity = name_similarity(normalize_name(left[0]), normalize_name(right[0]))
+    if similarity:
+        score += NAME_WEIGHT * similarity
+        reasons.append(f"name {similarity:.2f}")
+    return min(round(score, 3), 1.0), reasons
+
+def elapsed_ms(since: float) -> float:
+    return round((time.perf_counter() - since) * 1000, 2)
+
+class DisjointSet:
+    def __init__(self):
+        self.parent: Dict[int, int] = {}
+
+    def find(self, item: int) -> int:
+        self.parent.setdefault(item, item)
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, left: int, right: int):
+        left, right = self.find(left), self.find(right)
+        if left != right:
+            # The lowest id, i.e. the oldest record, stays the root and becomes the survivor
+            self.parent[max(left, right)] = min(left, right)
+
+async def find_duplicates(threshold: float = 0.6, max_block_size: int = DEDUPE_MAX_BLOCK_SIZE) -> Dict[str, Any]:
+    """
+    Find clusters of customers that are probably the same person.
+
+    Customers are streamed once to compute blocking keys (normalized phone, email and
+    name-trigram MinHash bands), which are copied into a temporary table. Postgres
+    then groups the keys and pairs up customers sharing a small block, so only
+    candidate pairs, never all n^2 pairs, are scored in Python.
+    """
+    started = time.perf_counter()
+    timings = {}
+    customers = 0
+    async with raw_connection() as conn:
+        async with conn.transaction():
+            await conn.execute("CREATE TEMP TABLE dedupe_keys (key text, customer_id integer) ON COMMIT DROP")
+            cursor = await conn.cursor("SELECT id, name, phone, email FROM customers")
+            while True:
+                rows = await cursor.fetch(DEDUPE_CHUNK_ROWS)
+                if not rows:
+                    break
+                customers += len(rows)
+                keys = [(key, row["id"]) for row in rows for key in blocking_keys(row["name"], row["phone"], row["email"])]
+                await conn.copy_records_to_table("dedupe_keys", records=keys, columns=["key", "customer_id"])
+            timings["blocking_ms"] = elapsed_ms(started)
+
+            pairing_started = time.perf_counter()
+            await conn.execute(f"""
+                CREATE TEMP TABLE dedupe_pairs ON COMMIT DROP AS
+                SELECT DISTINCT a.customer_id AS left_id, b.customer_id AS right_id
+                FROM dedupe_keys a
+                JOIN dedupe_keys b ON b.key = a.key AND b.customer_id > a.customer_id
+                WHERE a.key IN (
+                    SELECT key FROM dedupe_keys GROUP BY key HAVING count(*) BETWEEN 2 AND {int(max_block_size)}
+                )
+            """)
+            timings["pairing_ms"] = elapsed_ms(pairing_started)
+
+            scoring_started = time.perf_counter()
+            candidate_pairs = 0
+            matches = []
+            cursor = await conn.cursor("""
+                SELECT l.id AS left_id, l.name AS left_name, l.phone AS left_phone, l.email AS left_email,
+                       r.id AS right_id, r.name AS right_name, r.phone AS right_phone, r.email AS right_email
+                FROM dedupe_pairs p
+                JOIN customers l ON l.id = p.left_id
+                JOIN customers r ON r.id = p.right_id
+            """)
+            while True:
+                rows = await cursor.fetch(DEDUPE_CHUNK_ROWS)
+                if not rows:
+                    break
+                candidate_pairs += len(rows)
+                for row in rows:
+                    score, reasons = score_pair(
+                        (row["left_name"], row["left_phone"], row["left_email"]),
+                        (row["right_name"], row["right_phone"], row["right_email"]),
+                    )
+                    if score >= threshold:
+                        matches.append((row["left_id"], row["right_id"], score, reasons))
+            timings["scoring_ms"] = elapsed_ms(scoring_started)
+
+    clusters = DisjointSet()
+    for left_id, right_id, _, _ in matches:
+        clusters.union(left_id, right_id)
+    members: Dict[int, List[int]] = {}
+    for customer_id in clusters.parent:
+        members.setdefault(clusters.find(customer_id), []).append(customer_id)
+    pairs_by_cluster: Dict[int, List[Dict[str, Any]]] = {}
+    for left_id, right_id, score, reasons in matches:
+        pairs_by_cluster.setdefault(clusters.find(left_id), []).append(
+            {"left_id": left_id, "right_id": right_id, "score": score, "reasons": reasons}
+        )
+
+    return {
+        "customers": customers,
+        "candidate_pairs": candidate_pairs,
+        "matches": len(matches),
+        "clusters": [
+            {
+                "survivor_id": survivor_id,
+                "duplicate_ids": sorted(ids for ids in member_ids if ids != survivor_id),
+                "pairs": pairs_by_cluster[survivor_id],
+            }
+            for survivor_id, member_ids in sorted(members.items())
+        ],
+        "timings": timings,
+        "duration_ms": elapsed_ms(started),
+    }
+
+async def merge_customers(db: AsyncSession, survivor_id: int, duplicate_ids: Sequence[int]) -> Optional[Customer]:
+    """
+    Merge duplicate customers into the survivor within the session's transaction.
+
+    Appointments, feedback, loyalty ledger entries and promotion redemptions
+    are re-pointed, loyalty points summed, and missing email and preferences
+    filled from the duplicates, which are then deleted.
+    Returns None if any of the customers does not exist; the caller commits.
+    """
+    duplicate_ids = sorted(set(duplicate_ids))
+    ids = [survivor_id, *duplicate_ids]
+    # Lock in id order so concurrent merges touching the same customers cannot deadlock
+    result = await db.execute(select(Customer).filter(Customer.id.in_(ids)).order_by(Customer.id).with_for_update())
+    customers = {customer.id: customer for customer in result.scalars().all()}
+    if len(customers) != len(set(ids)):
+        return None
+    survivor = customers[survivor_id]
+    duplicates = [customers[customer_id] for customer_id in duplicate_ids]
+
+    await db.execute(
+        update(Appointment).where(Appointment.customer_id.in_(duplicate_ids)).values(customer_id=survivor_id)
+    )
+    await db.execute(
+        update(Feedback).where(Feedback.customer_id.in_(duplicate_ids)).values(customer_id=survivor_id)
+    )
+    # The survivor's ledger keeps adding up to its balance
+    await db.execute(
+        update(LoyaltyTransaction)
+        .where(LoyaltyTransaction.customer_id.in_(duplicate_ids))
+        .values(customer_id=survivor_id)
+    )
+    # Promotions the duplicates redeemed count against the survivor's per-customer caps
+    await merge_redemptions(db, survivor_id, duplicate_ids)
+
+    points = sum(customer.loyalty_points or 0 for customer in duplicates)
+    email = survivor.email or next((customer.email for customer in duplicates if customer.email), None)
+    preferences = survivor.preferences or next((c.preferences for c in duplicates if c.preferences), None)
+
+    # The bulk statements bypass the unit of work, so invalidate the overviews and
+    # update the segment bitmaps explicitly
+    mark_customers_changed(db, ids)
+    mark_customers_merged(db, survivor_id, duplicate_ids)
+
+    # Delete first: the survivor may take over a duplicate's unique email
+    await db.execute(delete(Customer).where(Customer.id.in_(duplicate_ids)))
+    await db.execute(
+        update(Customer)
+        .where(Customer.id == survivor_id)
+        .values(
+            loyalty_points=func.coalesce(Customer.loyalty_points, 0) + points,
+            email=email,
+            preferences=preferences,
+            updated_at=func.now(),
+        )
+    )
+    for customer in duplicates:
+        db.expunge(customer)
+    await db.refresh(survivor)
+    return survivor
@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+import os
+import zlib
+from typing import AsyncIterator, Iterable, List, Type
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from .database import get_session_factory
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+async def stream_rows(query, schema: Type[BaseModel]) -> AsyncIterator[List[dict]]:
+    """
+    Yield the rows of `query` in batches, serialized through the response schema.
+
+    The export opens its own session: FastAPI closes request-scoped dependencies
+    before a streaming body has been sent. Rows come from a server-side cursor,
+    so only one batch is held in memory at a time.
+    """
+    async with get_session_factory()() as session:
+        result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for batch in result.scalars().partitions():
+            yield [schema.model_validate(row).model_dump(mode="json") for row in batch]
+
+def encode_ndjson(rows: Iterable[dict]) -> str:
+    return "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows)
+
+def csv_value(value):
+    # Nested JSON columns (preferences, skills) are written as JSON text
+    return json.dumps(value) if isinstance(value, (dict, list)) else value
+
+async def encode(batches: AsyncIterator[List[dict]], format: str, fields: List[str]) -> AsyncIterator[bytes]:
+    if format == "ndjson":
+        async for rows in batches:
+            yield encode_ndjson(rows).encode()
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    async for rows in batches:
+        writer.writerows({key: csv_value(value) for key, value in row.items()} for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def export_response(query, schema: Type[BaseModel], resource: str, format: str, gzip: bool = False) -> StreamingResponse:
+    """
+    Stream every row matched by `query` as NDJSON or CSV, optionally gzip-compressed.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported export format '{format}'; expected one of: {', '.join(EXPORT_FORMATS)}",
+        )
+
+    body = encode(stream_rows(query, schema), format, list(schema.model_fields))
+    filename = f"{resource}.{format}"
+    media_type = EXPORT_FORMATS[format]
+    if gzip:
+        body = gzip_chunks(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
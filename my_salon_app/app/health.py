@@ -0,0 +1,142 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .background import PeriodicTask
+from .database import get_engine
+
+# How often the background loop probes the database
+HEALTH_PROBE_INTERVAL_SECONDS = float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", 5))
+# A probe that takes longer than this counts as a failure
+HEALTH_PROBE_TIMEOUT_SECONDS = float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", 2))
+# Report not-ready when the pool is saturated so traffic drains to other pods
+READYZ_FAIL_ON_POOL_SATURATION = os.getenv("READYZ_FAIL_ON_POOL_SATURATION", "false").lower() in ("1", "true", "yes")
+# Fraction of pool capacity in use at which the pool counts as saturated
+READYZ_POOL_SATURATION_THRESHOLD = float(os.getenv("READYZ_POOL_SATURATION_THRESHOLD", 1.0))
+
+def get_migration_head() -> Optional[str]:
+    """Return the head revision of the Alembic scripts shipped with the app."""
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    config = Config(os.path.join(base_dir, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(base_dir, "alembic"))
+    return ScriptDirectory.from_config(config).get_current_head()
+
+class HealthMonitor:
+    """
+    Probe the database in the background and cache the result.
+
+    Health endpoints read the cached state, so orchestrator probes never check out
+    a pool connection or make a database round trip themselves.
+    """
+
+    def __init__(self, engine: Optional[AsyncEngine] = None, interval: float = HEALTH_PROBE_INTERVAL_SECONDS):
+        self._engine = engine
+        self.interval = interval
+        self.database_ok = False
+        self.error: Optional[str] = None
+        self.latency_ms: Optional[float] = None
+        self.checked_at: Optional[datetime] = None
+        self.migration_revision: Optional[str] = None
+        self.migration_head: Optional[str] = None
+        self._task = PeriodicTask("health-probe", self.probe, interval)
+
+    @property
+    def engine(self) -> AsyncEngine:
+        return self._engine or get_engine()
+
+    def start(self):
+        try:
+            self.migration_head = get_migration_head()
+        except Exception:
+            # Without the scripts on disk the migration status is reported as unknown
+            self.migration_head = None
+        self._task.start()
+
+    async def stop(self):
+        await self._task.stop()
+
+    async def probe(self):
+        started = time.perf_counter()
+        try:
+            self.migration_revision = await asyncio.wait_for(self._query(), HEALTH_PROBE_TIMEOUT_SECONDS)
+            self.database_ok = True
+            self.error = None
+        except asyncio.TimeoutError:
+            self.database_ok = False
+            self.error = f"Probe timed out after {HEALTH_PROBE_TIMEOUT_SECONDS}s"
+        except Exception as e:
+            self.database_ok = False
+            self.error = str(e)
+        self.latency_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.checked_at = datetime.now(timezone.utc)
+
+    async def _query(self) -> Optional[str]:
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            try:
+                result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+                return result.scalar()
+            except DBAPIError:
+                return None
+
+    def pool_status(self) -> Dict[str, Any]:
+        pool = self.engine.pool
+        size = pool.size()
+        checked_out = pool.checkedout()
+        max_overflow = getattr(pool, "_max_overflow", 0)
+        # A negative max_overflow means the pool can grow without limit
+        capacity = size + max_overflow if max_overflow >= 0 else None
+        return {
+            "size": size,
+            "checked_out": checked_out,
+            "overflow": pool.overflow(),
+            "capacity": capacity,
+            "saturation": round(checked_out / capacity, 3) if capacity else None,
+        }
+
+    def migration_status(self) -> str:
+        if self.migration_head is None or self.migration_revision is None:
+            return "unknown"
+        return "current" if self.migration_revision == self.migration_head else "out_of_date"
+
+    def readiness(self) -> Dict[str, Any]:
+        pool = self.pool_status()
+        reasons = []
+        if self.checked_at is None:
+            reasons.append("database probe has not completed yet")
+        elif not self.database_ok:
+            reasons.append("database unreachable")
+        elif (datetime.now(timezone.utc) - self.checked_at).total_seconds() > self.interval * 3:
+            reasons.append("database probe is stale")
+        if (
+            READYZ_FAIL_ON_POOL_SATURATION
+            and pool["saturation"] is not None
+            and pool["saturation"] >= READYZ_POOL_SATURATION_THRESHOLD
+        ):
+            reasons.append("connection pool saturated")
+
+        return {
+            "status": "not_ready" if reasons else "ready",
+            "reasons": reasons,
+            "database": {
+                "connected": self.database_ok,
+                "error": self.error,
+                "last_probe_latency_ms": self.latency_ms,
+                "last_probe_at": self.checked_at.isoformat() if self.checked_at else None,
+            },
+            "pool": pool,
+            "migrations": {
+                "status": self.migration_status(),
+                "current": self.migration_revision,
+                "head": self.migration_head,
+            },
+        }
@@ -0,0 +1,268 @@
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import func, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .customer_overview import mark_customers_changed
+from .database import get_session_factory
+from .models import Customer, LoyaltyTransaction, LoyaltyTransactionType
+
+logger = logging.getLogger(__name__)
+
+# Points earned per currency unit paid for a completed appointment (rounded down)
+LOYALTY_POINTS_PER_UNIT = float(os.getenv("LOYALTY_POINTS_PER_UNIT", 1))
+# Days after which accrued points expire; 0 keeps them forever
+LOYALTY_POINTS_EXPIRY_DAYS = int(os.getenv("LOYALTY_POINTS_EXPIRY_DAYS", 365))
+# Completed appointments accrued, or accruals expired, per statement
+LOYALTY_BATCH_SIZE = int(os.getenv("LOYALTY_BATCH_SIZE", 5000))
+# Seconds between runs of the accrual and expiry job in the API process; 0 disables it
+LOYALTY_BATCH_INTERVAL_SECONDS = float(os.getenv("LOYALTY_BATCH_INTERVAL_SECONDS", 300))
+
+# Advisory lock serializing the batch job across API workers and scripts
+BATCH_LOCK_KEY = 0x4C4F59414C5459
+
+# Accrue points for completed appointments that have no accrual yet: one ledger row per
+# appointment and one balance update per customer, for a whole batch in one statement.
+# The partial unique index makes a concurrent accrual of the same appointment a no-op,
+# and only the rows actually inserted are credited. Enum columns are stored by name.
+# Points follow the price paid as booked; appointments still waiting for the price
+# snapshot backfill accrue once it has run.
+ACCRUAL_SQL = """
+    WITH due AS (
+        SELECT a.id AS appointment_id, a.customer_id,
+               floor(a.price_at_booking * (1 - a.discount_percent / 100) * :points_per_unit)::integer AS points
+        FROM appointments a
+        WHERE a.status = 'COMPLETED' AND a.price_at_booking IS NOT NULL AND {scope}
+          AND NOT EXISTS (
+              SELECT 1 FROM loyalty_transactions t
+              WHERE t.appointment_id = a.id AND t.type = 'ACCRUAL'
+          )
+        ORDER BY a.id
+        LIMIT :batch_size
+    ),
+    accrued AS (
+        INSERT INTO loyalty_transactions (customer_id, appointment_id, type, points, expires_at)
+        SELECT customer_id, appointment_id, 'ACCRUAL', points,
+               CASE WHEN :expiry_days > 0 THEN now() + make_interval(days => :expiry_days) END
+        FROM due
+        ON CONFLICT (appointment_id) WHERE type = 'ACCRUAL' DO NOTHING
+        RETURNING customer_id, points
+    ),
+    totals AS (
+        SELECT customer_id, sum(points) AS points FROM accrued GROUP BY customer_id
+    ),
+    credited AS (
+        UPDATE customers c
+        SET loyalty_points = c.loyalty_points + totals.points, updated_at = now()
+        FROM totals
+        WHERE c.id = totals.customer_id AND totals.points <> 0
+        RETURNING c.id
+    )
+    SELECT
+        (SELECT count(*) FROM due) AS scanned,
+        (SELECT max(appointment_id) FROM due) AS last_appointment_id,
+        (SELECT count(*) FROM accrued) AS accrued,
+        (SELECT coalesce(sum(points), 0) FROM accrued) AS points,
+        (SELECT coalesce(array_agg(id), '{{}}') FROM credited) AS customer_ids
+"""
+
+# Keyset pagination over appointment ids for the batch job
+BATCH_ACCRUAL = text(ACCRUAL_SQL.format(scope="a.id > :after_id"))
+# A single appointment, accrued inline when it is marked completed
+APPOINTMENT_ACCRUAL = text(ACCRUAL_SQL.format(scope="a.id = :appointment_id"))
+
+# Expire a batch of accruals past their expiry date. Customers are locked before the
+# amounts are computed, and a customer is never debited below zero: points already
+# redeemed cannot expire again. The EXPIRY rows record what was actually debited.
+EXPIRY = text("""
+    WITH due AS (
+        SELECT id, customer_id, points
+        FROM loyalty_transactions
+        WHERE type = 'ACCRUAL' AND expired_at IS NULL AND expires_at IS NOT NULL AND expires_at <= now()
+        ORDER BY expires_at
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    ),
+    marked AS (
+        UPDATE loyalty_transactions t
+        SET expired_at = now()
+        FROM due
+        WHERE t.id = due.id
+        RETURNING t.customer_id, t.points
+    ),
+    totals AS (
+        SELECT customer_id, sum(points) AS points FROM marked GROUP BY customer_id
+    ),
+    balances AS (
+        SELECT c.id AS customer_id, least(totals.points, c.loyalty_points) AS points
+        FROM customers c
+        JOIN totals ON totals.customer_id = c.id
+        ORDER BY c.id
+        FOR UPDATE OF c
+    ),
+    debited AS (
+        UPDATE customers c
+        SET loyalty_points = c.loyalty_points - balances.points, updated_at = now()
+        FROM balances
+        WHERE c.id = balances.customer_id AND balances.points > 0
+        RETURNING c.id
+    ),
+    recorded AS (
+        INSERT INTO loyalty_transactions (customer_id, type, points, note)
+        SELECT customer_id, 'EXPIRY', -points, 'Points expired'
+        FROM balances
+        WHERE points > 0
+    )
+    SELECT
+        (SELECT count(*) FROM marked) AS expired,
+        (SELECT coalesce(sum(points), 0) FROM balances) AS points,
+        (SELECT coalesce(array_agg(id), '{}') FROM debited) AS customer_ids
+""")
+
+# Bring balances that predate the ledger into it: an opening adjustment per nonzero
+# balance, and an empty accrual per completed appointment, which the balance already
+# reflects. The migration adding the ledger did the same; data generators run these.
+OPEN_LEDGER_STATEMENTS = [
+    """
+    INSERT INTO loyalty_transactions (customer_id, type, points, note)
+    SELECT c.id, 'ADJUSTMENT', c.loyalty_points, 'Opening balance'
+    FROM customers c
+    WHERE c.loyalty_points <> 0
+      AND NOT EXISTS (SELECT 1 FROM loyalty_transactions t WHERE t.customer_id = c.id)
+    """,
+    """
+    INSERT INTO loyalty_transactions (customer_id, appointment_id, type, points, note)
+    SELECT a.customer_id, a.id, 'ACCRUAL', 0, 'Included in the opening balance'
+    FROM appointments a
+    WHERE a.status = 'COMPLETED'
+    ON CONFLICT (appointment_id) WHERE type = 'ACCRUAL' DO NOTHING
+    """,
+]
+
+async def adjust_points(
+    db: AsyncSession,
+    customer_id: int,
+    points: int,
+    type: LoyaltyTransactionType = LoyaltyTransactionType.ADJUSTMENT,
+    note: Optional[str] = None,
+) -> Optional[Tuple[int, LoyaltyTransaction]]:
+    """
+    Add `points` (negative to debit) to a balance and record it in the ledger.
+
+    The balance is changed with a single conditional UPDATE, so concurrent
+    redemptions can never overdraw it. Returns the new balance and the ledger
+    entry, or None if the customer does not exist; raises ValueError if the
+    balance would go negative. The caller commits.
+    """
+    result = await db.execute(
+        update(Customer)
+        .where(Customer.id == customer_id, Customer.loyalty_points + points >= 0)
+        .values(loyalty_points=Customer.loyalty_points + points, updated_at=func.now())
+        .returning(Customer.loyalty_points)
+    )
+    balance = result.scalar()
+    if balance is None:
+        exists = await db.scalar(select(Customer.id).filter(Customer.id == customer_id))
+        if exists is None:
+            return None
+        raise ValueError("Insufficient loyalty points")
+
+    transaction = LoyaltyTransaction(customer_id=customer_id, type=type, points=points, note=note)
+    db.add(transaction)
+    # The bulk UPDATE bypasses the unit of work, so invalidate the overview explicitly
+    mark_customers_changed(db, [customer_id])
+    return balance, transaction
+
+async def set_balance(db: AsyncSession, customer_id: int, balance: int, note: Optional[str] = None) -> Optional[int]:
+    """
+    Set a balance to an absolute value, recording the difference as an adjustment.
+    """
+    current = await db.scalar(
+        select(Customer.loyalty_points).filter(Customer.id == customer_id).with_for_update()
+    )
+    if current is None:
+        return None
+    if balance != current:
+        await adjust_points(db, customer_id, balance - current, note=note)
+    return balance
+
+def record_opening_balance(db: AsyncSession, customer: Customer):
+    """Record the initial balance of a new, flushed customer in the ledger."""
+    if customer.loyalty_points:
+        db.add(LoyaltyTransaction(
+            customer_id=customer.id,
+            type=LoyaltyTransactionType.ADJUSTMENT,
+            points=customer.loyalty_points,
+            note="Opening balance",
+        ))
+
+def accrual_params(batch_size: int) -> Dict[str, Any]:
+    return {
+        "points_per_unit": LOYALTY_POINTS_PER_UNIT,
+        "expiry_days": LOYALTY_POINTS_EXPIRY_DAYS,
+        "batch_size": batch_size,
+    }
+
+async def accrue_appointment(db: AsyncSession, appointment_id: int) -> int:
+    """
+    Accrue the points of one completed appointment within the session's transaction.
+
+    Returns the points credited: 0 if the appointment is not completed or has
+    already accrued. The caller commits.
+    """
+    # Raw SQL does not autoflush; the status change must be visible to the statement
+    await db.flush()
+    result = await db.execute(APPOINTMENT_ACCRUAL, {**accrual_params(1), "appointment_id": appointment_id})
+    row = result.mappings().one()
+    mark_customers_changed(db, row["customer_ids"])
+    return row["points"]
+
+async def run_loyalty_batch(batch_size: int = LOYALTY_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Accrue points for every completed appointment still missing them, then expire
+    accruals past their expiry date, `batch_size` rows per statement.
+
+    Each batch commits on its own, so a long backlog never holds locks for long and
+    a failure keeps the batches already done. Concurrent runs in other workers are
+    skipped rather than queued.
+    """
+    started = time.perf_counter()
+    report = {"accrued": 0, "points_accrued": 0, "expired": 0, "points_expired": 0, "batches": 0, "skipped": False}
+    async with get_session_factory()() as session:
+        after_id = 0
+        while True:
+            if not await session.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": BATCH_LOCK_KEY}):
+                report["skipped"] = True
+                return report
+            result = await session.execute(BATCH_ACCRUAL, {**accrual_params(batch_size), "after_id": after_id})
+            row = result.mappings().one()
+            mark_customers_changed(session, row["customer_ids"])
+            await session.commit()
+            report["batches"] += 1
+            report["accrued"] += row["accrued"]
+            report["points_accrued"] += row["points"]
+            if row["scanned"] < batch_size:
+                break
+            after_id = row["last_appointment_id"]
+
+        while True:
+            if not await session.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": BATCH_LOCK_KEY}):
+                report["skipped"] = True
+                return report
+            result = await session.execute(EXPIRY, {"batch_size": batch_size})
+            row = result.mappings().one()
+            mark_customers_changed(session, row["customer_ids"])
+            await session.commit()
+            report["batches"] += 1
+            report["expired"] += row["expired"]
+            report["points_expired"] += row["points"]
+            if row["expired"] < batch_size:
+                break
+
+    report["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    if report["accrued"] or report["expired"]:
+        logger.info("Loyalty batch: %s", report)
+    return report
@@ -1,16 +1,92 @@
-from fastapi import FastAPI, Depends
+import importlib
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import DBAPIError
+
+from .background import PeriodicTask
+from .database import get_engine, is_statement_timeout
+from .health import HealthMonitor
+from .middleware import CancelOnDisconnectMiddleware
+
+# uvicorn configures its own loggers only, so log through it to get the startup report out
+logger = logging.getLogger("uvicorn.error")
+
+# Timestamp taken when the module is imported, used for the startup report
+_import_started = time.perf_counter()
+
+# Background database probe shared by the health endpoints
+health_monitor = HealthMonitor()
+
+def background_tasks():
+    """
+    Build the periodic jobs of the API process. Their subsystems are imported here,
+    when the app starts, rather than when app.main is imported.
+    """
+    from .loyalty import LOYALTY_BATCH_INTERVAL_SECONDS, run_loyalty_batch
+    from .reporting import REPORT_REFRESH_INTERVAL_SECONDS, refresh_reports
+    from .rollups import ROLLUP_REFRESH_INTERVAL_SECONDS, refresh_rollups
+    from .segments import SEGMENT_REBUILD_INTERVAL_SECONDS, segment_index
+    from .sentiment_pipeline import SENTIMENT_INTERVAL_SECONDS, run_sentiment_batches
+
+    return [
+        # Accrues points missed by the inline accrual (e.g. imported completions) and expires old points
+        PeriodicTask("loyalty-batch", run_loyalty_batch, LOYALTY_BATCH_INTERVAL_SECONDS),
+        # Scores new and edited feedback comments in a process pool
+        PeriodicTask("sentiment-scoring", run_sentiment_batches, SENTIMENT_INTERVAL_SECONDS),
+        # Recomputes the trend rollups of days changed by writes since the last run
+        PeriodicTask("rollup-refresh", refresh_rollups, ROLLUP_REFRESH_INTERVAL_SECONDS),
+        # Refreshes the revenue, cancellation and utilization views without blocking their readers
+        PeriodicTask("report-refresh", refresh_reports, REPORT_REFRESH_INTERVAL_SECONDS),
+        # Rebuilds the customer segment bitmaps, picking up writes of other workers and lapsed customers
+        PeriodicTask("segment-rebuild", segment_index.rebuild, SEGMENT_REBUILD_INTERVAL_SECONDS),
+    ]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Mount the routers first, so the warmup below builds the complete OpenAPI schema
+    started = time.perf_counter()
+    include_routers(app, enabled_routers())
+    routers_ms = round((time.perf_counter() - started) * 1000, 2)
 
-from .database import get_db
-from . import models
+    from .promotion_index import promotion_index
+    from .sentiment_pipeline import shutdown_pool
+    from .warmup import warm_up
+
+    # Warm the pool, statement caches and schemas before accepting traffic
+    engine = get_engine()
+    report = await warm_up(app, engine)
+    report["routers"] = routers_ms
+    report["since_import"] = round((time.perf_counter() - _import_started) * 1000, 2)
+    app.state.startup_report = report
+    logger.info("Startup report (ms): %s", report)
+
+    tasks = background_tasks()
+    health_monitor.start()
+    promotion_index.start()
+    for task in tasks:
+        task.start()
+    yield
+
+    # Runs after uvicorn has drained in-flight requests; close pooled connections cleanly
+    for task in reversed(tasks):
+        await task.stop()
+    shutdown_pool()
+    await promotion_index.stop()
+    await health_monitor.stop()
+    await engine.dispose()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Salon Management API",
     description="API for managing a Spa/Salon with appointments, CRM, promotions, feedback, and more.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -22,28 +98,80 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-# Import routers
-from .routers import customers, staff, services, appointments, feedback, promotions, knowledge_base, service_categories
+# Stop running queries for clients that have disconnected
+app.add_middleware(CancelOnDisconnectMiddleware)
+
+@app.exception_handler(DBAPIError)
+async def database_error_handler(request: Request, exc: DBAPIError):
+    # Queries cancelled by statement_timeout become a clean 504; anything else stays a 500
+    if is_statement_timeout(exc):
+        return JSONResponse(status_code=504, content={"detail": "Database query timed out"})
+    raise exc
 
-# Include routers
-app.include_router(customers.router, prefix="/api", tags=["customers"])
-app.include_router(staff.router, prefix="/api", tags=["staff"])
-app.include_router(services.router, prefix="/api", tags=["services"])
-app.include_router(service_categories.router, prefix="/api", tags=["service_categories"])
-app.include_router(appointments.router, prefix="/api", tags=["appointments"])
-app.include_router(feedback.router, prefix="/api", tags=["feedback"])
-app.include_router(promotions.router, prefix="/api", tags=["promotions"])
-app.include_router(knowledge_base.router, prefix="/api", tags=["knowledge_base"])
+# Routers mounted under /api as name -> (module, OpenAPI tag). They are mounted when
+# the app starts, not when app.main is imported, and only when enabled, so
+# ENABLED_ROUTERS (comma-separated names) lets a deployment skip loading
+# subsystems it does not serve
+ROUTERS = {
+    "customers": ("app.routers.customers", "customers"),
+    "staff": ("app.routers.staff", "staff"),
+    "services": ("app.routers.services", "services"),
+    "service_categories": ("app.routers.service_categories", "service_categories"),
+    "appointments": ("app.routers.appointments", "appointments"),
+    "feedback": ("app.routers.feedback", "feedback"),
+    "promotions": ("app.routers.promotions", "promotions"),
+    "knowledge_base": ("app.routers.knowledge_base", "knowledge_base"),
+    "reports": ("app.routers.reports", "reports"),
+    "admin": ("app.routers.admin", "admin"),
+}
+
+def enabled_routers():
+    names = os.getenv("ENABLED_ROUTERS")
+    if not names:
+        return list(ROUTERS)
+    return [name.strip() for name in names.split(",") if name.strip()]
+
+def include_routers(app: FastAPI, names):
+    # The lifespan runs again whenever the app is restarted in the same process
+    # (e.g. by test clients), so routers already mounted are skipped
+    mounted = getattr(app.state, "routers", set())
+    for name in names:
+        if name not in ROUTERS:
+            raise ValueError(f"Unknown router in ENABLED_ROUTERS: {name}")
+        if name in mounted:
+            continue
+        module_path, tag = ROUTERS[name]
+        module = importlib.import_module(module_path)
+        app.include_router(module.router, prefix="/api", tags=[tag])
+        mounted.add(name)
+        app.openapi_schema = None
+    app.state.routers = mounted
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Salon Management API"}
 
+@app.get("/livez")
+async def liveness_check():
+    """
+    Liveness probe. Never touches the database.
+    """
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness_check():
+    """
+    Readiness probe served from the last background database probe.
+    """
+    report = health_monitor.readiness()
+    status_code = 200 if report["status"] == "ready" else 503
+    return JSONResponse(status_code=status_code, content=report)
+
 @app.get("/health")
-async def health_check(db: AsyncSession = Depends(get_db)):
-    try:
-        # Try to execute a simple query to check database connection
-        await db.execute(text("SELECT 1"))
+async def health_check():
+    """
+    Legacy health check, now served from the cached probe result.
+    """
+    if health_monitor.database_ok:
         return {"status": "healthy", "database": "connected"}
-    except Exception as e:
-        return {"status": "unhealthy", "database": str(e)}
+    return {"status": "unhealthy", "database": health_monitor.error or "not checked yet"}
@@ -0,0 +1,59 @@
+import asyncio
+import contextlib
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+class CancelOnDisconnectMiddleware:
+    """
+    Cancel the request handler when the client disconnects before the response is sent.
+
+    Cancelling the handler raises CancelledError inside the awaited asyncpg query,
+    which makes asyncpg send a cancel request to Postgres instead of leaving the
+    statement running for a client that has already gone away.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        messages: asyncio.Queue = asyncio.Queue()
+        response_complete = False
+
+        async def send_wrapper(message: Message):
+            nonlocal response_complete
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+
+        async def watch_disconnect():
+            # Forward every message to the handler and stop once the client is gone
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    return
+
+        handler = asyncio.ensure_future(self.app(scope, messages.get, send_wrapper))
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            done, _ = await asyncio.wait({handler, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if handler in done:
+                handler.result()
+                return
+
+            # The client disconnected; let background tasks finish if the response already went out
+            if response_complete:
+                await handler
+                return
+
+            handler.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await handler
+        finally:
+            watcher.cancel()
+            if not handler.done():
+                handler.cancel()
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Enum, JSON, Boolean, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -18,6 +19,13 @@ class CustomerType(str, enum.Enum):
     STANDARD = "standard"
     VIP = "vip"
 
+# Enum for loyalty ledger entries
+class LoyaltyTransactionType(str, enum.Enum):
+    ACCRUAL = "accrual"
+    REDEMPTION = "redemption"
+    ADJUSTMENT = "adjustment"
+    EXPIRY = "expiry"
+
 class Customer(Base):
     __tablename__ = "customers"
 
@@ -26,14 +34,24 @@ class Customer(Base):
     phone = Column(String, nullable=False, unique=True)
     email = Column(String, nullable=True, unique=True)
     type = Column(Enum(CustomerType), default=CustomerType.STANDARD)
-    preferences = Column(JSON, nullable=True)
-    loyalty_points = Column(Integer, default=0)
+    preferences = Column(JSONB, nullable=True)  # GIN-indexed for containment (@>) filters
+    loyalty_points = Column(Integer, nullable=False, default=0, server_default="0")  # balance of the loyalty ledger
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
     appointments = relationship("Appointment", back_populates="customer")
     feedback = relationship("Feedback", back_populates="customer")
+    loyalty_transactions = relationship("LoyaltyTransaction", back_populates="customer", passive_deletes=True)
+
+    __table_args__ = (
+        Index(
+            "ix_customers_preferences",
+            "preferences",
+            postgresql_using="gin",
+            postgresql_ops={"preferences": "jsonb_path_ops"},
+        ),
+    )
 
 class Staff(Base):
     __tablename__ = "staff"
@@ -81,12 +99,17 @@ class Appointment(Base):
     __tablename__ = "appointments"
 
     id = Column(Integer, primary_key=True, index=True)
-    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
-    service_id = Column(Integer, ForeignKey("services.id"), nullable=False)
-    staff_id = Column(Integer, ForeignKey("staff.id"), nullable=True)
-    appointment_time = Column(DateTime(timezone=True), nullable=False)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False, index=True)
+    service_id = Column(Integer, ForeignKey("services.id"), nullable=False, index=True)
+    staff_id = Column(Integer, ForeignKey("staff.id"), nullable=True, index=True)
+    appointment_time = Column(DateTime(timezone=True), nullable=False, index=True)
     status = Column(Enum(AppointmentStatus), default=AppointmentStatus.UPCOMING)
     notes = Column(Text, nullable=True)
+    # What the appointment costs as booked, so reports never join services and later
+    # price edits do not rewrite history; see app.pricing
+    price_at_booking = Column(Float, nullable=True)
+    duration_at_booking = Column(Integer, nullable=True)  # in minutes
+    discount_percent = Column(Float, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -101,16 +124,87 @@ class Feedback(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     appointment_id = Column(Integer, ForeignKey("appointments.id"), unique=True)
-    customer_id = Column(Integer, ForeignKey("customers.id"))
+    customer_id = Column(Integer, ForeignKey("customers.id"), index=True)
     rating = Column(Integer, nullable=False)  # 1-5 rating
     comments = Column(Text, nullable=True)
-    sentiment_score = Column(Float, nullable=True)  # Optional for sentiment analysis
+    sentiment_score = Column(Float, nullable=True)  # -1..1, set by clients or app.sentiment_pipeline
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
     appointment = relationship("Appointment", back_populates="feedback")
     customer = relationship("Customer", back_populates="feedback")
 
+    __table_args__ = (
+        # The sentiment pipeline's queue of comments waiting to be scored
+        Index("ix_feedback_unscored", "id", postgresql_where=text("sentiment_score IS NULL AND comments IS NOT NULL")),
+    )
+
+# Running feedback rating totals, maintained in the transaction of each feedback write
+class RatingAggregate(Base):
+    __tablename__ = "rating_aggregates"
+
+    dimension = Column(String, primary_key=True)  # overall, staff, service or day
+    key = Column(String, primary_key=True)  # staff or service id, ISO date, or '' for overall
+    rating_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    # Histogram of the 1-5 ratings
+    rating_1 = Column(Integer, nullable=False, default=0)
+    rating_2 = Column(Integer, nullable=False, default=0)
+    rating_3 = Column(Integer, nullable=False, default=0)
+    rating_4 = Column(Integer, nullable=False, default=0)
+    rating_5 = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# Appointment and feedback trends per day, week and month, refreshed by app.rollups
+class TrendRollup(Base):
+    __tablename__ = "trend_rollups"
+
+    granularity = Column(String, primary_key=True)  # day, week or month
+    dimension = Column(String, primary_key=True)  # overall, service or staff
+    key = Column(Integer, primary_key=True)  # service or staff id, 0 for overall
+    bucket = Column(Date, primary_key=True)  # date_trunc(granularity) of the UTC appointment day
+    bookings = Column(Integer, nullable=False, default=0)
+    cancellations = Column(Integer, nullable=False, default=0)
+    completions = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)  # price of completed appointments
+    rating_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+
+# UTC days whose rollups are out of date, written in the transaction that changed them
+class RollupDirtyDay(Base):
+    __tablename__ = "rollup_dirty_days"
+
+    day = Column(Date, primary_key=True)
+    marked_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class LoyaltyTransaction(Base):
+    __tablename__ = "loyalty_transactions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), nullable=False, index=True)
+    appointment_id = Column(Integer, ForeignKey("appointments.id", ondelete="SET NULL"), nullable=True)
+    type = Column(Enum(LoyaltyTransactionType), nullable=False)
+    points = Column(Integer, nullable=False)  # signed change of the balance
+    note = Column(Text, nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=True)  # accruals only
+    expired_at = Column(DateTime(timezone=True), nullable=True)  # set once the expiry job has debited it
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    customer = relationship("Customer", back_populates="loyalty_transactions")
+
+    __table_args__ = (
+        # An appointment accrues points once, however many workers try
+        Index("uq_loyalty_transactions_accrual", "appointment_id", unique=True, postgresql_where=text("type = 'ACCRUAL'")),
+        # Accruals the expiry job still has to look at
+        Index(
+            "ix_loyalty_transactions_expiring",
+            "expires_at",
+            postgresql_where=text("type = 'ACCRUAL' AND expired_at IS NULL AND expires_at IS NOT NULL"),
+        ),
+    )
+
 class Promotion(Base):
     __tablename__ = "promotions"
 
@@ -122,12 +216,45 @@ class Promotion(Base):
     end_date = Column(DateTime(timezone=True), nullable=True)
     service_id = Column(Integer, ForeignKey("services.id"), nullable=True)
     is_active = Column(Boolean, default=True)
+    max_redemptions = Column(Integer, nullable=True)  # in total; capped promotions are only applied when redeemed
+    max_redemptions_per_customer = Column(Integer, nullable=True)
+    segment = Column(String, nullable=True)  # customers it targets (app.segments); targeted ones are only applied when redeemed
+    redemption_count = Column(Integer, nullable=False, default=0, server_default="0")  # redemptions not released
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
     service = relationship("Service")
 
+    __table_args__ = (
+        # Running and upcoming promotions, for app.promotion_index and its database fallback
+        Index(
+            "ix_promotions_running",
+            func.coalesce(end_date, text("'infinity'::timestamptz")),
+            start_date,
+            postgresql_where=text("is_active"),
+        ),
+    )
+
+# A promotion redeemed for an appointment, at most one per appointment
+class PromotionRedemption(Base):
+    __tablename__ = "promotion_redemptions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    promotion_id = Column(Integer, ForeignKey("promotions.id", ondelete="CASCADE"), nullable=False, index=True)
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), nullable=False, index=True)
+    appointment_id = Column(Integer, ForeignKey("appointments.id", ondelete="CASCADE"), nullable=False, unique=True)
+    discount_percent = Column(Float, nullable=False)  # as redeemed
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# Redemptions per promotion and customer, the counter the per-customer cap is checked against
+class PromotionCustomerRedemption(Base):
+    __tablename__ = "promotion_customer_redemptions"
+
+    promotion_id = Column(Integer, ForeignKey("promotions.id", ondelete="CASCADE"), primary_key=True)
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True, index=True)
+    redemptions = Column(Integer, nullable=False, default=0)
+
 class KnowledgeBase(Base):
     __tablename__ = "knowledge_base"
 
@@ -0,0 +1,215 @@
+import itertools
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .database import get_session_factory
+from .models import Appointment, Promotion, Service
+from .promotion_index import AUTOMATIC, active_promotions, automatic, covers, promotion_index, running
+
+logger = logging.getLogger(__name__)
+
+# Appointments snapshotted per transaction by the backfill
+PRICE_BACKFILL_BATCH_SIZE = int(os.getenv("PRICE_BACKFILL_BATCH_SIZE", 5000))
+# Seconds the service catalog behind /services/pricing is kept per process; bounds
+# staleness for service writes made by other workers or scripts, which this process
+# cannot see. 0 disables the cache: every request reads the catalog and prices it
+PRICING_CACHE_TTL_SECONDS = float(os.getenv("PRICING_CACHE_TTL_SECONDS", 60))
+
+# session.info key flagging a transaction that wrote services
+PENDING_KEY = "services_changed"
+
+# Largest discount among the active promotions running at {at} that cover {service_id}
+# (promotions without a service cover every service); 0 without one. Promotions with a
+# redemption cap or a segment only apply when redeemed. Same rules as
+# app.promotion_index.running, covers and AUTOMATIC.
+APPLICABLE_DISCOUNT = """
+    SELECT coalesce(max(p.discount_percent), 0) FROM promotions p
+    WHERE p.is_active AND p.start_date <= {at} AND coalesce(p.end_date, 'infinity'::timestamptz) > {at}
+      AND (p.service_id IS NULL OR p.service_id = {service_id})
+      AND p.max_redemptions IS NULL AND p.max_redemptions_per_customer IS NULL AND p.segment IS NULL
+"""
+
+# Snapshot the service's current price and duration, and the discount of the
+# promotions running when the appointment was booked, for a batch of appointments
+# booked before the snapshot existed. The days of the snapshotted appointments are
+# queued for the trend rollups, whose revenue comes from the snapshot.
+BACKFILL = text(f"""
+    WITH batch AS (
+        SELECT id FROM appointments
+        WHERE price_at_booking IS NULL AND id > :after_id
+        ORDER BY id
+        LIMIT :batch_size
+    ),
+    filled AS (
+        UPDATE appointments a
+        SET price_at_booking = s.price,
+            duration_at_booking = s.duration_minutes,
+            discount_percent = ({APPLICABLE_DISCOUNT.format(at="coalesce(a.created_at, a.appointment_time)", service_id="a.service_id")}),
+            updated_at = now()
+        FROM batch, services s
+        WHERE a.id = batch.id AND s.id = a.service_id
+        RETURNING a.appointment_time
+    ),
+    dirtied AS (
+        INSERT INTO rollup_dirty_days (day)
+        SELECT DISTINCT (appointment_time AT TIME ZONE 'UTC')::date FROM filled
+        ON CONFLICT (day) DO UPDATE SET marked_at = now()
+    )
+    SELECT (SELECT count(*) FROM filled) AS filled, (SELECT max(id) FROM batch) AS last_id
+""")
+
+async def applicable_discount(db: AsyncSession, service_id: int, at: Optional[datetime] = None) -> float:
+    """Discount percent a booking of the service gets at `at` (default: now) without redeeming a promotion."""
+    if at is None:
+        promotions = promotion_index.active(service_id)
+        if promotions is not None:
+            return max((promotion.discount_percent for promotion in promotions if automatic(promotion)), default=0)
+        at = datetime.now(timezone.utc)
+    result = await db.execute(
+        select(func.coalesce(func.max(Promotion.discount_percent), 0)).filter(running(at), covers(service_id), AUTOMATIC)
+    )
+    return result.scalar()
+
+async def snapshot_price(db: AsyncSession, appointment: Appointment, service: Service):
+    """
+    Record what the appointment costs as booked now: the service's price and
+    duration and the applicable discount. Later price edits leave it unchanged.
+    """
+    appointment.price_at_booking = service.price
+    appointment.duration_at_booking = service.duration_minutes
+    appointment.discount_percent = await applicable_discount(db, service.id)
+
+def effective_prices(services: Iterable, promotions: Iterable) -> Dict[int, Dict[str, Any]]:
+    """
+    Price every service with the best discount among the running automatic
+    promotions that cover it, the same rule as applicable_discount: one pass
+    over the promotions keeps the best global one and the best per service, one
+    pass over the services picks the larger of the two. A service's own
+    promotion wins a tie.
+
+    Plain Python rather than array operations: numpy is not a dependency, and
+    a catalog of 1,000 services is priced in about 2 ms (pricing/effective_prices
+    in scripts/benchmark.py), once per catalog and promotion version.
+    """
+    best_global = None
+    best_by_service = {}
+    for promotion in promotions:
+        if not automatic(promotion):
+            continue
+        if promotion.service_id is None:
+            if best_global is None or promotion.discount_percent > best_global.discount_percent:
+                best_global = promotion
+        else:
+            best = best_by_service.get(promotion.service_id)
+            if best is None or promotion.discount_percent > best.discount_percent:
+                best_by_service[promotion.service_id] = promotion
+
+    prices = {}
+    for service in services:
+        best = best_by_service.get(service.id)
+        if best_global is not None and (best is None or best_global.discount_percent > best.discount_percent):
+            best = best_global
+        discount_percent = best.discount_percent if best is not None else 0
+        prices[service.id] = {
+            "service_id": service.id,
+            "name": service.name,
+            "price": service.price,
+            "discount_percent": discount_percent,
+            "promotion_id": best.id if best is not None else None,
+            "final_price": round(service.price * (1 - discount_percent / 100), 2),
+        }
+    return prices
+
+class PriceCache:
+    """
+    Effective prices of the whole catalog, computed at most once per catalog and
+    promotion version.
+
+    The catalog version is the time it was loaded: a commit that wrote services
+    through this process drops it, and it is reloaded at least every `ttl`
+    seconds. The promotion version is promotion_index.version, which changes with
+    every reload of the active set; while the index cannot be trusted, prices are
+    computed from the database on every call and not kept.
+    """
+
+    def __init__(self, ttl: float = PRICING_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._services: Optional[List] = None
+        self._loaded_at = 0.0
+        self._key: Optional[Tuple[float, datetime]] = None
+        self._prices: Dict[int, Dict[str, Any]] = {}
+
+    def invalidate(self):
+        self._services = None
+        self._key = None
+
+    async def _catalog(self, db: AsyncSession) -> Tuple[List, float]:
+        if self._services is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return self._services, self._loaded_at
+        result = await db.execute(select(Service.id, Service.name, Service.price).order_by(Service.id))
+        services, loaded_at = result.all(), time.monotonic()
+        if self.ttl > 0:
+            self._services, self._loaded_at = services, loaded_at
+        return services, loaded_at
+
+    async def prices(self, db: AsyncSession) -> Dict[int, Dict[str, Any]]:
+        """Effective price per service id, in id order."""
+        services, catalog_version = await self._catalog(db)
+        promotion_version = promotion_index.version
+        if promotion_version is not None and self._key == (catalog_version, promotion_version):
+            return self._prices
+
+        prices = effective_prices(services, await active_promotions(db))
+        if self.ttl > 0 and promotion_version is not None and promotion_index.version == promotion_version:
+            self._key, self._prices = (catalog_version, promotion_version), prices
+        return prices
+
+price_cache = PriceCache()
+
+async def backfill_price_snapshots(
+    batch_size: int = PRICE_BACKFILL_BATCH_SIZE, max_batches: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Snapshot prices of appointments booked before the snapshot columns existed,
+    `batch_size` rows per transaction in id order, so the table is never locked
+    for long and an interrupted run resumes where it stopped.
+    """
+    started = time.perf_counter()
+    report = {"filled": 0, "batches": 0}
+    after_id = 0
+    async with get_session_factory()() as session:
+        while max_batches is None or report["batches"] < max_batches:
+            row = (await session.execute(BACKFILL, {"after_id": after_id, "batch_size": batch_size})).mappings().one()
+            await session.commit()
+            if row["last_id"] is None:
+                break
+
+            report["batches"] += 1
+            report["filled"] += row["filled"]
+            after_id = row["last_id"]
+
+    report["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    if report["filled"]:
+        logger.info("Price snapshot backfill: %s", report)
+    return report
+
+@event.listens_for(Session, "after_flush")
+def _collect_service_changes(session, flush_context):
+    if any(isinstance(obj, Service) for obj in itertools.chain(session.new, session.dirty, session.deleted)):
+        session.info[PENDING_KEY] = True
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_prices(session):
+    if session.info.pop(PENDING_KEY, False):
+        price_cache.invalidate()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_service_changes(session):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,194 @@
+import asyncio
+import contextlib
+import itertools
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, func, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .database import get_session_factory
+from .models import Promotion
+from .schemas import PromotionResponse
+
+logger = logging.getLogger(__name__)
+
+# Longest time the in-memory active set is served without a reload. Writes through this
+# process reload it at once; this bounds staleness for writes made by other workers or
+# scripts, which it cannot see. 0 disables the in-memory set: every request queries the
+# database
+PROMOTION_INDEX_MAX_AGE_SECONDS = float(os.getenv("PROMOTION_INDEX_MAX_AGE_SECONDS", 60))
+
+# session.info key flagging a transaction that wrote promotions
+PENDING_KEY = "promotions_changed"
+
+# When a promotion stops running; open-ended ones never do. Written exactly like the
+# expression of the partial index ix_promotions_running so the planner can match it.
+ENDS_AT = func.coalesce(Promotion.end_date, text("'infinity'::timestamptz"))
+
+def running(at: datetime):
+    """Promotions switched on and running at `at`: start_date <= at < end_date."""
+    return Promotion.is_active & (Promotion.start_date <= at) & (ENDS_AT > at)
+
+def not_running(at: datetime):
+    return or_(Promotion.is_active.is_not(True), Promotion.start_date > at, ENDS_AT <= at)
+
+def covers(service_id: int):
+    """Promotions that apply to a service: its own and those without a service."""
+    return Promotion.service_id.is_(None) | (Promotion.service_id == service_id)
+
+# Promotions applied to bookings without being redeemed: those without a redemption
+# cap, whose redemptions must be counted, and without a segment, whose customers must
+# be checked
+AUTOMATIC = (
+    Promotion.max_redemptions.is_(None)
+    & Promotion.max_redemptions_per_customer.is_(None)
+    & Promotion.segment.is_(None)
+)
+
+def automatic(promotion) -> bool:
+    return (
+        promotion.max_redemptions is None
+        and promotion.max_redemptions_per_customer is None
+        and promotion.segment is None
+    )
+
+class ActivePromotionIndex:
+    """
+    The promotions running right now, global and per service, held in memory.
+
+    The set only changes when a promotion starts, ends or is written. A timer
+    reloads it exactly at the next start or end boundary, right after a commit
+    that wrote promotions, and at least every `max_age` seconds. Until it has
+    loaded, after a failed reload, or if the timer is late for a boundary,
+    `active` returns None and callers query the database instead.
+    """
+
+    def __init__(self, max_age: float = PROMOTION_INDEX_MAX_AGE_SECONDS):
+        self.max_age = max_age
+        self.loaded_at: Optional[datetime] = None
+        self.next_boundary: Optional[datetime] = None
+        self._running: List[PromotionResponse] = []
+        self._global: List[PromotionResponse] = []
+        self._by_service: Dict[int, List[PromotionResponse]] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Bumped by invalidate, so a reload that raced a write is not trusted
+        self._generation = 0
+
+    def start(self):
+        if self.max_age > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="promotion-index")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        self.loaded_at = None
+
+    def invalidate(self):
+        """
+        Stop serving the set and reload it, e.g. after promotions were written;
+        until the reload is done callers read the database, so they see the write.
+        """
+        self._generation += 1
+        self.loaded_at = None
+        self._wake.set()
+
+    def active(self, service_id: Optional[int] = None) -> Optional[List[PromotionResponse]]:
+        """Running promotions in id order, or None when the set cannot be trusted right now."""
+        if self.loaded_at is None:
+            return None
+        if self.next_boundary is not None and datetime.now(timezone.utc) >= self.next_boundary:
+            return None
+        if service_id is None:
+            return self._running
+        return sorted(
+            itertools.chain(self._global, self._by_service.get(service_id, [])),
+            key=lambda promotion: promotion.id,
+        )
+
+    @property
+    def version(self) -> Optional[datetime]:
+        """When the set being served was loaded; None whenever `active` returns None."""
+        return self.loaded_at if self.active() is not None else None
+
+    async def refresh(self):
+        generation = self._generation
+        now = datetime.now(timezone.utc)
+        async with get_session_factory()() as session:
+            # Running and upcoming promotions only, read through the partial index
+            result = await session.execute(
+                select(Promotion).filter(Promotion.is_active, ENDS_AT > now).order_by(Promotion.id)
+            )
+            promotions = result.scalars().all()
+
+        running_now, boundaries = [], []
+        for promotion in promotions:
+            if promotion.start_date > now:
+                boundaries.append(promotion.start_date)
+            else:
+                running_now.append(PromotionResponse.model_validate(promotion))
+                if promotion.end_date is not None:
+                    boundaries.append(promotion.end_date)
+
+        by_service: Dict[int, List[PromotionResponse]] = {}
+        for promotion in running_now:
+            if promotion.service_id is not None:
+                by_service.setdefault(promotion.service_id, []).append(promotion)
+        self._running = running_now
+        self._global = [promotion for promotion in running_now if promotion.service_id is None]
+        self._by_service = by_service
+        self.next_boundary = min(boundaries, default=None)
+        if generation == self._generation:
+            self.loaded_at = now
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.loaded_at = None
+                logger.exception("Active promotion index refresh failed")
+
+            timeout = self.max_age
+            if self.loaded_at is not None and self.next_boundary is not None:
+                timeout = min(timeout, max((self.next_boundary - datetime.now(timezone.utc)).total_seconds(), 0))
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), timeout)
+
+promotion_index = ActivePromotionIndex()
+
+async def active_promotions(db: AsyncSession, service_id: Optional[int] = None) -> List:
+    """Running promotions in id order: from memory when possible, else from the database."""
+    promotions = promotion_index.active(service_id)
+    if promotions is not None:
+        return promotions
+    query = select(Promotion).filter(running(datetime.now(timezone.utc)))
+    if service_id is not None:
+        query = query.filter(covers(service_id))
+    result = await db.execute(query.order_by(Promotion.id))
+    return result.scalars().all()
+
+@event.listens_for(Session, "after_flush")
+def _collect_promotion_changes(session, flush_context):
+    if any(isinstance(obj, Promotion) for obj in itertools.chain(session.new, session.dirty, session.deleted)):
+        session.info[PENDING_KEY] = True
+
+@event.listens_for(Session, "after_commit")
+def _reload_promotions(session):
+    if session.info.pop(PENDING_KEY, False):
+        promotion_index.invalidate()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_promotion_changes(session):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,96 @@
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import RatingAggregate
+
+RATINGS = range(1, 6)
+
+# Dimensions of the aggregates and the key each feedback row contributes to.
+# Days are UTC calendar days of the feedback's creation.
+DIMENSIONS = """
+    (VALUES
+        ('overall', ''),
+        ('staff', a.staff_id::text),
+        ('service', a.service_id::text),
+        ('day', (f.created_at AT TIME ZONE 'UTC')::date::text)
+    ) d(dimension, key)
+"""
+
+HISTOGRAM_COLUMNS = ", ".join(f"rating_{rating}" for rating in RATINGS)
+
+# Per (dimension, key) contributions of a set of feedback rows, multiplied by a sign
+CONTRIBUTIONS = f"""
+    SELECT d.dimension, d.key,
+           sum({{sign}}) AS rating_count,
+           sum({{sign}} * f.rating) AS rating_sum,
+           {", ".join(f"coalesce(sum({{sign}}) FILTER (WHERE f.rating = {rating}), 0)" for rating in RATINGS)}
+    FROM feedback f
+    JOIN appointments a ON a.id = f.appointment_id
+    CROSS JOIN LATERAL {DIMENSIONS}
+    WHERE d.key IS NOT NULL AND {{scope}}
+    GROUP BY d.dimension, d.key
+    -- Rows are locked in key order so concurrent writers cannot deadlock
+    ORDER BY d.dimension, d.key
+"""
+
+# Add (sign 1) or remove (sign -1) feedback rows from the aggregates in one multi-row
+# upsert. It runs in the transaction of the feedback write, so the aggregates are
+# never out of step with the committed rows.
+APPLY_DELTA = text(f"""
+    INSERT INTO rating_aggregates (dimension, key, rating_count, rating_sum, {HISTOGRAM_COLUMNS})
+    {CONTRIBUTIONS.format(sign="CAST(:sign AS integer)", scope="f.id = ANY(:feedback_ids)")}
+    ON CONFLICT (dimension, key) DO UPDATE SET
+        rating_count = rating_aggregates.rating_count + EXCLUDED.rating_count,
+        rating_sum = rating_aggregates.rating_sum + EXCLUDED.rating_sum,
+        {", ".join(f"rating_{r} = rating_aggregates.rating_{r} + EXCLUDED.rating_{r}" for r in RATINGS)},
+        updated_at = now()
+""")
+
+# Recompute every aggregate from the feedback table, e.g. after loading data with COPY
+REBUILD_STATEMENTS = [
+    "DELETE FROM rating_aggregates",
+    f"""
+    INSERT INTO rating_aggregates (dimension, key, rating_count, rating_sum, {HISTOGRAM_COLUMNS})
+    {CONTRIBUTIONS.format(sign="1", scope="true")}
+    """,
+]
+
+async def apply_feedback(db: AsyncSession, feedback_ids: Iterable[int], sign: int = 1):
+    """
+    Add the given feedback rows to the aggregates, or remove them with sign=-1.
+
+    Call after the rows are flushed when adding, and before they are changed or
+    deleted when removing. The caller commits.
+    """
+    feedback_ids = list(feedback_ids)
+    if feedback_ids:
+        await db.execute(APPLY_DELTA, {"sign": sign, "feedback_ids": feedback_ids})
+
+def stats(aggregate: Optional[RatingAggregate]) -> Dict[str, Any]:
+    if aggregate is None or not aggregate.rating_count:
+        return {"count": 0, "average_rating": None, "histogram": {rating: 0 for rating in RATINGS}}
+    return {
+        "count": aggregate.rating_count,
+        "average_rating": aggregate.rating_sum / aggregate.rating_count,
+        "histogram": {rating: getattr(aggregate, f"rating_{rating}") for rating in RATINGS},
+    }
+
+async def get_rating_stats(db: AsyncSession, dimension: str, key: str = "") -> Dict[str, Any]:
+    """Count, average and histogram of one aggregate row; a single primary key lookup."""
+    return stats(await db.get(RatingAggregate, (dimension, key)))
+
+async def get_daily_rating_stats(db: AsyncSession, date_from: date, date_to: date) -> List[Dict[str, Any]]:
+    """Per-day stats for the days in [date_from, date_to] that have feedback."""
+    result = await db.execute(
+        select(RatingAggregate)
+        .filter(
+            RatingAggregate.dimension == "day",
+            RatingAggregate.key >= date_from.isoformat(),
+            RatingAggregate.key <= date_to.isoformat(),
+        )
+        .order_by(RatingAggregate.key)
+    )
+    return [{"date": aggregate.key, **stats(aggregate)} for aggregate in result.scalars().all()]
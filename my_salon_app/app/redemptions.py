@@ -0,0 +1,138 @@
+from datetime import datetime, timezone
+from typing import Optional, Sequence
+
+from sqlalchemy import select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Appointment, Promotion, PromotionRedemption
+from .segments import segment_index
+
+# Count a redemption against the customer's share of the promotion. The first one
+# inserts the counter row; later ones increment it only while it is below the cap,
+# in one statement, so concurrent bookings of the same customer cannot exceed it.
+# No row comes back once the cap is reached.
+CLAIM_CUSTOMER = text("""
+    INSERT INTO promotion_customer_redemptions AS r (promotion_id, customer_id, redemptions)
+    VALUES (:promotion_id, :customer_id, 1)
+    ON CONFLICT (promotion_id, customer_id) DO UPDATE SET redemptions = r.redemptions + 1
+    WHERE CAST(:cap AS integer) IS NULL OR r.redemptions < CAST(:cap AS integer)
+    RETURNING r.redemptions
+""")
+
+# Take one of the promotion's redemptions and record it, if the promotion is still
+# running and below its cap. Concurrent claims queue on the promotion's row lock and
+# re-check the cap once they get it, so the cap holds however many book at once.
+# The lock is held until commit, so this is the last statement of the transaction.
+# Like the release, it sets updated_at so the snapshot export picks up the new count.
+CLAIM = text("""
+    WITH claimed AS (
+        UPDATE promotions
+        SET redemption_count = redemption_count + 1, updated_at = now()
+        WHERE id = :promotion_id AND is_active
+          AND start_date <= now() AND coalesce(end_date, 'infinity'::timestamptz) > now()
+          AND (max_redemptions IS NULL OR redemption_count < max_redemptions)
+        RETURNING id
+    )
+    INSERT INTO promotion_redemptions (promotion_id, customer_id, appointment_id, discount_percent)
+    SELECT id, :customer_id, :appointment_id, :discount_percent FROM claimed
+    RETURNING id
+""")
+
+# Give the redemption of an appointment back to its promotion and customer
+RELEASE = text("""
+    WITH released AS (
+        DELETE FROM promotion_redemptions WHERE appointment_id = :appointment_id
+        RETURNING promotion_id, customer_id
+    ),
+    customer_counts AS (
+        UPDATE promotion_customer_redemptions r
+        SET redemptions = r.redemptions - 1
+        FROM released
+        WHERE r.promotion_id = released.promotion_id AND r.customer_id = released.customer_id
+    )
+    UPDATE promotions p
+    SET redemption_count = p.redemption_count - 1, updated_at = now()
+    FROM released
+    WHERE p.id = released.promotion_id
+    RETURNING p.id
+""")
+
+# Add the per-customer counters of merged duplicates to the survivor's
+MERGE_CUSTOMER_COUNTS = text("""
+    WITH moved AS (
+        DELETE FROM promotion_customer_redemptions
+        WHERE customer_id = ANY(:duplicate_ids)
+        RETURNING promotion_id, redemptions
+    )
+    INSERT INTO promotion_customer_redemptions AS r (promotion_id, customer_id, redemptions)
+    SELECT promotion_id, :survivor_id, sum(redemptions) FROM moved GROUP BY promotion_id
+    ON CONFLICT (promotion_id, customer_id) DO UPDATE SET redemptions = r.redemptions + excluded.redemptions
+""")
+
+class RedemptionLimitReached(ValueError):
+    """The promotion, or the customer's share of it, is used up."""
+
+async def redeem_promotion(db: AsyncSession, appointment: Appointment, promotion_id: int) -> Optional[float]:
+    """
+    Redeem a promotion for a new appointment and apply its discount.
+
+    Both caps are enforced with conditional writes rather than by counting
+    first, so they hold under any number of concurrent bookings. Returns the
+    discount, or None if the promotion does not exist; raises ValueError if it
+    does not apply to the appointment and RedemptionLimitReached if it is used
+    up. Nothing is kept on failure once the caller rolls back; the caller commits,
+    right away, since the claim holds the promotion's row lock until then.
+    """
+    result = await db.execute(select(Promotion).filter(Promotion.id == promotion_id))
+    promotion = result.scalars().first()
+    if promotion is None:
+        return None
+    now = datetime.now(timezone.utc)
+    if not promotion.is_active or promotion.start_date > now or (promotion.end_date and promotion.end_date <= now):
+        raise ValueError("Promotion is not running")
+    if promotion.service_id is not None and promotion.service_id != appointment.service_id:
+        raise ValueError("Promotion does not apply to this service")
+    if promotion.segment is not None and not await segment_index.contains(promotion.segment, appointment.customer_id):
+        raise ValueError("Promotion is not available to this customer")
+    # Once sold out, fail without queueing on the row lock; the claim still decides
+    if promotion.max_redemptions is not None and promotion.redemption_count >= promotion.max_redemptions:
+        raise RedemptionLimitReached("Promotion is fully redeemed")
+
+    # Raw SQL does not autoflush; the redemption references the appointment, and
+    # nothing is left to write after the claim
+    appointment.discount_percent = promotion.discount_percent
+    await db.flush()
+    claimed = await db.scalar(CLAIM_CUSTOMER, {
+        "promotion_id": promotion_id,
+        "customer_id": appointment.customer_id,
+        "cap": promotion.max_redemptions_per_customer,
+    })
+    if claimed is None:
+        raise RedemptionLimitReached("Promotion already redeemed the maximum number of times by this customer")
+
+    redemption_id = await db.scalar(CLAIM, {
+        "promotion_id": promotion_id,
+        "customer_id": appointment.customer_id,
+        "appointment_id": appointment.id,
+        "discount_percent": promotion.discount_percent,
+    })
+    if redemption_id is None:
+        raise RedemptionLimitReached("Promotion is fully redeemed")
+    return promotion.discount_percent
+
+async def release_redemption(db: AsyncSession, appointment_id: int) -> bool:
+    """
+    Give back the redemption of an appointment that is cancelled, deleted or
+    moved to another service. Returns whether it had one; the caller commits.
+    """
+    result = await db.execute(RELEASE, {"appointment_id": appointment_id})
+    return result.first() is not None
+
+async def merge_redemptions(db: AsyncSession, survivor_id: int, duplicate_ids: Sequence[int]):
+    """Move the redemptions of merged duplicate customers to the survivor; the caller commits."""
+    await db.execute(
+        update(PromotionRedemption)
+        .where(PromotionRedemption.customer_id.in_(duplicate_ids))
+        .values(customer_id=survivor_id)
+    )
+    await db.execute(MERGE_CUSTOMER_COUNTS, {"survivor_id": survivor_id, "duplicate_ids": list(duplicate_ids)})
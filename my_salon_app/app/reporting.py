@@ -0,0 +1,148 @@
+import logging
+import os
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Date, Float, Integer, String, column, func, literal, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import get_session_factory
+from .models import Service, ServiceCategory, Staff
+
+logger = logging.getLogger(__name__)
+
+# Seconds between refreshes of the reporting views in the API process; 0 disables them
+REPORT_REFRESH_INTERVAL_SECONDS = float(os.getenv("REPORT_REFRESH_INTERVAL_SECONDS", 300))
+# Minutes a staff member is available per calendar day, the denominator of utilization
+STAFF_AVAILABLE_MINUTES_PER_DAY = int(os.getenv("STAFF_AVAILABLE_MINUTES_PER_DAY", 480))
+
+# Advisory lock keeping API workers and the refresh script from refreshing at once
+REFRESH_LOCK_KEY = 0x5245504F5254
+
+# Appointments per UTC day, service and staff member (0 when unassigned), created by
+# migration 3c7f2a9d1e54 and rebuilt on the price snapshot by 5e2b8d4f7a91. Its unique
+# index on (day, service_id, staff_id) is what REFRESH ... CONCURRENTLY needs, and
+# serves the date range filters.
+daily_service_stats = table(
+    "report_daily_service_stats",
+    column("day", Date),
+    column("service_id", Integer),
+    column("category_id", Integer),  # 0 when the service has no category
+    column("staff_id", Integer),
+    column("bookings", Integer),
+    column("cancellations", Integer),
+    column("completions", Integer),
+    column("revenue", Float),  # price charged for completed appointments, as booked
+    column("booked_minutes", Integer),  # booked duration of appointments that were not cancelled
+)
+
+VIEWS = ("report_daily_service_stats",)
+
+GROUPINGS = ("day", "service", "category", "staff")
+
+# Column of the view and the table naming it, per group_by value
+DIMENSIONS = {
+    "day": (daily_service_stats.c.day, None),
+    "service": (daily_service_stats.c.service_id, Service),
+    "category": (daily_service_stats.c.category_id, ServiceCategory),
+    "staff": (daily_service_stats.c.staff_id, Staff),
+}
+
+async def refresh_reports(concurrently: bool = True) -> Dict[str, Any]:
+    """
+    Refresh the reporting views.
+
+    CONCURRENTLY keeps them readable while the new contents are computed;
+    without it the refresh is faster but blocks readers, which only suits a
+    fresh load.
+    """
+    started = time.perf_counter()
+    report = {"views": [], "skipped": False}
+    async with get_session_factory()() as session:
+        if not await session.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": REFRESH_LOCK_KEY}):
+            report["skipped"] = True
+            return report
+        for view in VIEWS:
+            await session.execute(text(f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if concurrently else ''}{view}"))
+            report["views"].append(view)
+        await session.commit()
+
+    report["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    logger.info("Reporting views refresh: %s", report)
+    return report
+
+def breakdown_query(group_by: str, date_from: date, date_to: date, *measures):
+    """Sum `measures` of the daily view per `group_by` key, with the key's name."""
+    key, named = DIMENSIONS[group_by]
+    if named is None:
+        query = select(key.label("key"), literal(None, String).label("name"), *measures).group_by(key)
+    else:
+        query = (
+            select(key.label("key"), named.name.label("name"), *measures)
+            .select_from(daily_service_stats)
+            .outerjoin(named, named.id == key)
+            .group_by(key, named.name)
+        )
+    return query.filter(daily_service_stats.c.day >= date_from, daily_service_stats.c.day <= date_to).order_by(key)
+
+async def get_revenue(db: AsyncSession, group_by: str, date_from: date, date_to: date) -> List[Dict[str, Any]]:
+    result = await db.execute(breakdown_query(
+        group_by, date_from, date_to,
+        func.sum(daily_service_stats.c.completions).label("completions"),
+        func.sum(daily_service_stats.c.revenue).label("revenue"),
+    ))
+    return [dict(row) for row in result.mappings()]
+
+async def get_cancellations(db: AsyncSession, group_by: str, date_from: date, date_to: date) -> List[Dict[str, Any]]:
+    result = await db.execute(breakdown_query(
+        group_by, date_from, date_to,
+        func.sum(daily_service_stats.c.bookings).label("bookings"),
+        func.sum(daily_service_stats.c.cancellations).label("cancellations"),
+    ))
+    return [
+        {**row, "cancellation_rate": round(100 * row["cancellations"] / row["bookings"], 2) if row["bookings"] else None}
+        for row in result.mappings()
+    ]
+
+async def get_utilization(
+    db: AsyncSession, date_from: date, date_to: date, staff_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Booked minutes of each staff member against STAFF_AVAILABLE_MINUTES_PER_DAY
+    for every day of the range. Active staff without bookings are listed at 0%.
+    """
+    available_minutes = STAFF_AVAILABLE_MINUTES_PER_DAY * ((date_to - date_from).days + 1)
+    booked = (
+        select(
+            daily_service_stats.c.staff_id,
+            func.sum(daily_service_stats.c.bookings - daily_service_stats.c.cancellations).label("appointments"),
+            func.sum(daily_service_stats.c.booked_minutes).label("booked_minutes"),
+        )
+        .filter(daily_service_stats.c.day >= date_from, daily_service_stats.c.day <= date_to)
+        .group_by(daily_service_stats.c.staff_id)
+        .subquery()
+    )
+    query = (
+        select(
+            Staff.id.label("staff_id"),
+            Staff.name,
+            func.coalesce(booked.c.appointments, 0).label("appointments"),
+            func.coalesce(booked.c.booked_minutes, 0).label("booked_minutes"),
+        )
+        .outerjoin(booked, booked.c.staff_id == Staff.id)
+        .filter(Staff.is_active.is_(True) | booked.c.staff_id.is_not(None))
+        .order_by(Staff.id)
+    )
+    if staff_id is not None:
+        query = query.filter(Staff.id == staff_id)
+
+    result = await db.execute(query)
+    return [
+        {
+            **row,
+            "available_minutes": available_minutes,
+            "utilization": round(100 * row["booked_minutes"] / available_minutes, 2) if available_minutes else None,
+        }
+        for row in result.mappings()
+    ]
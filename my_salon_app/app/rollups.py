@@ -0,0 +1,255 @@
+import itertools
+import logging
+import os
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, inspect, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .database import get_session_factory
+from .models import Appointment, Feedback, TrendRollup
+
+logger = logging.getLogger(__name__)
+
+# Dirty days recomputed per refresh transaction
+ROLLUP_REFRESH_BATCH_DAYS = int(os.getenv("ROLLUP_REFRESH_BATCH_DAYS", 31))
+# Seconds between rollup refreshes in the API process; 0 disables the background refresh
+ROLLUP_REFRESH_INTERVAL_SECONDS = float(os.getenv("ROLLUP_REFRESH_INTERVAL_SECONDS", 60))
+
+GRANULARITIES = ("day", "week", "month")
+DIMENSIONS = ("overall", "service", "staff")
+# Buckets returned when a trend request gives no date_from
+DEFAULT_BUCKETS = {"day": 30, "week": 12, "month": 12}
+
+# Advisory lock keeping API workers and the refresh script from recomputing the same
+# weeks and months at once
+BATCH_LOCK_KEY = 0x524F4C4C5550
+
+# Appointment attributes that feed the rollups; a change to anything else (notes,
+# customer) leaves them untouched
+APPOINTMENT_FIELDS = ("appointment_time", "status", "service_id", "staff_id")
+
+# Mark the UTC days of the given appointment times, and of the given appointments,
+# dirty. DO UPDATE rather than DO NOTHING: the row lock it takes keeps a refresh
+# from claiming the day before this transaction's changes are committed.
+MARK_DIRTY = text("""
+    INSERT INTO rollup_dirty_days (day)
+    SELECT day FROM (
+        SELECT (t AT TIME ZONE 'UTC')::date AS day FROM unnest(CAST(:times AS timestamptz[])) AS t
+        UNION
+        SELECT (appointment_time AT TIME ZONE 'UTC')::date FROM appointments WHERE id = ANY(CAST(:appointment_ids AS integer[]))
+    ) days
+    ORDER BY day
+    ON CONFLICT (day) DO UPDATE SET marked_at = now()
+""")
+
+# Claim a batch of dirty days, skipping rows a writer has not committed yet
+CLAIM_DAYS = text("""
+    DELETE FROM rollup_dirty_days
+    WHERE day IN (
+        SELECT day FROM rollup_dirty_days ORDER BY day LIMIT :batch_days FOR UPDATE SKIP LOCKED
+    )
+    RETURNING day
+""")
+
+# Recompute the daily rows of the claimed days from the raw tables. Each day is an
+# index range scan on appointments.appointment_time; revenue is the price charged as
+# booked, so service price edits do not change past buckets.
+REFRESH_DAYS = [
+    text("DELETE FROM trend_rollups WHERE granularity = 'day' AND bucket = ANY(CAST(:days AS date[]))"),
+    text("""
+        INSERT INTO trend_rollups (
+            granularity, dimension, key, bucket,
+            bookings, cancellations, completions, revenue, rating_count, rating_sum
+        )
+        SELECT 'day', dim.dimension, dim.key, d.day,
+               count(*),
+               count(*) FILTER (WHERE a.status = 'CANCELLED'),
+               count(*) FILTER (WHERE a.status = 'COMPLETED'),
+               coalesce(sum(a.price_at_booking * (1 - a.discount_percent / 100)) FILTER (WHERE a.status = 'COMPLETED'), 0),
+               count(f.id),
+               coalesce(sum(f.rating), 0)
+        FROM unnest(CAST(:days AS date[])) AS d(day)
+        JOIN appointments a
+          ON a.appointment_time >= d.day::timestamp AT TIME ZONE 'UTC'
+         AND a.appointment_time < (d.day + 1)::timestamp AT TIME ZONE 'UTC'
+        LEFT JOIN feedback f ON f.appointment_id = a.id
+        CROSS JOIN LATERAL (VALUES ('overall', 0), ('service', a.service_id), ('staff', a.staff_id)) dim(dimension, key)
+        WHERE dim.key IS NOT NULL
+        GROUP BY dim.dimension, dim.key, d.day
+    """),
+]
+
+# Weeks and months touching the claimed days are re-summed from the daily rows
+REFRESH_PERIODS = [
+    text("""
+        DELETE FROM trend_rollups
+        WHERE granularity = :granularity
+          AND bucket IN (SELECT DISTINCT date_trunc(:granularity, day)::date FROM unnest(CAST(:days AS date[])) AS day)
+    """),
+    text("""
+        INSERT INTO trend_rollups (
+            granularity, dimension, key, bucket,
+            bookings, cancellations, completions, revenue, rating_count, rating_sum
+        )
+        SELECT :granularity, r.dimension, r.key, p.bucket,
+               sum(r.bookings), sum(r.cancellations), sum(r.completions), sum(r.revenue),
+               sum(r.rating_count), sum(r.rating_sum)
+        FROM (
+            SELECT DISTINCT date_trunc(:granularity, day)::date AS bucket FROM unnest(CAST(:days AS date[])) AS day
+        ) p
+        JOIN trend_rollups r
+          ON r.granularity = 'day'
+         AND r.bucket >= p.bucket
+         AND r.bucket < (p.bucket + CAST('1 ' || :granularity AS interval))::date
+        GROUP BY r.dimension, r.key, p.bucket
+    """),
+]
+
+# Drop every rollup and queue every day with appointments, e.g. after loading data
+# with COPY or when the rollups are first created; the refresh then works through
+# the queue in batches
+RESET_STATEMENTS = [
+    "DELETE FROM trend_rollups",
+    """
+    INSERT INTO rollup_dirty_days (day)
+    SELECT DISTINCT (appointment_time AT TIME ZONE 'UTC')::date FROM appointments
+    ON CONFLICT (day) DO NOTHING
+    """,
+]
+
+def inputs_changed(obj, fields) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+@event.listens_for(Session, "after_flush")
+def _mark_dirty_days(session, flush_context):
+    """
+    Queue the days whose rollups a flush changes, in the same transaction.
+
+    A rescheduled appointment dirties both its old and its new day; feedback
+    dirties the day of its appointment.
+    """
+    times, appointment_ids = set(), set()
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Appointment):
+            if obj in session.dirty and not inputs_changed(obj, APPOINTMENT_FIELDS):
+                continue
+            times.add(obj.appointment_time)
+            times.update(inspect(obj).attrs.appointment_time.history.deleted)
+        elif isinstance(obj, Feedback):
+            if obj in session.dirty and not inputs_changed(obj, ("rating", "appointment_id")):
+                continue
+            appointment_ids.add(obj.appointment_id)
+            appointment_ids.update(inspect(obj).attrs.appointment_id.history.deleted)
+    times.discard(None)
+    appointment_ids.discard(None)
+    if times or appointment_ids:
+        session.connection().execute(MARK_DIRTY, {"times": list(times), "appointment_ids": list(appointment_ids)})
+
+async def refresh_rollups(batch_days: int = ROLLUP_REFRESH_BATCH_DAYS, max_batches: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Recompute the rollups of every dirty day, and of the weeks and months they
+    fall in, `batch_days` days per transaction.
+
+    Work is proportional to the number of changed days, not to the history.
+    """
+    started = time.perf_counter()
+    report = {"days": 0, "batches": 0, "skipped": False}
+    async with get_session_factory()() as session:
+        while max_batches is None or report["batches"] < max_batches:
+            if not await session.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": BATCH_LOCK_KEY}):
+                report["skipped"] = True
+                break
+            result = await session.execute(CLAIM_DAYS, {"batch_days": batch_days})
+            days = sorted(result.scalars().all())
+            if not days:
+                await session.commit()
+                break
+            for statement in REFRESH_DAYS:
+                await session.execute(statement, {"days": days})
+            for granularity in ("week", "month"):
+                for statement in REFRESH_PERIODS:
+                    await session.execute(statement, {"days": days, "granularity": granularity})
+            await session.commit()
+
+            report["batches"] += 1
+            report["days"] += len(days)
+            if len(days) < batch_days:
+                break
+
+    report["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    if report["days"]:
+        logger.info("Rollup refresh: %s", report)
+    return report
+
+def bucket_start(granularity: str, day: date) -> date:
+    """The bucket `day` falls in, as date_trunc computes it (weeks start on Monday)."""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+def trend_range(granularity: str, date_from: Optional[date], date_to: Optional[date]) -> Tuple[date, date]:
+    """
+    Resolve the dates of a trend request. date_to defaults to today and date_from
+    to DEFAULT_BUCKETS buckets back; date_from is moved to the start of its bucket
+    so the first bucket is included.
+    """
+    date_to = date_to or date.today()
+    if date_from is None:
+        buckets = DEFAULT_BUCKETS[granularity] - 1
+        date_from = bucket_start(granularity, date_to)
+        if granularity == "day":
+            date_from -= timedelta(days=buckets)
+        elif granularity == "week":
+            date_from -= timedelta(weeks=buckets)
+        else:
+            months = date_from.year * 12 + date_from.month - 1 - buckets
+            date_from = date(months // 12, months % 12 + 1, 1)
+    return bucket_start(granularity, date_from), date_to
+
+def trends_query(granularity: str, dimension: str, key: int, date_from: date, date_to: date):
+    """
+    Rollup rows of one dimension key between two dates, oldest bucket first.
+
+    A primary key range scan; its cost depends on the number of buckets
+    returned, not on the length of the history.
+    """
+    return (
+        select(TrendRollup)
+        .filter(
+            TrendRollup.granularity == granularity,
+            TrendRollup.dimension == dimension,
+            TrendRollup.key == key,
+            TrendRollup.bucket >= date_from,
+            TrendRollup.bucket <= date_to,
+        )
+        .order_by(TrendRollup.bucket)
+    )
+
+async def get_trends(
+    db: AsyncSession,
+    granularity: str,
+    dimension: str,
+    key: int,
+    date_from: date,
+    date_to: date,
+) -> List[Dict[str, Any]]:
+    result = await db.execute(trends_query(granularity, dimension, key, date_from, date_to))
+    return [
+        {
+            "bucket": row.bucket,
+            "bookings": row.bookings,
+            "cancellations": row.cancellations,
+            "completions": row.completions,
+            "revenue": row.revenue,
+            "rating_count": row.rating_count,
+            "average_rating": row.rating_sum / row.rating_count if row.rating_count else None,
+        }
+        for row in result.scalars().all()
+    ]
@@ -0,0 +1,65 @@
+import gzip
+import io
+from fastapi import APIRouter, File, HTTPException, UploadFile
+from typing import IO, Optional
+from app.bulk_import import import_format, import_records
+from app.snapshots import SNAPSHOT_TABLES, snapshot_runner
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"]
+)
+
+@router.post("/snapshots", status_code=202)
+async def start_snapshot_export(tables: Optional[str] = None, full: bool = False):
+    """
+    Start a Parquet snapshot export in the background.
+
+    `tables` is a comma-separated subset of the exported tables (default: all).
+    """
+    names = [name.strip() for name in tables.split(",") if name.strip()] if tables else None
+    unknown = set(names or []) - set(SNAPSHOT_TABLES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown snapshot tables: {', '.join(sorted(unknown))}")
+
+    if not await snapshot_runner.start(names, full=full):
+        raise HTTPException(status_code=409, detail="A snapshot export is already running")
+    return snapshot_runner.status()
+
+@router.get("/snapshots")
+async def get_snapshot_status():
+    """
+    Get the status of the running or last snapshot export and the stored watermarks.
+    """
+    return snapshot_runner.status()
+
+def open_upload(file: UploadFile) -> IO[str]:
+    """
+    Text stream over an uploaded file, decompressed when its name ends in .gz.
+
+    Nothing is read here: import_records reads and parses the stream in worker
+    threads, so the event loop never waits on the spooled upload.
+    """
+    raw = file.file
+    if (file.filename or "").lower().endswith(".gz"):
+        raw = gzip.GzipFile(fileobj=raw, mode="rb")
+    return io.TextIOWrapper(raw, encoding="utf-8", newline="")
+
+@router.post("/imports/{entity}")
+async def bulk_import(
+    entity: str,
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    on_conflict: str = "update",
+    dry_run: bool = False,
+):
+    """
+    Bulk import customers, services, staff or appointments from a CSV or NDJSON upload.
+
+    The format defaults to the file extension; .gz uploads are decompressed. Invalid
+    rows are skipped and listed in the report with their row number.
+    """
+    try:
+        return await import_records(entity, open_upload(file), format or import_format(file.filename), on_conflict, dry_run)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
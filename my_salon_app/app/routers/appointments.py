@@ -4,8 +4,13 @@ from sqlalchemy import select, func, and_
 from sqlalchemy.orm import joinedload
 from typing import List, Optional
 from datetime import datetime, date, timedelta
-from app.database import get_db
-from app.models import Appointment, Customer, Service, Staff, AppointmentStatus
+from app.database import get_db, get_db_with_timeout
+from app.export import export_response
+from app.loyalty import accrue_appointment
+from app.models import Appointment, Customer, Feedback, Service, Staff, AppointmentStatus
+from app.pricing import snapshot_price
+from app.rating_stats import apply_feedback
+from app.redemptions import RedemptionLimitReached, redeem_promotion, release_redemption
 from app.schemas import (
     AppointmentCreate, 
     AppointmentUpdate, 
@@ -19,6 +24,34 @@ router = APIRouter(
     tags=["appointments"]
 )
 
+def filter_appointments(
+    query,
+    customer_id: Optional[int] = None,
+    service_id: Optional[int] = None,
+    staff_id: Optional[int] = None,
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    """
+    Apply the read_appointments filters to a select or count query.
+    """
+    if customer_id:
+        query = query.filter(Appointment.customer_id == customer_id)
+    if service_id:
+        query = query.filter(Appointment.service_id == service_id)
+    if staff_id:
+        query = query.filter(Appointment.staff_id == staff_id)
+    if status:
+        query = query.filter(Appointment.status == status)
+    if date_from:
+        date_from_dt = datetime.combine(date_from, datetime.min.time())
+        query = query.filter(Appointment.appointment_time >= date_from_dt)
+    if date_to:
+        date_to_dt = datetime.combine(date_to, datetime.max.time())
+        query = query.filter(Appointment.appointment_time <= date_to_dt)
+    return query
+
 @router.post("", response_model=AppointmentResponse)
 async def create_appointment(appointment: AppointmentCreate, db: AsyncSession = Depends(get_db)):
     """
@@ -52,8 +85,22 @@ async def create_appointment(appointment: AppointmentCreate, db: AsyncSession =
         status=AppointmentStatus.UPCOMING,
         notes=appointment.notes
     )
+    await snapshot_price(db, db_appointment, service)
     
     db.add(db_appointment)
+    
+    # Redeeming a promotion replaces the automatic discount; a used-up promotion
+    # fails the booking with 409 rather than booking it at full price
+    if appointment.promotion_id is not None:
+        try:
+            redeemed = await redeem_promotion(db, db_appointment, appointment.promotion_id)
+        except RedemptionLimitReached as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if redeemed is None:
+            raise HTTPException(status_code=404, detail="Promotion not found")
+    
     await db.commit()
     await db.refresh(db_appointment)
     return db_appointment
@@ -68,28 +115,12 @@ async def read_appointments(
     status: Optional[str] = None,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db_with_timeout("read_appointments", 5000))
 ):
     """
     Retrieve appointments with optional filtering.
     """
-    query = select(Appointment)
-    
-    # Apply filters if provided
-    if customer_id:
-        query = query.filter(Appointment.customer_id == customer_id)
-    if service_id:
-        query = query.filter(Appointment.service_id == service_id)
-    if staff_id:
-        query = query.filter(Appointment.staff_id == staff_id)
-    if status:
-        query = query.filter(Appointment.status == status)
-    if date_from:
-        date_from_dt = datetime.combine(date_from, datetime.min.time())
-        query = query.filter(Appointment.appointment_time >= date_from_dt)
-    if date_to:
-        date_to_dt = datetime.combine(date_to, datetime.max.time())
-        query = query.filter(Appointment.appointment_time <= date_to_dt)
+    query = filter_appointments(select(Appointment), customer_id, service_id, staff_id, status, date_from, date_to)
     
     # Apply pagination
     query = query.offset(skip).limit(limit)
@@ -98,27 +129,32 @@ async def read_appointments(
     appointments = result.scalars().all()
     
     # Get total count for pagination
-    count_query = select(func.count()).select_from(Appointment)
-    if customer_id:
-        count_query = count_query.filter(Appointment.customer_id == customer_id)
-    if service_id:
-        count_query = count_query.filter(Appointment.service_id == service_id)
-    if staff_id:
-        count_query = count_query.filter(Appointment.staff_id == staff_id)
-    if status:
-        count_query = count_query.filter(Appointment.status == status)
-    if date_from:
-        date_from_dt = datetime.combine(date_from, datetime.min.time())
-        count_query = count_query.filter(Appointment.appointment_time >= date_from_dt)
-    if date_to:
-        date_to_dt = datetime.combine(date_to, datetime.max.time())
-        count_query = count_query.filter(Appointment.appointment_time <= date_to_dt)
+    count_query = filter_appointments(
+        select(func.count()).select_from(Appointment), customer_id, service_id, staff_id, status, date_from, date_to
+    )
     
     count_result = await db.execute(count_query)
     total = count_result.scalar()
     
     return {"items": appointments, "total": total}
 
+@router.get("/export")
+async def export_appointments(
+    format: str = "ndjson",
+    gzip: bool = False,
+    customer_id: Optional[int] = None,
+    service_id: Optional[int] = None,
+    staff_id: Optional[int] = None,
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    """
+    Export all appointments matching the filters as NDJSON or CSV.
+    """
+    query = filter_appointments(select(Appointment), customer_id, service_id, staff_id, status, date_from, date_to)
+    return export_response(query.order_by(Appointment.id), AppointmentResponse, "appointments", format, gzip)
+
 @router.get("/{appointment_id}", response_model=AppointmentDetailResponse)
 async def read_appointment(appointment_id: int, db: AsyncSession = Depends(get_db)):
     """
@@ -175,9 +211,37 @@ async def update_appointment(
     
     # Update only the fields that are provided
     update_data = appointment.model_dump(exclude_unset=True)
+    
+    # Feedback on the appointment counts towards its staff member and service, so a
+    # reassignment moves it between rating aggregates
+    feedback_ids = []
+    if any(key in update_data and update_data[key] != getattr(db_appointment, key) for key in ("staff_id", "service_id")):
+        feedback_result = await db.execute(select(Feedback.id).filter(Feedback.appointment_id == appointment_id))
+        feedback_ids = feedback_result.scalars().all()
+        await apply_feedback(db, feedback_ids, sign=-1)
+    
+    # Booking another service re-prices the appointment at today's price and gives
+    # back a redeemed promotion, which may not cover the new service
+    if appointment.service_id is not None and appointment.service_id != db_appointment.service_id:
+        await snapshot_price(db, db_appointment, service)
+        await release_redemption(db, appointment_id)
+    
+    was_cancelled = db_appointment.status == AppointmentStatus.CANCELLED
     for key, value in update_data.items():
         setattr(db_appointment, key, value)
     
+    # A cancelled booking frees its redemption for other customers
+    if db_appointment.status == AppointmentStatus.CANCELLED and not was_cancelled:
+        await release_redemption(db, appointment_id)
+    
+    if feedback_ids:
+        await db.flush()
+        await apply_feedback(db, feedback_ids)
+    
+    # Completing the appointment credits its loyalty points in the same transaction
+    if db_appointment.status == AppointmentStatus.COMPLETED:
+        await accrue_appointment(db, appointment_id)
+    
     await db.commit()
     await db.refresh(db_appointment)
     return db_appointment
@@ -193,6 +257,7 @@ async def delete_appointment(appointment_id: int, db: AsyncSession = Depends(get
     if appointment is None:
         raise HTTPException(status_code=404, detail="Appointment not found")
     
+    await release_redemption(db, appointment_id)
     await db.delete(appointment)
     await db.commit()
     
@@ -202,7 +267,7 @@ async def delete_appointment(appointment_id: int, db: AsyncSession = Depends(get
 async def get_today_appointments(
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db_with_timeout("get_today_appointments", 5000))
 ):
     """
     Get all appointments for today.
@@ -258,7 +323,17 @@ async def update_appointment_status(
     if appointment is None:
         raise HTTPException(status_code=404, detail="Appointment not found")
     
+    # A cancelled booking frees its redemption for other customers
+    if status == AppointmentStatus.CANCELLED and appointment.status != AppointmentStatus.CANCELLED:
+        await release_redemption(db, appointment_id)
+    
     appointment.status = status
+    
+    # Completing the appointment credits its loyalty points in the same transaction;
+    # accruing again is a no-op, so repeated or concurrent requests credit once
+    if status == AppointmentStatus.COMPLETED:
+        await accrue_appointment(db, appointment_id)
+    
     await db.commit()
     await db.refresh(appointment)
     
@@ -1,16 +1,100 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, func
-from typing import List, Optional
-from app.database import get_db
-from app.models import Customer, Appointment
-from app.schemas import CustomerCreate, CustomerUpdate, CustomerResponse, CustomerListResponse, AppointmentListResponse
+from sqlalchemy import select, update, delete, func, or_
+from typing import Any, Dict, List, Optional
+from app.customer_overview import get_customer_overview
+from app.database import get_db, get_db_with_timeout
+from app.dedupe import merge_customers
+from app.export import export_response
+from app.loyalty import adjust_points, record_opening_balance, set_balance
+from app.models import Customer, Appointment, LoyaltyTransaction, LoyaltyTransactionType
+from app.promotion_index import active_promotions
+from app.schemas import (
+    CustomerCreate,
+    CustomerUpdate,
+    CustomerResponse,
+    CustomerListResponse,
+    CustomerMergeRequest,
+    CustomerOverviewResponse,
+    LoyaltyAdjustment,
+    LoyaltyAdjustmentResponse,
+    LoyaltyLedgerResponse,
+    AppointmentListResponse,
+    PromotionListResponse
+)
+from app.segments import segment_index
 
 router = APIRouter(
     prefix="/customers",
     tags=["customers"]
 )
 
+# Query parameters filtering on preferences, e.g. ?pref.preferred_day=Saturday
+PREFERENCE_PREFIX = "pref."
+
+def preference_filters(request: Request) -> Dict[str, List[str]]:
+    """
+    Collect the pref.* query parameters as preference path -> accepted values.
+    """
+    filters: Dict[str, List[str]] = {}
+    for key, value in request.query_params.multi_items():
+        if key.startswith(PREFERENCE_PREFIX) and len(key) > len(PREFERENCE_PREFIX):
+            filters.setdefault(key[len(PREFERENCE_PREFIX):], []).append(value)
+    return filters
+
+def preference_documents(path: str, value: str) -> List[Dict[str, Any]]:
+    """
+    JSON documents that preferences must contain for `path` to match `value`.
+
+    Query strings carry text, so a value that is also a JSON number, boolean or
+    null matches that too, and a value inside a list matches as well:
+    pref.preferred_day=Saturday matches {"preferred_day": ["Saturday", "Sunday"]}.
+    """
+    values: List[Any] = [value]
+    try:
+        parsed = json.loads(value)
+    except ValueError:
+        parsed = value
+    if parsed is None or isinstance(parsed, (bool, int, float)):
+        values.append(parsed)
+
+    documents = []
+    for candidate in values:
+        for leaf in (candidate, [candidate]):
+            # Dotted paths address nested objects: pref.contact.channel=sms
+            for key in reversed(path.split(".")):
+                leaf = {key: leaf}
+            documents.append(leaf)
+    return documents
+
+def filter_customers(
+    query,
+    name: Optional[str] = None,
+    email: Optional[str] = None,
+    phone: Optional[str] = None,
+    preferences: Optional[Dict[str, List[str]]] = None,
+):
+    """
+    Apply the read_customers filters to a select or count query.
+
+    Preference filters are JSONB containment (@>) tests, answered by the GIN
+    index on customers.preferences; several values for one path match any of them.
+    """
+    if name:
+        query = query.filter(Customer.name.ilike(f"%{name}%"))
+    if email:
+        query = query.filter(Customer.email.ilike(f"%{email}%"))
+    if phone:
+        query = query.filter(Customer.phone.ilike(f"%{phone}%"))
+    for path, values in (preferences or {}).items():
+        query = query.filter(or_(*(
+            Customer.preferences.contains(document)
+            for value in values
+            for document in preference_documents(path, value)
+        )))
+    return query
+
 @router.post("", response_model=CustomerResponse)
 async def create_customer(customer: CustomerCreate, db: AsyncSession = Depends(get_db)):
     """
@@ -32,31 +116,30 @@ async def create_customer(customer: CustomerCreate, db: AsyncSession = Depends(g
     # Create customer
     db_customer = Customer(**customer.model_dump())
     db.add(db_customer)
+    await db.flush()
+    record_opening_balance(db, db_customer)
     await db.commit()
     await db.refresh(db_customer)
     return db_customer
 
 @router.get("", response_model=CustomerListResponse)
 async def read_customers(
+    request: Request,
     skip: int = 0, 
     limit: int = 100,
     name: Optional[str] = None,
     email: Optional[str] = None,
     phone: Optional[str] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db_with_timeout("read_customers", 3000))
 ):
     """
     Retrieve customers with optional filtering.
+
+    Preferences are filtered with pref.<key>=<value> query parameters, e.g.
+    ?pref.preferred_day=Saturday&pref.preferred_time=morning.
     """
-    query = select(Customer)
-    
-    # Apply filters if provided
-    if name:
-        query = query.filter(Customer.name.ilike(f"%{name}%"))
-    if email:
-        query = query.filter(Customer.email.ilike(f"%{email}%"))
-    if phone:
-        query = query.filter(Customer.phone.ilike(f"%{phone}%"))
+    preferences = preference_filters(request)
+    query = filter_customers(select(Customer), name, email, phone, preferences)
     
     # Apply pagination
     query = query.offset(skip).limit(limit)
@@ -65,19 +148,28 @@ async def read_customers(
     customers = result.scalars().all()
     
     # Get total count for pagination
-    count_query = select(func.count()).select_from(Customer)
-    if name:
-        count_query = count_query.filter(Customer.name.ilike(f"%{name}%"))
-    if email:
-        count_query = count_query.filter(Customer.email.ilike(f"%{email}%"))
-    if phone:
-        count_query = count_query.filter(Customer.phone.ilike(f"%{phone}%"))
+    count_query = filter_customers(select(func.count()).select_from(Customer), name, email, phone, preferences)
     
     count_result = await db.execute(count_query)
     total = count_result.scalar()
     
     return {"items": customers, "total": total}
 
+@router.get("/export")
+async def export_customers(
+    request: Request,
+    format: str = "ndjson",
+    gzip: bool = False,
+    name: Optional[str] = None,
+    email: Optional[str] = None,
+    phone: Optional[str] = None,
+):
+    """
+    Export all customers matching the filters as NDJSON or CSV.
+    """
+    query = filter_customers(select(Customer), name, email, phone, preference_filters(request))
+    return export_response(query.order_by(Customer.id), CustomerResponse, "customers", format, gzip)
+
 @router.get("/{customer_id}", response_model=CustomerResponse)
 async def read_customer(customer_id: int, db: AsyncSession = Depends(get_db)):
     """
@@ -120,11 +212,18 @@ async def update_customer(
         if existing_customer:
             raise HTTPException(status_code=400, detail="Customer with this email already exists")
     
-    # Update only the fields that are provided
+    # Update only the fields that are provided; the balance only changes through the ledger
     update_data = customer.model_dump(exclude_unset=True)
+    loyalty_points = update_data.pop("loyalty_points", None)
     for key, value in update_data.items():
         setattr(db_customer, key, value)
     
+    if loyalty_points is not None:
+        try:
+            await set_balance(db, customer_id, loyalty_points, note="Balance set by customer update")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
     await db.commit()
     await db.refresh(db_customer)
     return db_customer
@@ -145,12 +244,126 @@ async def delete_customer(customer_id: int, db: AsyncSession = Depends(get_db)):
     
     return {"message": "Customer deleted successfully"}
 
+@router.get("/{customer_id}/overview", response_model=CustomerOverviewResponse)
+async def read_customer_overview(
+    customer_id: int,
+    limit: int = Query(5, ge=1, le=50),
+    db: AsyncSession = Depends(get_db_with_timeout("read_customer_overview", 3000))
+):
+    """
+    Get the CRM overview of a customer: profile, upcoming and recent appointments,
+    visit and spend totals, average rating and loyalty points, in one query.
+    """
+    overview = await get_customer_overview(db, customer_id, limit)
+    if overview is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    
+    return overview
+
+@router.post("/{customer_id}/merge", response_model=CustomerResponse)
+async def merge_customer_duplicates(
+    customer_id: int,
+    merge: CustomerMergeRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Merge duplicate customers into this one.
+
+    Appointments and feedback move to this customer, loyalty points are added up
+    and the duplicates are deleted, all in one transaction.
+    """
+    if customer_id in merge.duplicate_ids:
+        raise HTTPException(status_code=400, detail="A customer cannot be merged into itself")
+    
+    customer = await merge_customers(db, customer_id, merge.duplicate_ids)
+    if customer is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    
+    await db.commit()
+    return customer
+
+@router.get("/{customer_id}/loyalty", response_model=LoyaltyLedgerResponse)
+async def read_customer_loyalty(
+    customer_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get the loyalty balance of a customer and its ledger, newest entries first.
+    """
+    balance = await db.scalar(select(Customer.loyalty_points).filter(Customer.id == customer_id))
+    if balance is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    
+    query = (
+        select(LoyaltyTransaction)
+        .filter(LoyaltyTransaction.customer_id == customer_id)
+        .order_by(LoyaltyTransaction.id.desc())
+        .offset(skip)
+        .limit(limit)
+    )
+    result = await db.execute(query)
+    transactions = result.scalars().all()
+    
+    count_query = select(func.count()).select_from(LoyaltyTransaction).filter(LoyaltyTransaction.customer_id == customer_id)
+    total = await db.scalar(count_query)
+    
+    return {"balance": balance, "items": transactions, "total": total}
+
+@router.post("/{customer_id}/loyalty", response_model=LoyaltyAdjustmentResponse)
+async def adjust_customer_loyalty(
+    customer_id: int,
+    adjustment: LoyaltyAdjustment,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Redeem or adjust loyalty points. Redemptions fail with 400 rather than
+    overdrawing the balance, however many are made concurrently.
+    """
+    if adjustment.type not in (LoyaltyTransactionType.REDEMPTION, LoyaltyTransactionType.ADJUSTMENT):
+        raise HTTPException(status_code=400, detail="Only redemptions and adjustments can be recorded manually")
+    if adjustment.type == LoyaltyTransactionType.REDEMPTION and adjustment.points >= 0:
+        raise HTTPException(status_code=400, detail="Redemptions must have negative points")
+    
+    try:
+        adjusted = await adjust_points(db, customer_id, adjustment.points, adjustment.type, adjustment.note)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if adjusted is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    
+    balance, transaction = adjusted
+    await db.commit()
+    await db.refresh(transaction)
+    return {"balance": balance, "transaction": transaction}
+
+@router.get("/{customer_id}/promotions", response_model=PromotionListResponse)
+async def read_customer_promotions(
+    customer_id: int,
+    service_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get the running promotions available to a customer (optionally for a
+    service): untargeted ones and those whose segment includes the customer.
+    """
+    exists = await db.scalar(select(Customer.id).filter(Customer.id == customer_id))
+    if exists is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    
+    promotions = [
+        promotion for promotion in await active_promotions(db, service_id)
+        if promotion.segment is None or await segment_index.contains(promotion.segment, customer_id)
+    ]
+    return {"items": promotions, "total": len(promotions)}
+
 @router.get("/{customer_id}/appointments", response_model=AppointmentListResponse)
 async def get_customer_appointments(
     customer_id: int, 
     skip: int = 0, 
     limit: int = 100,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db_with_timeout("get_customer_appointments", 5000))
 ):
     """
     Get all appointments for a specific customer.
@@ -2,15 +2,45 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from typing import List, Optional
-from app.database import get_db
+from datetime import date, timedelta
+from app.database import get_db, get_db_with_timeout
+from app.export import export_response
 from app.models import Feedback, Appointment, Customer
-from app.schemas import FeedbackCreate, FeedbackUpdate, FeedbackResponse, FeedbackListResponse
+from app.rating_stats import apply_feedback, get_daily_rating_stats, get_rating_stats
+from app.schemas import (
+    FeedbackCreate,
+    FeedbackUpdate,
+    FeedbackResponse,
+    FeedbackListResponse,
+    RatingStatsResponse,
+    DailyRatingStatsResponse
+)
 
 router = APIRouter(
     prefix="/feedback",
     tags=["feedback"]
 )
 
+def filter_feedback(
+    query,
+    customer_id: Optional[int] = None,
+    appointment_id: Optional[int] = None,
+    min_rating: Optional[int] = None,
+    max_rating: Optional[int] = None,
+):
+    """
+    Apply the read_feedback filters to a select or count query.
+    """
+    if customer_id:
+        query = query.filter(Feedback.customer_id == customer_id)
+    if appointment_id:
+        query = query.filter(Feedback.appointment_id == appointment_id)
+    if min_rating is not None:
+        query = query.filter(Feedback.rating >= min_rating)
+    if max_rating is not None:
+        query = query.filter(Feedback.rating <= max_rating)
+    return query
+
 @router.post("", response_model=FeedbackResponse)
 async def create_feedback(feedback: FeedbackCreate, db: AsyncSession = Depends(get_db)):
     """
@@ -38,6 +68,8 @@ async def create_feedback(feedback: FeedbackCreate, db: AsyncSession = Depends(g
     # Create feedback
     db_feedback = Feedback(**feedback.model_dump())
     db.add(db_feedback)
+    await db.flush()
+    await apply_feedback(db, [db_feedback.id])
     await db.commit()
     await db.refresh(db_feedback)
     return db_feedback
@@ -50,22 +82,12 @@ async def read_feedback(
     appointment_id: Optional[int] = None,
     min_rating: Optional[int] = None,
     max_rating: Optional[int] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db_with_timeout("read_feedback", 5000))
 ):
     """
     Retrieve feedback entries with optional filtering.
     """
-    query = select(Feedback)
-    
-    # Apply filters if provided
-    if customer_id:
-        query = query.filter(Feedback.customer_id == customer_id)
-    if appointment_id:
-        query = query.filter(Feedback.appointment_id == appointment_id)
-    if min_rating is not None:
-        query = query.filter(Feedback.rating >= min_rating)
-    if max_rating is not None:
-        query = query.filter(Feedback.rating <= max_rating)
+    query = filter_feedback(select(Feedback), customer_id, appointment_id, min_rating, max_rating)
     
     # Apply pagination
     query = query.offset(skip).limit(limit)
@@ -74,21 +96,77 @@ async def read_feedback(
     feedback_entries = result.scalars().all()
     
     # Get total count for pagination
-    count_query = select(func.count()).select_from(Feedback)
-    if customer_id:
-        count_query = count_query.filter(Feedback.customer_id == customer_id)
-    if appointment_id:
-        count_query = count_query.filter(Feedback.appointment_id == appointment_id)
-    if min_rating is not None:
-        count_query = count_query.filter(Feedback.rating >= min_rating)
-    if max_rating is not None:
-        count_query = count_query.filter(Feedback.rating <= max_rating)
+    count_query = filter_feedback(
+        select(func.count()).select_from(Feedback), customer_id, appointment_id, min_rating, max_rating
+    )
     
     count_result = await db.execute(count_query)
     total = count_result.scalar()
     
     return {"items": feedback_entries, "total": total}
 
+@router.get("/export")
+async def export_feedback(
+    format: str = "ndjson",
+    gzip: bool = False,
+    customer_id: Optional[int] = None,
+    appointment_id: Optional[int] = None,
+    min_rating: Optional[int] = None,
+    max_rating: Optional[int] = None,
+):
+    """
+    Export all feedback entries matching the filters as NDJSON or CSV.
+    """
+    query = filter_feedback(select(Feedback), customer_id, appointment_id, min_rating, max_rating)
+    return export_response(query.order_by(Feedback.id), FeedbackResponse, "feedback", format, gzip)
+
+# The stats routes are declared before /{feedback_id}, which would otherwise match /stats
+@router.get("/stats/average", response_model=dict)
+async def get_average_rating(db: AsyncSession = Depends(get_db)):
+    """
+    Get the average rating across all feedback, read from the maintained aggregates.
+    """
+    stats = await get_rating_stats(db, "overall")
+    return {"average_rating": float(stats["average_rating"] or 0)}
+
+@router.get("/stats", response_model=RatingStatsResponse)
+async def get_rating_summary(db: AsyncSession = Depends(get_db)):
+    """
+    Get the feedback count, average rating and rating histogram across all feedback.
+    """
+    return await get_rating_stats(db, "overall")
+
+@router.get("/stats/staff/{staff_id}", response_model=RatingStatsResponse)
+async def get_staff_rating_stats(staff_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Get rating statistics for appointments served by a staff member.
+    """
+    return await get_rating_stats(db, "staff", str(staff_id))
+
+@router.get("/stats/services/{service_id}", response_model=RatingStatsResponse)
+async def get_service_rating_stats(service_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Get rating statistics for a service.
+    """
+    return await get_rating_stats(db, "service", str(service_id))
+
+@router.get("/stats/daily", response_model=DailyRatingStatsResponse)
+async def get_daily_rating_summary(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get rating statistics per UTC day of feedback creation (default: the last 30 days).
+    Days without feedback are omitted.
+    """
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    
+    return {"items": await get_daily_rating_stats(db, date_from, date_to)}
+
 @router.get("/{feedback_id}", response_model=FeedbackResponse)
 async def read_feedback_by_id(feedback_id: int, db: AsyncSession = Depends(get_db)):
     """
@@ -119,9 +197,20 @@ async def update_feedback(
     
     # Update only the fields that are provided
     update_data = feedback.model_dump(exclude_unset=True)
+    # Edited comments are re-scored by the sentiment pipeline unless a score is supplied
+    if "comments" in update_data and update_data["comments"] != db_feedback.comments:
+        update_data.setdefault("sentiment_score", None)
+    rating_changed = "rating" in update_data and update_data["rating"] != db_feedback.rating
+    if rating_changed:
+        # Take the old rating out of the aggregates before the row changes
+        await apply_feedback(db, [feedback_id], sign=-1)
     for key, value in update_data.items():
         setattr(db_feedback, key, value)
     
+    if rating_changed:
+        await db.flush()
+        await apply_feedback(db, [feedback_id])
+    
     await db.commit()
     await db.refresh(db_feedback)
     return db_feedback
@@ -137,6 +226,7 @@ async def delete_feedback(feedback_id: int, db: AsyncSession = Depends(get_db)):
     if feedback is None:
         raise HTTPException(status_code=404, detail="Feedback not found")
     
+    await apply_feedback(db, [feedback_id], sign=-1)
     await db.delete(feedback)
     await db.commit()
     
@@ -154,16 +244,3 @@ async def get_feedback_by_appointment(appointment_id: int, db: AsyncSession = De
         raise HTTPException(status_code=404, detail="Feedback not found for this appointment")
     
     return feedback
-
-@router.get("/stats/average", response_model=dict)
-async def get_average_rating(db: AsyncSession = Depends(get_db)):
-    """
-    Get the average rating across all feedback.
-    """
-    result = await db.execute(select(func.avg(Feedback.rating)))
-    average_rating = result.scalar()
-    
-    if average_rating is None:
-        average_rating = 0
-    
-    return {"average_rating": float(average_rating)}
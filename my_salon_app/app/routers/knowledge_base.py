@@ -2,7 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from typing import List, Optional
-from app.database import get_db
+from app.database import get_db, get_db_with_timeout
+from app.export import export_response
 from app.models import KnowledgeBase
 from app.schemas import KnowledgeBaseCreate, KnowledgeBaseUpdate, KnowledgeBaseResponse, KnowledgeBaseListResponse
 
@@ -11,6 +12,20 @@ router = APIRouter(
     tags=["knowledge_base"]
 )
 
+def filter_knowledge_entries(
+    query,
+    question: Optional[str] = None,
+    category: Optional[str] = None,
+):
+    """
+    Apply the read_knowledge_entries filters to a select or count query.
+    """
+    if question:
+        query = query.filter(KnowledgeBase.question.ilike(f"%{question}%"))
+    if category:
+        query = query.filter(KnowledgeBase.category == category)
+    return query
+
 @router.post("", response_model=KnowledgeBaseResponse)
 async def create_knowledge_entry(entry: KnowledgeBaseCreate, db: AsyncSession = Depends(get_db)):
     """
@@ -29,18 +44,12 @@ async def read_knowledge_entries(
     limit: int = 100,
     question: Optional[str] = None,
     category: Optional[str] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db_with_timeout("read_knowledge_entries", 3000))
 ):
     """
     Retrieve knowledge base entries with optional filtering.
     """
-    query = select(KnowledgeBase)
-    
-    # Apply filters if provided
-    if question:
-        query = query.filter(KnowledgeBase.question.ilike(f"%{question}%"))
-    if category:
-        query = query.filter(KnowledgeBase.category == category)
+    query = filter_knowledge_entries(select(KnowledgeBase), question, category)
     
     # Apply pagination
     query = query.offset(skip).limit(limit)
@@ -49,17 +58,26 @@ async def read_knowledge_entries(
     entries = result.scalars().all()
     
     # Get total count for pagination
-    count_query = select(func.count()).select_from(KnowledgeBase)
-    if question:
-        count_query = count_query.filter(KnowledgeBase.question.ilike(f"%{question}%"))
-    if category:
-        count_query = count_query.filter(KnowledgeBase.category == category)
+    count_query = filter_knowledge_entries(select(func.count()).select_from(KnowledgeBase), question, category)
     
     count_result = await db.execute(count_query)
     total = count_result.scalar()
     
     return {"items": entries, "total": total}
 
+@router.get("/export")
+async def export_knowledge_entries(
+    format: str = "ndjson",
+    gzip: bool = False,
+    question: Optional[str] = None,
+    category: Optional[str] = None,
+):
+    """
+    Export all knowledge base entries matching the filters as NDJSON or CSV.
+    """
+    query = filter_knowledge_entries(select(KnowledgeBase), question, category)
+    return export_response(query.order_by(KnowledgeBase.id), KnowledgeBaseResponse, "knowledge_base", format, gzip)
+
 @router.get("/{entry_id}", response_model=KnowledgeBaseResponse)
 async def read_knowledge_entry(entry_id: int, db: AsyncSession = Depends(get_db)):
     """
@@ -118,7 +136,7 @@ async def search_knowledge_base(
     query: str = Query(..., min_length=1),
     skip: int = 0, 
     limit: int = 100,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db_with_timeout("search_knowledge_base", 3000))
 ):
     """
     Search knowledge base by question or answer.
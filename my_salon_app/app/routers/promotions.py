@@ -2,16 +2,41 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from typing import List, Optional
-from datetime import datetime
-from app.database import get_db
-from app.models import Promotion, Service
-from app.schemas import PromotionCreate, PromotionUpdate, PromotionResponse, PromotionListResponse
+from datetime import datetime, timezone
+from app.database import get_db, get_db_with_timeout
+from app.export import export_response
+from app.models import Promotion, PromotionRedemption, Service
+from app.promotion_index import active_promotions, not_running, running
+from app.schemas import (
+    PromotionCreate, PromotionUpdate, PromotionResponse, PromotionListResponse,
+    PromotionRedemptionListResponse, PromotionAudienceResponse
+)
+from app.segments import is_segment, members, segment_index
 
 router = APIRouter(
     prefix="/promotions",
     tags=["promotions"]
 )
 
+def filter_promotions(
+    query,
+    name: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    service_id: Optional[int] = None,
+):
+    """
+    Apply the read_promotions filters to a select or count query.
+    """
+    if name:
+        query = query.filter(Promotion.title.ilike(f"%{name}%"))
+    if is_active is not None:
+        # Active means switched on and running now
+        now = datetime.now(timezone.utc)
+        query = query.filter(running(now) if is_active else not_running(now))
+    if service_id:
+        query = query.filter(Promotion.service_id == service_id)
+    return query
+
 @router.post("", response_model=PromotionResponse)
 async def create_promotion(promotion: PromotionCreate, db: AsyncSession = Depends(get_db)):
     """
@@ -24,6 +49,9 @@ async def create_promotion(promotion: PromotionCreate, db: AsyncSession = Depend
         if not service:
             raise HTTPException(status_code=404, detail="Service not found")
     
+    if promotion.segment is not None and not is_segment(promotion.segment):
+        raise HTTPException(status_code=400, detail="Segment must be vip, lapsed or category:<id>")
+    
     # Create promotion
     db_promotion = Promotion(**promotion.model_dump())
     db.add(db_promotion)
@@ -38,30 +66,12 @@ async def read_promotions(
     name: Optional[str] = None,
     is_active: Optional[bool] = None,
     service_id: Optional[int] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db_with_timeout("read_promotions", 3000))
 ):
     """
     Retrieve promotions with optional filtering.
     """
-    query = select(Promotion)
-    
-    # Apply filters if provided
-    if name:
-        query = query.filter(Promotion.name.ilike(f"%{name}%"))
-    if is_active is not None:
-        current_date = datetime.now().date()
-        if is_active:
-            query = query.filter(
-                (Promotion.start_date <= current_date) & 
-                ((Promotion.end_date >= current_date) | (Promotion.end_date.is_(None)))
-            )
-        else:
-            query = query.filter(
-                (Promotion.end_date < current_date) | 
-                (Promotion.start_date > current_date)
-            )
-    if service_id:
-        query = query.filter(Promotion.service_id == service_id)
+    query = filter_promotions(select(Promotion), name, is_active, service_id)
     
     # Apply pagination
     query = query.offset(skip).limit(limit)
@@ -70,29 +80,27 @@ async def read_promotions(
     promotions = result.scalars().all()
     
     # Get total count for pagination
-    count_query = select(func.count()).select_from(Promotion)
-    if name:
-        count_query = count_query.filter(Promotion.name.ilike(f"%{name}%"))
-    if is_active is not None:
-        current_date = datetime.now().date()
-        if is_active:
-            count_query = count_query.filter(
-                (Promotion.start_date <= current_date) & 
-                ((Promotion.end_date >= current_date) | (Promotion.end_date.is_(None)))
-            )
-        else:
-            count_query = count_query.filter(
-                (Promotion.end_date < current_date) | 
-                (Promotion.start_date > current_date)
-            )
-    if service_id:
-        count_query = count_query.filter(Promotion.service_id == service_id)
+    count_query = filter_promotions(select(func.count()).select_from(Promotion), name, is_active, service_id)
     
     count_result = await db.execute(count_query)
     total = count_result.scalar()
     
     return {"items": promotions, "total": total}
 
+@router.get("/export")
+async def export_promotions(
+    format: str = "ndjson",
+    gzip: bool = False,
+    name: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    service_id: Optional[int] = None,
+):
+    """
+    Export all promotions matching the filters as NDJSON or CSV.
+    """
+    query = filter_promotions(select(Promotion), name, is_active, service_id)
+    return export_response(query.order_by(Promotion.id), PromotionResponse, "promotions", format, gzip)
+
 @router.get("/{promotion_id}", response_model=PromotionResponse)
 async def read_promotion(promotion_id: int, db: AsyncSession = Depends(get_db)):
     """
@@ -128,6 +136,9 @@ async def update_promotion(
         if not service:
             raise HTTPException(status_code=404, detail="Service not found")
     
+    if promotion.segment is not None and not is_segment(promotion.segment):
+        raise HTTPException(status_code=400, detail="Segment must be vip, lapsed or category:<id>")
+    
     # Update only the fields that are provided
     update_data = promotion.model_dump(exclude_unset=True)
     for key, value in update_data.items():
@@ -153,30 +164,69 @@ async def delete_promotion(promotion_id: int, db: AsyncSession = Depends(get_db)
     
     return {"message": "Promotion deleted successfully"}
 
-@router.get("/active/now", response_model=PromotionListResponse)
-async def get_active_promotions(
-    skip: int = 0, 
+@router.get("/{promotion_id}/redemptions", response_model=PromotionRedemptionListResponse)
+async def read_promotion_redemptions(
+    promotion_id: int,
+    skip: int = 0,
     limit: int = 100,
+    customer_id: Optional[int] = None,
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Get all currently active promotions.
+    Get the redemptions of a promotion, newest first. Redemptions of cancelled
+    or deleted appointments have been given back and are not listed.
     """
-    current_date = datetime.now().date()
-    query = select(Promotion).filter(
-        (Promotion.start_date <= current_date) & 
-        ((Promotion.end_date >= current_date) | (Promotion.end_date.is_(None)))
-    ).offset(skip).limit(limit)
+    result = await db.execute(select(Promotion).filter(Promotion.id == promotion_id))
+    promotion = result.scalars().first()
     
-    result = await db.execute(query)
-    promotions = result.scalars().all()
+    if promotion is None:
+        raise HTTPException(status_code=404, detail="Promotion not found")
     
-    # Get total count
-    count_query = select(func.count()).select_from(Promotion).filter(
-        (Promotion.start_date <= current_date) & 
-        ((Promotion.end_date >= current_date) | (Promotion.end_date.is_(None)))
-    )
-    count_result = await db.execute(count_query)
-    total = count_result.scalar()
+    query = select(PromotionRedemption).filter(PromotionRedemption.promotion_id == promotion_id)
+    count_query = select(func.count()).select_from(PromotionRedemption).filter(PromotionRedemption.promotion_id == promotion_id)
+    if customer_id:
+        query = query.filter(PromotionRedemption.customer_id == customer_id)
+        count_query = count_query.filter(PromotionRedemption.customer_id == customer_id)
     
-    return {"items": promotions, "total": total}
+    result = await db.execute(query.order_by(PromotionRedemption.id.desc()).offset(skip).limit(limit))
+    redemptions = result.scalars().all()
+    total = await db.scalar(count_query)
+    
+    return {"items": redemptions, "total": total, "max_redemptions": promotion.max_redemptions}
+
+@router.get("/{promotion_id}/audience", response_model=PromotionAudienceResponse)
+async def read_promotion_audience(
+    promotion_id: int,
+    skip: int = 0,
+    limit: int = 1000,
+    customer_ids: Optional[List[int]] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get the ids of the customers a promotion targets, or of those among
+    `customer_ids` it targets, for a campaign. Matched against the in-memory
+    segment bitmaps in one operation instead of a query per customer.
+    """
+    result = await db.execute(select(Promotion).filter(Promotion.id == promotion_id))
+    promotion = result.scalars().first()
+    
+    if promotion is None:
+        raise HTTPException(status_code=404, detail="Promotion not found")
+    
+    audience = await segment_index.matching(promotion.segment, customer_ids)
+    customers = members(audience)
+    return {"segment": promotion.segment, "items": customers[skip:skip + limit], "total": len(customers)}
+
+@router.get("/active/now", response_model=PromotionListResponse)
+async def get_active_promotions(
+    skip: int = 0, 
+    limit: int = 100,
+    service_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get all currently active promotions, or those that apply to a service.
+    Served from the in-memory active set without a database round trip.
+    """
+    promotions = await active_promotions(db, service_id)
+    return {"items": promotions[skip:skip + limit], "total": len(promotions)}
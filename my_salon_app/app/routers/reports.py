@@ -0,0 +1,137 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from datetime import date, timedelta
+from app.database import get_db
+from app.reporting import GROUPINGS, get_cancellations, get_revenue, get_utilization
+from app.rollups import GRANULARITIES, get_trends, trend_range
+from app.schemas import (
+    TrendResponse,
+    RevenueReportResponse,
+    CancellationReportResponse,
+    UtilizationReportResponse
+)
+
+router = APIRouter(
+    prefix="/reports",
+    tags=["reports"]
+)
+
+async def trend_report(db: AsyncSession, dimension: str, key: int, granularity: str, date_from, date_to):
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of: {', '.join(GRANULARITIES)}")
+    date_from, date_to = trend_range(granularity, date_from, date_to)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    
+    items = await get_trends(db, granularity, dimension, key, date_from, date_to)
+    return {"granularity": granularity, "date_from": date_from, "date_to": date_to, "items": items}
+
+def report_range(date_from: Optional[date], date_to: Optional[date]):
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    return date_from, date_to
+
+def check_group_by(group_by: str):
+    if group_by not in GROUPINGS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(GROUPINGS)}")
+
+@router.get("/trends", response_model=TrendResponse)
+async def get_overall_trends(
+    granularity: str = "day",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get bookings, cancellations, completions, revenue and average rating per day, week
+    or month (default: the last 30 days, 12 weeks or 12 months). Served from the trend
+    rollups, so changes show up after the next refresh. Buckets without appointments
+    are omitted.
+    """
+    return await trend_report(db, "overall", 0, granularity, date_from, date_to)
+
+@router.get("/trends/services/{service_id}", response_model=TrendResponse)
+async def get_service_trends(
+    service_id: int,
+    granularity: str = "day",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get trends for the appointments of one service.
+    """
+    return await trend_report(db, "service", service_id, granularity, date_from, date_to)
+
+@router.get("/trends/staff/{staff_id}", response_model=TrendResponse)
+async def get_staff_trends(
+    staff_id: int,
+    granularity: str = "day",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get trends for the appointments served by one staff member.
+    """
+    return await trend_report(db, "staff", staff_id, granularity, date_from, date_to)
+
+@router.get("/revenue", response_model=RevenueReportResponse)
+async def get_revenue_report(
+    group_by: str = "day",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get completed appointments and revenue per UTC day, service, category or staff
+    member (default: the last 30 days). Served from the reporting views, which are
+    refreshed every few minutes.
+    """
+    check_group_by(group_by)
+    date_from, date_to = report_range(date_from, date_to)
+    
+    items = await get_revenue(db, group_by, date_from, date_to)
+    return {
+        "group_by": group_by,
+        "date_from": date_from,
+        "date_to": date_to,
+        "total_revenue": sum(item["revenue"] for item in items),
+        "items": items,
+    }
+
+@router.get("/cancellations", response_model=CancellationReportResponse)
+async def get_cancellation_report(
+    group_by: str = "day",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get bookings, cancellations and the cancellation rate (percent) per UTC day,
+    service, category or staff member (default: the last 30 days).
+    """
+    check_group_by(group_by)
+    date_from, date_to = report_range(date_from, date_to)
+    
+    items = await get_cancellations(db, group_by, date_from, date_to)
+    return {"group_by": group_by, "date_from": date_from, "date_to": date_to, "items": items}
+
+@router.get("/utilization", response_model=UtilizationReportResponse)
+async def get_utilization_report(
+    staff_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get booked minutes and utilization (percent of the available minutes) per staff
+    member (default: the last 30 days).
+    """
+    date_from, date_to = report_range(date_from, date_to)
+    
+    items = await get_utilization(db, date_from, date_to, staff_id)
+    return {"date_from": date_from, "date_to": date_to, "items": items}
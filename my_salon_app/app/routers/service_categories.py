@@ -2,7 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from typing import List, Optional
-from app.database import get_db
+from app.database import get_db, get_db_with_timeout
+from app.export import export_response
 from app.models import ServiceCategory
 from app.schemas import ServiceCategoryCreate, ServiceCategoryUpdate, ServiceCategoryResponse, ServiceCategoryListResponse
 
@@ -11,6 +12,14 @@ router = APIRouter(
     tags=["service categories"]
 )
 
+def filter_service_categories(query, name: Optional[str] = None):
+    """
+    Apply the read_service_categories filters to a select or count query.
+    """
+    if name:
+        query = query.filter(ServiceCategory.name.ilike(f"%{name}%"))
+    return query
+
 @router.post("", response_model=ServiceCategoryResponse)
 async def create_service_category(category: ServiceCategoryCreate, db: AsyncSession = Depends(get_db)):
     """
@@ -34,16 +43,12 @@ async def read_service_categories(
     skip: int = 0, 
     limit: int = 100,
     name: Optional[str] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db_with_timeout("read_service_categories", 3000))
 ):
     """
     Retrieve service categories with optional filtering.
     """
-    query = select(ServiceCategory)
-    
-    # Apply filters if provided
-    if name:
-        query = query.filter(ServiceCategory.name.ilike(f"%{name}%"))
+    query = filter_service_categories(select(ServiceCategory), name)
     
     # Apply pagination
     query = query.offset(skip).limit(limit)
@@ -52,15 +57,25 @@ async def read_service_categories(
     categories = result.scalars().all()
     
     # Get total count for pagination
-    count_query = select(func.count()).select_from(ServiceCategory)
-    if name:
-        count_query = count_query.filter(ServiceCategory.name.ilike(f"%{name}%"))
+    count_query = filter_service_categories(select(func.count()).select_from(ServiceCategory), name)
     
     count_result = await db.execute(count_query)
     total = count_result.scalar()
     
     return {"items": categories, "total": total}
 
+@router.get("/export")
+async def export_service_categories(
+    format: str = "ndjson",
+    gzip: bool = False,
+    name: Optional[str] = None,
+):
+    """
+    Export all service categories matching the filters as NDJSON or CSV.
+    """
+    query = filter_service_categories(select(ServiceCategory), name)
+    return export_response(query.order_by(ServiceCategory.id), ServiceCategoryResponse, "service_categories", format, gzip)
+
 @router.get("/{category_id}", response_model=ServiceCategoryResponse)
 async def read_service_category(category_id: int, db: AsyncSession = Depends(get_db)):
     """
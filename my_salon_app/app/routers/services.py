@@ -2,15 +2,43 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from typing import List, Optional
-from app.database import get_db
+from app.database import get_db, get_db_with_timeout
+from app.export import export_response
 from app.models import Service, ServiceCategory
-from app.schemas import ServiceCreate, ServiceUpdate, ServiceResponse, ServiceListResponse
+from app.pricing import price_cache
+from app.schemas import (
+    ServiceCreate, ServiceUpdate, ServiceResponse, ServiceListResponse,
+    ServicePricingResponse
+)
 
 router = APIRouter(
     prefix="/services",
     tags=["services"]
 )
 
+def filter_services(
+    query,
+    name: Optional[str] = None,
+    category_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    duration: Optional[int] = None,
+):
+    """
+    Apply the read_services filters to a select or count query.
+    """
+    if name:
+        query = query.filter(Service.name.ilike(f"%{name}%"))
+    if category_id:
+        query = query.filter(Service.category_id == category_id)
+    if min_price is not None:
+        query = query.filter(Service.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Service.price <= max_price)
+    if duration:
+        query = query.filter(Service.duration_minutes == duration)
+    return query
+
 @router.post("", response_model=ServiceResponse)
 async def create_service(service: ServiceCreate, db: AsyncSession = Depends(get_db)):
     """
@@ -39,24 +67,12 @@ async def read_services(
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     duration: Optional[int] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db_with_timeout("read_services", 3000))
 ):
     """
     Retrieve services with optional filtering.
     """
-    query = select(Service)
-    
-    # Apply filters if provided
-    if name:
-        query = query.filter(Service.name.ilike(f"%{name}%"))
-    if category_id:
-        query = query.filter(Service.category_id == category_id)
-    if min_price is not None:
-        query = query.filter(Service.price >= min_price)
-    if max_price is not None:
-        query = query.filter(Service.price <= max_price)
-    if duration:
-        query = query.filter(Service.duration_minutes == duration)
+    query = filter_services(select(Service), name, category_id, min_price, max_price, duration)
     
     # Apply pagination
     query = query.offset(skip).limit(limit)
@@ -65,23 +81,51 @@ async def read_services(
     services = result.scalars().all()
     
     # Get total count for pagination
-    count_query = select(func.count()).select_from(Service)
-    if name:
-        count_query = count_query.filter(Service.name.ilike(f"%{name}%"))
-    if category_id:
-        count_query = count_query.filter(Service.category_id == category_id)
-    if min_price is not None:
-        count_query = count_query.filter(Service.price >= min_price)
-    if max_price is not None:
-        count_query = count_query.filter(Service.price <= max_price)
-    if duration:
-        count_query = count_query.filter(Service.duration_minutes == duration)
+    count_query = filter_services(
+        select(func.count()).select_from(Service), name, category_id, min_price, max_price, duration
+    )
     
     count_result = await db.execute(count_query)
     total = count_result.scalar()
     
     return {"items": services, "total": total}
 
+@router.get("/export")
+async def export_services(
+    format: str = "ndjson",
+    gzip: bool = False,
+    name: Optional[str] = None,
+    category_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    duration: Optional[int] = None,
+):
+    """
+    Export all services matching the filters as NDJSON or CSV.
+    """
+    query = filter_services(select(Service), name, category_id, min_price, max_price, duration)
+    return export_response(query.order_by(Service.id), ServiceResponse, "services", format, gzip)
+
+@router.get("/pricing", response_model=ServicePricingResponse)
+async def read_service_pricing(
+    service_ids: Optional[List[int]] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get the effective price of the given services (default: the whole catalog)
+    with the best running global or service promotion applied.
+    """
+    prices = await price_cache.prices(db)
+    if service_ids is None:
+        items = list(prices.values())
+    else:
+        missing = [service_id for service_id in service_ids if service_id not in prices]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Services not found: {', '.join(map(str, missing))}")
+        items = [prices[service_id] for service_id in dict.fromkeys(service_ids)]
+    
+    return {"items": items, "total": len(items)}
+
 @router.get("/{service_id}", response_model=ServiceResponse)
 async def read_service(service_id: int, db: AsyncSession = Depends(get_db)):
     """
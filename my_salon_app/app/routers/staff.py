@@ -2,7 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from typing import List, Optional
-from app.database import get_db
+from app.database import get_db, get_db_with_timeout
+from app.export import export_response
 from app.models import Staff
 from app.schemas import StaffCreate, StaffUpdate, StaffResponse, StaffListResponse
 
@@ -11,6 +12,23 @@ router = APIRouter(
     tags=["staff"]
 )
 
+def filter_staff(
+    query,
+    name: Optional[str] = None,
+    role: Optional[str] = None,
+    is_active: Optional[bool] = None,
+):
+    """
+    Apply the read_staff_members filters to a select or count query.
+    """
+    if name:
+        query = query.filter(Staff.name.ilike(f"%{name}%"))
+    if role:
+        query = query.filter(Staff.role.ilike(f"%{role}%"))
+    if is_active is not None:
+        query = query.filter(Staff.is_active == is_active)
+    return query
+
 @router.post("", response_model=StaffResponse)
 async def create_staff(staff: StaffCreate, db: AsyncSession = Depends(get_db)):
     """
@@ -29,20 +47,12 @@ async def read_staff_members(
     name: Optional[str] = None,
     role: Optional[str] = None,
     is_active: Optional[bool] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db_with_timeout("read_staff_members", 3000))
 ):
     """
     Retrieve staff members with optional filtering.
     """
-    query = select(Staff)
-    
-    # Apply filters if provided
-    if name:
-        query = query.filter(Staff.name.ilike(f"%{name}%"))
-    if role:
-        query = query.filter(Staff.role.ilike(f"%{role}%"))
-    if is_active is not None:
-        query = query.filter(Staff.is_active == is_active)
+    query = filter_staff(select(Staff), name, role, is_active)
     
     # Apply pagination
     query = query.offset(skip).limit(limit)
@@ -51,19 +61,27 @@ async def read_staff_members(
     staff_members = result.scalars().all()
     
     # Get total count for pagination
-    count_query = select(func.count()).select_from(Staff)
-    if name:
-        count_query = count_query.filter(Staff.name.ilike(f"%{name}%"))
-    if role:
-        count_query = count_query.filter(Staff.role.ilike(f"%{role}%"))
-    if is_active is not None:
-        count_query = count_query.filter(Staff.is_active == is_active)
+    count_query = filter_staff(select(func.count()).select_from(Staff), name, role, is_active)
     
     count_result = await db.execute(count_query)
     total = count_result.scalar()
     
     return {"items": staff_members, "total": total}
 
+@router.get("/export")
+async def export_staff_members(
+    format: str = "ndjson",
+    gzip: bool = False,
+    name: Optional[str] = None,
+    role: Optional[str] = None,
+    is_active: Optional[bool] = None,
+):
+    """
+    Export all staff members matching the filters as NDJSON or CSV.
+    """
+    query = filter_staff(select(Staff), name, role, is_active)
+    return export_response(query.order_by(Staff.id), StaffResponse, "staff", format, gzip)
+
 @router.get("/{staff_id}", response_model=StaffResponse)
 async def read_staff(staff_id: int, db: AsyncSession = Depends(get_db)):
     """
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field, validator, ConfigDict
 from typing import Optional, List, Dict, Any, Union
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 
 # Enums
@@ -13,6 +13,12 @@ class CustomerType(str, Enum):
     STANDARD = "standard"
     VIP = "vip"
 
+class LoyaltyTransactionType(str, Enum):
+    ACCRUAL = "accrual"
+    REDEMPTION = "redemption"
+    ADJUSTMENT = "adjustment"
+    EXPIRY = "expiry"
+
 # Base schemas
 class CustomerBase(BaseModel):
     name: str
@@ -60,6 +66,12 @@ class PromotionBase(BaseModel):
     end_date: Optional[datetime] = None
     service_id: Optional[int] = None
     is_active: bool = True
+    # Redemption caps; a capped promotion only applies to bookings that redeem it
+    max_redemptions: Optional[int] = Field(None, ge=1)
+    max_redemptions_per_customer: Optional[int] = Field(None, ge=1)
+    # Customers it targets: vip, lapsed or category:<id>; a targeted promotion only
+    # applies to bookings of those customers that redeem it
+    segment: Optional[str] = None
 
 class KnowledgeBaseBase(BaseModel):
     question: str
@@ -80,7 +92,16 @@ class ServiceCreate(ServiceBase):
     pass
 
 class AppointmentCreate(AppointmentBase):
-    pass
+    # Promotion redeemed for the booking, counted against its caps
+    promotion_id: Optional[int] = None
+
+# Historical appointments imported in bulk carry their own status
+class AppointmentImport(AppointmentBase):
+    status: AppointmentStatus = AppointmentStatus.UPCOMING
+    # Price as booked; defaults to the service's current price and duration
+    price_at_booking: Optional[float] = Field(None, ge=0)
+    duration_at_booking: Optional[int] = Field(None, gt=0)
+    discount_percent: float = Field(0, ge=0, le=100)
 
 class FeedbackCreate(FeedbackBase):
     pass
@@ -100,6 +121,15 @@ class CustomerUpdate(BaseModel):
     preferences: Optional[Dict[str, Any]] = None
     loyalty_points: Optional[int] = None
 
+class CustomerMergeRequest(BaseModel):
+    duplicate_ids: List[int] = Field(min_length=1)
+
+class LoyaltyAdjustment(BaseModel):
+    # Positive to credit, negative to debit; accruals and expiry are recorded by the system
+    points: int
+    type: LoyaltyTransactionType = LoyaltyTransactionType.ADJUSTMENT
+    note: Optional[str] = None
+
 class StaffUpdate(BaseModel):
     name: Optional[str] = None
     role: Optional[str] = None
@@ -126,7 +156,7 @@ class AppointmentUpdate(BaseModel):
     notes: Optional[str] = None
 
 class FeedbackUpdate(BaseModel):
-    rating: Optional[int] = None
+    rating: Optional[int] = Field(None, ge=1, le=5)
     comments: Optional[str] = None
     sentiment_score: Optional[float] = None
 
@@ -138,6 +168,9 @@ class PromotionUpdate(BaseModel):
     end_date: Optional[datetime] = None
     service_id: Optional[int] = None
     is_active: Optional[bool] = None
+    max_redemptions: Optional[int] = Field(None, ge=1)
+    max_redemptions_per_customer: Optional[int] = Field(None, ge=1)
+    segment: Optional[str] = None
 
 class KnowledgeBaseUpdate(BaseModel):
     question: Optional[str] = None
@@ -176,6 +209,9 @@ class ServiceResponse(ServiceBase):
 class AppointmentResponse(AppointmentBase):
     id: int
     status: AppointmentStatus
+    price_at_booking: Optional[float] = None
+    duration_at_booking: Optional[int] = None
+    discount_percent: float = 0
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -202,6 +238,23 @@ class KnowledgeBaseResponse(KnowledgeBaseBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+class LoyaltyTransactionResponse(BaseModel):
+    id: int
+    customer_id: int
+    appointment_id: Optional[int] = None
+    type: LoyaltyTransactionType
+    points: int
+    note: Optional[str] = None
+    expires_at: Optional[datetime] = None
+    expired_at: Optional[datetime] = None
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class LoyaltyAdjustmentResponse(BaseModel):
+    balance: int
+    transaction: LoyaltyTransactionResponse
+
 # Detailed response schemas with relationships
 class ServiceWithCategoryResponse(ServiceResponse):
     category: Optional[ServiceCategoryResponse] = None
@@ -216,6 +269,29 @@ class CustomerDetailResponse(CustomerResponse):
     appointments: List[AppointmentResponse] = []
     feedback: List[FeedbackResponse] = []
 
+class CustomerOverviewAppointment(BaseModel):
+    id: int
+    appointment_time: datetime
+    status: AppointmentStatus
+    notes: Optional[str] = None
+    service_id: int
+    service_name: str
+    duration_minutes: int
+    staff_id: Optional[int] = None
+    staff_name: Optional[str] = None
+    rating: Optional[int] = None
+
+class CustomerOverviewResponse(BaseModel):
+    customer: CustomerResponse
+    upcoming_appointments: List[CustomerOverviewAppointment]
+    recent_appointments: List[CustomerOverviewAppointment]
+    lifetime_visits: int
+    total_spend: float
+    last_visit_at: Optional[datetime] = None
+    average_rating: Optional[float] = None
+    feedback_count: int
+    loyalty_points: int
+
 # List response schemas
 class CustomerListResponse(BaseModel):
     items: List[CustomerResponse]
@@ -233,6 +309,19 @@ class ServiceListResponse(BaseModel):
     items: List[ServiceResponse]
     total: int
 
+# Price of a service with the best running promotion applied
+class ServicePrice(BaseModel):
+    service_id: int
+    name: str
+    price: float
+    discount_percent: float
+    promotion_id: Optional[int] = None
+    final_price: float
+
+class ServicePricingResponse(BaseModel):
+    items: List[ServicePrice]
+    total: int
+
 class AppointmentListResponse(BaseModel):
     items: List[AppointmentResponse]
     total: int
@@ -245,6 +334,97 @@ class PromotionListResponse(BaseModel):
     items: List[PromotionResponse]
     total: int
 
+class PromotionRedemptionResponse(BaseModel):
+    id: int
+    promotion_id: int
+    customer_id: int
+    appointment_id: int
+    discount_percent: float
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class PromotionRedemptionListResponse(BaseModel):
+    items: List[PromotionRedemptionResponse]
+    total: int
+    max_redemptions: Optional[int] = None
+
+# Ids of the customers a promotion targets
+class PromotionAudienceResponse(BaseModel):
+    segment: Optional[str] = None
+    items: List[int]
+    total: int
+
 class KnowledgeBaseListResponse(BaseModel):
     items: List[KnowledgeBaseResponse]
     total: int
+
+class RatingStatsResponse(BaseModel):
+    count: int
+    average_rating: Optional[float] = None
+    histogram: Dict[int, int]
+
+class DailyRatingStats(RatingStatsResponse):
+    date: date
+
+class DailyRatingStatsResponse(BaseModel):
+    items: List[DailyRatingStats]
+
+class TrendPoint(BaseModel):
+    bucket: date
+    bookings: int
+    cancellations: int
+    completions: int
+    revenue: float
+    rating_count: int
+    average_rating: Optional[float] = None
+
+class TrendResponse(BaseModel):
+    granularity: str
+    date_from: date
+    date_to: date
+    items: List[TrendPoint]
+
+class RevenueItem(BaseModel):
+    key: Union[date, int]
+    name: Optional[str] = None
+    completions: int
+    revenue: float
+
+class RevenueReportResponse(BaseModel):
+    group_by: str
+    date_from: date
+    date_to: date
+    total_revenue: float
+    items: List[RevenueItem]
+
+class CancellationItem(BaseModel):
+    key: Union[date, int]
+    name: Optional[str] = None
+    bookings: int
+    cancellations: int
+    cancellation_rate: Optional[float] = None
+
+class CancellationReportResponse(BaseModel):
+    group_by: str
+    date_from: date
+    date_to: date
+    items: List[CancellationItem]
+
+class StaffUtilization(BaseModel):
+    staff_id: int
+    name: str
+    appointments: int
+    booked_minutes: int
+    available_minutes: int
+    utilization: Optional[float] = None
+
+class UtilizationReportResponse(BaseModel):
+    date_from: date
+    date_to: date
+    items: List[StaffUtilization]
+
+class LoyaltyLedgerResponse(BaseModel):
+    balance: int
+    items: List[LoyaltyTransactionResponse]
+    total: int
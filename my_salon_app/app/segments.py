@@ -0,0 +1,249 @@
+import asyncio
+import itertools
+import logging
+import os
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+from .database import get_session_factory
+from .models import Appointment, AppointmentStatus, Customer, CustomerType, Service
+
+logger = logging.getLogger(__name__)
+
+# Days since the last completed visit after which a customer who has visited is lapsed
+SEGMENT_LAPSED_DAYS = int(os.getenv("SEGMENT_LAPSED_DAYS", 90))
+# Seconds between full rebuilds of the segment bitmaps in the API process. Completions
+# and customer writes through this process update them at once; rebuilds pick up
+# writes made elsewhere and customers who lapsed since. 0 disables them
+SEGMENT_REBUILD_INTERVAL_SECONDS = float(os.getenv("SEGMENT_REBUILD_INTERVAL_SECONDS", 900))
+
+# session.info key collecting the segment changes of a transaction
+PENDING_KEY = "segment_changes"
+
+# vip, lapsed, or category:<service category id>
+SEGMENT_PATTERN = re.compile(r"^(vip|lapsed|category:\d+)$")
+
+# Enum columns are stored by name
+CUSTOMERS = text("SELECT id, type = 'VIP' AS vip FROM customers")
+LAST_VISITS = text("""
+    SELECT customer_id, max(appointment_time) AS last_visit
+    FROM appointments
+    WHERE status = 'COMPLETED'
+    GROUP BY customer_id
+""")
+CATEGORY_CUSTOMERS = text("""
+    SELECT DISTINCT s.category_id, a.customer_id
+    FROM appointments a
+    JOIN services s ON s.id = a.service_id
+    WHERE a.status = 'COMPLETED' AND s.category_id IS NOT NULL
+""")
+SERVICE_CATEGORIES = text("SELECT id, category_id FROM services")
+
+def is_segment(segment: str) -> bool:
+    return SEGMENT_PATTERN.match(segment) is not None
+
+def to_bitmap(customer_ids: Iterable[int]) -> int:
+    """Bitmap with the bit of every id set, built in a bytearray so it takes one pass."""
+    customer_ids = list(customer_ids)
+    if not customer_ids:
+        return 0
+    buffer = bytearray(max(customer_ids) // 8 + 1)
+    for customer_id in customer_ids:
+        buffer[customer_id >> 3] |= 1 << (customer_id & 7)
+    return int.from_bytes(buffer, "little")
+
+def members(bitmap: int) -> List[int]:
+    """Ids whose bit is set, in ascending order."""
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    return [(index << 3) | bit for index, byte in enumerate(data) if byte for bit in range(8) if byte >> bit & 1]
+
+class SegmentIndex:
+    """
+    Customer segments held in memory as bitmaps: bit n is set when customer n
+    is in the segment. Python ints are arbitrary-size bit sets, so checking one
+    customer is a shift and a mask, and matching a campaign list against a
+    segment is a single AND. 100,000 customers take about 12 KB per bitmap.
+
+    `rebuild` reads every segment from the database. Between rebuilds, `apply`
+    records completed appointments and customer writes, deletes and merges as
+    they commit, including those that land while a rebuild is running.
+    """
+
+    def __init__(self):
+        self.loaded_at: Optional[datetime] = None
+        self.customers = 0
+        self.vip = 0
+        self.visited = 0
+        # Completed a visit within SEGMENT_LAPSED_DAYS of the last rebuild
+        self.recent = 0
+        self.categories: Dict[int, int] = {}
+        self._service_categories: Dict[int, Optional[int]] = {}
+        self._lock = asyncio.Lock()
+        self._replay: Optional[List[Tuple[str, Tuple]]] = None
+
+    def bitmap(self, segment: Optional[str]) -> int:
+        """Members of a segment; every customer when there is none."""
+        if segment is None:
+            return self.customers
+        if segment == "vip":
+            return self.vip
+        if segment == "lapsed":
+            return self.visited & ~self.recent
+        return self.categories.get(int(segment.split(":", 1)[1]), 0)
+
+    async def ensure_loaded(self):
+        if self.loaded_at is None:
+            async with self._lock:
+                # Requests that queued behind the first load use its result
+                if self.loaded_at is None:
+                    await self._rebuild()
+
+    async def contains(self, segment: Optional[str], customer_id: int) -> bool:
+        await self.ensure_loaded()
+        return bool(self.bitmap(segment) >> customer_id & 1)
+
+    async def matching(self, segment: Optional[str], customer_ids: Optional[Iterable[int]] = None) -> int:
+        """Bitmap of the segment, restricted to `customer_ids` when given."""
+        await self.ensure_loaded()
+        bitmap = self.bitmap(segment)
+        if customer_ids is not None:
+            bitmap &= to_bitmap(customer_ids)
+        return bitmap
+
+    async def rebuild(self) -> Dict[str, Any]:
+        async with self._lock:
+            return await self._rebuild()
+
+    async def _rebuild(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        self._replay = []
+        try:
+            now = datetime.now(timezone.utc)
+            async with get_session_factory()() as session:
+                customers = (await session.execute(CUSTOMERS)).all()
+                last_visits = (await session.execute(LAST_VISITS)).all()
+                category_customers = (await session.execute(CATEGORY_CUSTOMERS)).all()
+                service_categories = (await session.execute(SERVICE_CATEGORIES)).all()
+
+            by_category: Dict[int, List[int]] = {}
+            for category_id, customer_id in category_customers:
+                by_category.setdefault(category_id, []).append(customer_id)
+            lapsed_before = now - timedelta(days=SEGMENT_LAPSED_DAYS)
+
+            self.customers = to_bitmap(customer_id for customer_id, _ in customers)
+            self.vip = to_bitmap(customer_id for customer_id, vip in customers if vip)
+            self.visited = to_bitmap(customer_id for customer_id, _ in last_visits)
+            self.recent = to_bitmap(customer_id for customer_id, last_visit in last_visits if last_visit >= lapsed_before)
+            self.categories = {category_id: to_bitmap(ids) for category_id, ids in by_category.items()}
+            self._service_categories = dict(service_categories)
+            self.loaded_at = now
+
+            # Changes committed while the queries ran may be missing from their results
+            replay, self._replay = self._replay, None
+            for change in replay:
+                self._apply(*change)
+        finally:
+            self._replay = None
+
+        report = {
+            "customers": self.customers.bit_count(),
+            "segments": 3 + len(self.categories),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+        logger.info("Segment bitmaps rebuilt: %s", report)
+        return report
+
+    def apply(self, changes: Iterable[Tuple[str, Tuple]]):
+        for change in changes:
+            if self._replay is not None:
+                self._replay.append(change)
+            if self.loaded_at is not None:
+                self._apply(*change)
+
+    def _apply(self, kind: str, values: Tuple):
+        if kind == "customer":
+            customer_id, vip = values
+            bit = 1 << customer_id
+            self.customers |= bit
+            self.vip = self.vip | bit if vip else self.vip & ~bit
+        elif kind == "visit":
+            customer_id, service_id, appointment_time = values
+            if appointment_time.tzinfo is None:
+                appointment_time = appointment_time.replace(tzinfo=timezone.utc)
+            bit = 1 << customer_id
+            self.visited |= bit
+            if appointment_time >= datetime.now(timezone.utc) - timedelta(days=SEGMENT_LAPSED_DAYS):
+                self.recent |= bit
+            category_id = self._service_categories.get(service_id)
+            if category_id is not None:
+                self.categories[category_id] = self.categories.get(category_id, 0) | bit
+        elif kind == "service":
+            service_id, category_id = values
+            self._service_categories[service_id] = category_id
+        elif kind == "delete":
+            customer_id, = values
+            self._remove(1 << customer_id)
+        elif kind == "merge":
+            # The survivor takes over the visits of the duplicates, which are deleted
+            survivor_id, duplicate_ids = values
+            merged = to_bitmap(duplicate_ids)
+            survivor = 1 << survivor_id
+            if self.visited & merged:
+                self.visited |= survivor
+            if self.recent & merged:
+                self.recent |= survivor
+            for category_id, bitmap in self.categories.items():
+                if bitmap & merged:
+                    self.categories[category_id] = bitmap | survivor
+            self._remove(merged)
+
+    def _remove(self, bitmap: int):
+        """Clear the bits of deleted customers from every segment."""
+        keep = ~bitmap
+        self.customers &= keep
+        self.vip &= keep
+        self.visited &= keep
+        self.recent &= keep
+        self.categories = {category_id: bitmap & keep for category_id, bitmap in self.categories.items()}
+
+segment_index = SegmentIndex()
+
+def mark_customers_merged(session, survivor_id: int, duplicate_ids: Iterable[int]):
+    """
+    Record duplicates merged into the survivor and deleted by bulk statements,
+    which bypass the unit of work, so the bitmaps follow when the session commits.
+    """
+    session.info.setdefault(PENDING_KEY, []).append(("merge", (survivor_id, tuple(duplicate_ids))))
+
+@event.listens_for(Session, "after_flush")
+def _collect_segment_changes(session, flush_context):
+    changes = session.info.setdefault(PENDING_KEY, [])
+    for obj in itertools.chain(session.new, session.dirty):
+        if isinstance(obj, Customer):
+            changes.append(("customer", (obj.id, obj.type == CustomerType.VIP)))
+        elif isinstance(obj, Service):
+            changes.append(("service", (obj.id, obj.category_id)))
+        elif (
+            isinstance(obj, Appointment)
+            and obj.status == AppointmentStatus.COMPLETED
+            and inspect(obj).attrs.status.history.has_changes()
+        ):
+            changes.append(("visit", (obj.customer_id, obj.service_id, obj.appointment_time)))
+    for obj in session.deleted:
+        if isinstance(obj, Customer):
+            changes.append(("delete", (obj.id,)))
+
+@event.listens_for(Session, "after_commit")
+def _apply_segment_changes(session):
+    changes = session.info.pop(PENDING_KEY, None)
+    if changes:
+        segment_index.apply(changes)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_segment_changes(session):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,97 @@
+import math
+import re
+from typing import List, Optional
+
+# Lexicon-based sentiment scorer for feedback comments. Pure, local and stdlib-only, so
+# it can run in worker processes and never calls out to a network.
+
+# Word valences on a -4..4 scale
+LEXICON = {
+    # Positive
+    "amazing": 3.2, "awesome": 3.1, "excellent": 3.2, "fantastic": 3.3, "wonderful": 3.1,
+    "perfect": 3.2, "outstanding": 3.3, "best": 3.0, "love": 3.0, "loved": 3.0, "lovely": 2.8,
+    "great": 2.8, "superb": 3.1, "brilliant": 3.0, "incredible": 3.0, "impeccable": 3.0,
+    "good": 1.9, "nice": 1.8, "pleasant": 2.0, "friendly": 2.0, "kind": 1.8, "welcoming": 2.0,
+    "relaxing": 2.2, "relaxed": 1.9, "calm": 1.5, "soothing": 2.0, "refreshing": 2.0, "comfortable": 1.9,
+    "clean": 1.6, "professional": 1.8, "skilled": 1.9, "attentive": 1.9, "helpful": 1.9, "polite": 1.6,
+    "recommend": 2.0, "recommended": 2.0, "happy": 2.4, "satisfied": 2.0, "pleased": 2.2, "enjoyed": 2.3,
+    "like": 1.5, "liked": 1.8, "beautiful": 2.7, "gorgeous": 2.9, "thanks": 1.5, "thank": 1.5, "worth": 1.5, "fine": 0.8,
+    "okay": 0.4, "ok": 0.4, "decent": 1.0, "punctual": 1.5, "gentle": 1.6, "fresh": 1.2,
+    # Negative
+    "terrible": -3.3, "awful": -3.2, "horrible": -3.3, "worst": -3.4, "disgusting": -3.4, "hate": -3.0,
+    "bad": -2.5, "poor": -2.2, "rude": -2.6, "unprofessional": -2.4, "dirty": -2.4, "unclean": -2.2,
+    "disappointing": -2.3, "disappointed": -2.3, "disappointment": -2.3, "mediocre": -1.3,
+    "painful": -2.2, "pain": -1.9, "hurt": -2.1, "burned": -2.4, "burnt": -2.4, "damaged": -2.4,
+    "uncomfortable": -1.9, "cold": -1.0, "noisy": -1.4, "loud": -1.0, "rushed": -1.8, "careless": -2.0,
+    "late": -1.3, "waited": -1.0, "waiting": -0.9, "slow": -1.3, "overpriced": -2.0, "expensive": -1.2,
+    "unfriendly": -2.2, "annoyed": -2.0, "annoying": -2.0, "angry": -2.6, "upset": -2.2, "unhappy": -2.4,
+    "never": -0.6, "nothing": -0.4, "boring": -1.4, "wrong": -1.8, "mistake": -1.8, "problem": -1.6,
+    "cancelled": -1.2, "refund": -1.5, "complaint": -2.0, "ruined": -2.9, "uneven": -1.6,
+}
+
+# Words that flip the valence of a sentiment word following within a few words
+NEGATIONS = {
+    "not", "no", "never", "none", "nobody", "neither", "nor", "without", "hardly", "barely",
+    "dont", "didnt", "doesnt", "isnt", "wasnt", "werent", "wont", "wouldnt", "cant", "couldnt", "shouldnt",
+}
+NEGATION_SCALAR = -0.74
+NEGATION_WINDOW = 3
+
+# Modifiers of the word that follows them
+BOOSTERS = {
+    "very": 0.29, "really": 0.29, "extremely": 0.4, "so": 0.25, "super": 0.3, "incredibly": 0.4,
+    "absolutely": 0.35, "totally": 0.3, "highly": 0.3, "truly": 0.3, "most": 0.25, "too": 0.2,
+    "slightly": -0.3, "somewhat": -0.3, "bit": -0.3, "little": -0.25, "kinda": -0.3, "fairly": -0.2,
+}
+
+# Sentiment after "but" outweighs what came before it: "nice room but rude staff"
+CONTRAST_WORDS = {"but", "however", "although", "though"}
+BEFORE_CONTRAST_WEIGHT = 0.5
+AFTER_CONTRAST_WEIGHT = 1.5
+
+EXCLAMATION_BOOST = 0.29
+# Normalization constant: a raw sum of about 4 maps to a score of about 0.7
+NORMALIZATION_ALPHA = 15
+
+WORDS = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+def tokenize(text: str) -> List[str]:
+    # Drop apostrophes so "didn't" and "didnt" are the same negation
+    return [word.replace("'", "") for word in WORDS.findall(text.lower())]
+
+def score_text(text: Optional[str]) -> float:
+    """
+    Score a comment from -1 (very negative) to 1 (very positive); 0 is neutral
+    or unknown. Handles negation ("not good"), boosters ("very rude"), contrast
+    ("but") and exclamation marks.
+    """
+    words = tokenize(text or "")
+    valences = []
+    for index, word in enumerate(words):
+        valence = LEXICON.get(word)
+        if valence is None:
+            valences.append(0.0)
+            continue
+        if index > 0 and words[index - 1] in BOOSTERS:
+            boost = BOOSTERS[words[index - 1]]
+            valence += boost if valence > 0 else -boost
+        if any(previous in NEGATIONS for previous in words[max(0, index - NEGATION_WINDOW):index]):
+            valence *= NEGATION_SCALAR
+        valences.append(valence)
+
+    contrast = next((index for index, word in enumerate(words) if word in CONTRAST_WORDS), None)
+    if contrast is not None:
+        valences = [
+            valence * (BEFORE_CONTRAST_WEIGHT if index < contrast else AFTER_CONTRAST_WEIGHT)
+            for index, valence in enumerate(valences)
+        ]
+
+    total = sum(valences)
+    if total:
+        exclamations = min((text or "").count("!"), 4)
+        total += exclamations * EXCLAMATION_BOOST if total > 0 else -exclamations * EXCLAMATION_BOOST
+    return round(total / math.sqrt(total * total + NORMALIZATION_ALPHA), 4)
+
+def score_texts(texts: List[Optional[str]]) -> List[float]:
+    """Score a chunk of comments; the unit of work sent to a worker process."""
+    return [score_text(text) for text in texts]
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+from .database import get_session_factory
+from .sentiment import score_texts
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Feedback rows read, scored and written back per batch
+SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", 2000))
+# Worker processes scoring comments in each API process. Production mode already runs
+# one API worker per CPU, so each gets a single scoring process; the backfill script
+# sizes its pool to every CPU instead
+SENTIMENT_WORKERS = int(os.getenv("SENTIMENT_WORKERS", 1))
+# Seconds between scoring runs in the API process; 0 disables the background pipeline
+SENTIMENT_INTERVAL_SECONDS = float(os.getenv("SENTIMENT_INTERVAL_SECONDS", 30))
+# Batches scored per background run, so a large backlog never monopolizes the API host;
+# historical rows are backfilled with scripts/score_sentiment.py
+SENTIMENT_BATCHES_PER_RUN = int(os.getenv("SENTIMENT_BATCHES_PER_RUN", 5))
+
+# Advisory lock keeping API workers and the backfill script from scoring the same rows
+BATCH_LOCK_KEY = 0x53454E54494D
+
+# Served by the partial index ix_feedback_unscored
+UNSCORED = text("""
+    SELECT id, comments, md5(comments) AS comments_md5
+    FROM feedback
+    WHERE sentiment_score IS NULL AND comments IS NOT NULL AND id > :after_id
+    ORDER BY id
+    LIMIT :batch_size
+""")
+
+# One statement per batch. A row is only written if it is still unscored and its
+# comments are the ones that were scored, so an edit made meanwhile is scored again.
+WRITE_SCORES = text("""
+    UPDATE feedback f
+    SET sentiment_score = scored.score, updated_at = now()
+    FROM unnest(
+        CAST(:ids AS integer[]), CAST(:scores AS double precision[]), CAST(:hashes AS text[])
+    ) AS scored(id, score, comments_md5)
+    WHERE f.id = scored.id AND f.sentiment_score IS NULL AND md5(f.comments) = scored.comments_md5
+""")
+
+_pool: Optional["ProcessPoolExecutor"] = None
+_pool_workers = SENTIMENT_WORKERS
+
+def configure_pool(workers: int):
+    """Set the number of scoring processes; a running pool is shut down and restarts at that size."""
+    global _pool_workers
+    shutdown_pool()
+    _pool_workers = max(1, workers)
+
+def get_pool() -> "ProcessPoolExecutor":
+    """Return the process-wide scoring pool, starting it on first use."""
+    global _pool
+    if _pool is None:
+        # Imported here: multiprocessing is only needed once there is something to score
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # spawn, not fork: forking a process with a running event loop and open
+        # database connections would copy both into every worker
+        _pool = ProcessPoolExecutor(max_workers=_pool_workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+async def score_comments(comments: List[Optional[str]]) -> List[float]:
+    """Score comments in the process pool, one chunk per worker, without blocking the event loop."""
+    if not comments:
+        return []
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    size = math.ceil(len(comments) / _pool_workers)
+    chunks = [comments[start:start + size] for start in range(0, len(comments), size)]
+    results = await asyncio.gather(*(loop.run_in_executor(pool, score_texts, chunk) for chunk in chunks))
+    return [score for chunk in results for score in chunk]
+
+async def score_feedback(batch_size: int = SENTIMENT_BATCH_SIZE, max_batches: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Score feedback comments that have no sentiment score yet, oldest first.
+
+    Without `max_batches` every unscored row is processed, which backfills the
+    whole history. Comments edited through the API lose their score and are
+    picked up again. Scores set by clients are kept.
+    """
+    started = time.perf_counter()
+    report = {"scored": 0, "written": 0, "batches": 0, "skipped": False}
+    after_id = 0
+    async with get_session_factory()() as session:
+        while max_batches is None or report["batches"] < max_batches:
+            if not await session.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": BATCH_LOCK_KEY}):
+                report["skipped"] = True
+                break
+            rows = (await session.execute(UNSCORED, {"after_id": after_id, "batch_size": batch_size})).all()
+            if not rows:
+                await session.commit()
+                break
+
+            scores = await score_comments([row.comments for row in rows])
+            result = await session.execute(WRITE_SCORES, {
+                "ids": [row.id for row in rows],
+                "scores": scores,
+                "hashes": [row.comments_md5 for row in rows],
+            })
+            await session.commit()
+
+            report["batches"] += 1
+            report["scored"] += len(rows)
+            report["written"] += result.rowcount
+            after_id = rows[-1].id
+            if len(rows) < batch_size:
+                break
+
+    elapsed = time.perf_counter() - started
+    report["duration_ms"] = round(elapsed * 1000, 2)
+    report["rows_per_second"] = round(report["scored"] / elapsed) if report["scored"] else None
+    if report["scored"]:
+        logger.info("Sentiment scoring: %s", report)
+    return report
+
+async def run_sentiment_batches():
+    """Entry point of the background task: a bounded amount of work per run."""
+    await score_feedback(max_batches=SENTIMENT_BATCHES_PER_RUN)
@@ -0,0 +1,300 @@
+import asyncio
+import contextlib
+import enum
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, func, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .database import get_engine
+from .models import Appointment, Customer, Feedback, Promotion, Service, Staff
+
+logger = logging.getLogger(__name__)
+
+# Root directory of the Parquet snapshots; one sub-directory per table
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+# Rows read from the server-side cursor and written per Parquet file
+SNAPSHOT_CHUNK_ROWS = int(os.getenv("SNAPSHOT_CHUNK_ROWS", 50000))
+# Rows changed within this many seconds of the export are left for the next run: their
+# timestamps come from transaction start, so a slow transaction may still be committing
+SNAPSHOT_SAFETY_LAG_SECONDS = int(os.getenv("SNAPSHOT_SAFETY_LAG_SECONDS", 300))
+
+# Exported tables: name -> (model, column whose month partitions the files or None)
+SNAPSHOT_TABLES = {
+    "appointments": (Appointment, "appointment_time"),
+    "customers": (Customer, None),
+    "services": (Service, None),
+    "staff": (Staff, None),
+    "feedback": (Feedback, "created_at"),
+    "promotions": (Promotion, "start_date"),
+}
+
+WATERMARKS_FILE = "_watermarks.json"
+
+# Advisory lock held for the whole export, so the exports of different API workers and
+# the script never write the same files and watermarks at once
+EXPORT_LOCK_KEY = 0x534E415053484F54
+
+class SnapshotExportRunning(RuntimeError):
+    """Another process holds the export lock."""
+
+def load_pyarrow():
+    """Import pyarrow on first use; the API should not pay for it at startup."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Parquet snapshots require pyarrow (pip install pyarrow)") from e
+    return pyarrow, pyarrow.parquet
+
+def watermark_column(model):
+    # updated_at is only set on update, so rows never updated are tracked by created_at
+    if "updated_at" in model.__table__.c:
+        return func.coalesce(model.updated_at, model.created_at)
+    return model.created_at
+
+def arrow_type(pa, column_type):
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us", tz="UTC")
+    # String, Text, enums (stored by value) and JSON (stored as JSON text)
+    return pa.string()
+
+def arrow_value(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+def partition_dir(partition_key: Optional[str], value: Optional[datetime]) -> str:
+    if partition_key is None:
+        return ""
+    label = value.strftime("%Y-%m") if value else "__HIVE_DEFAULT_PARTITION__"
+    return f"{partition_key}_month={label}"
+
+def write_chunk(pa, pq, schema, rows: Sequence, table_dir: str, partition_key: Optional[str], file_name: str) -> List[str]:
+    """Convert one chunk of rows to Arrow and write one Parquet file per partition it touches."""
+    columns = list(zip(*rows))
+    arrays = [
+        pa.array([arrow_value(value) for value in values], type=field.type)
+        for values, field in zip(columns, schema)
+    ]
+    table = pa.Table.from_arrays(arrays, schema=schema)
+
+    groups: Dict[str, List[int]] = {}
+    if partition_key is None:
+        groups[""] = list(range(len(rows)))
+    else:
+        position = schema.get_field_index(partition_key)
+        for index, row in enumerate(rows):
+            groups.setdefault(partition_dir(partition_key, row[position]), []).append(index)
+
+    written = []
+    for directory, indices in groups.items():
+        target_dir = os.path.join(table_dir, directory)
+        os.makedirs(target_dir, exist_ok=True)
+        path = os.path.join(target_dir, file_name)
+        part = table if len(indices) == len(rows) else table.take(pa.array(indices))
+        # Write to a temporary name so readers never see a half-written file
+        pq.write_table(part, path + ".tmp", compression="zstd")
+        os.replace(path + ".tmp", path)
+        written.append(path)
+    return written
+
+def read_watermarks(output_dir: str) -> Dict[str, str]:
+    path = os.path.join(output_dir, WATERMARKS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_watermarks(output_dir: str, watermarks: Dict[str, str]):
+    path = os.path.join(output_dir, WATERMARKS_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(watermarks, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+async def aioenumerate(iterable):
+    index = 0
+    async for item in iterable:
+        yield index, item
+        index += 1
+
+async def export_table(conn, name: str, output_dir: str, since: Optional[datetime], until: datetime, run_id: str) -> Dict[str, Any]:
+    """
+    Write the rows of one table changed in (since, until] as Parquet files.
+
+    Rows are read from a server-side cursor in SNAPSHOT_CHUNK_ROWS batches and each
+    batch is converted and written in a worker thread, so memory is bounded by one
+    batch and the event loop keeps serving requests.
+    """
+    pa, pq = load_pyarrow()
+    model, partition_key = SNAPSHOT_TABLES[name]
+    table = model.__table__
+    watermark = watermark_column(model)
+    schema = pa.schema(
+        [pa.field(column.name, arrow_type(pa, column.type)) for column in table.columns]
+        + [pa.field("_watermark", pa.timestamp("us", tz="UTC"))]
+    )
+
+    query = select(*table.columns, watermark.label("_watermark")).filter(watermark <= until)
+    if since is not None:
+        query = query.filter(watermark > since)
+
+    table_dir = os.path.join(output_dir, name)
+    rows = 0
+    files: List[str] = []
+    try:
+        result = await conn.stream(query.execution_options(yield_per=SNAPSHOT_CHUNK_ROWS))
+        async for chunk_number, chunk in aioenumerate(result.partitions()):
+            file_name = f"part-{run_id}-{chunk_number:05d}.parquet"
+            files += await asyncio.to_thread(write_chunk, pa, pq, schema, chunk, table_dir, partition_key, file_name)
+            rows += len(chunk)
+    except BaseException:
+        # Drop this run's partial output; the watermark is unchanged, so the next run rewrites it
+        for path in files:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+    return {"rows": rows, "files": len(files)}
+
+@contextlib.asynccontextmanager
+async def export_lock(engine: AsyncEngine):
+    """
+    Hold the export lock on a connection of its own, or raise SnapshotExportRunning
+    if another export holds it. It is a session lock, released explicitly, so it
+    never outlives the export on a pooled connection.
+    """
+    async with engine.connect() as conn:
+        if not await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": EXPORT_LOCK_KEY}):
+            raise SnapshotExportRunning("A snapshot export is already running")
+        await conn.commit()
+        try:
+            yield
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": EXPORT_LOCK_KEY})
+            await conn.commit()
+
+async def export_snapshots(
+    tables: Optional[Sequence[str]] = None,
+    output_dir: str = SNAPSHOT_DIR,
+    full: bool = False,
+    engine: Optional[AsyncEngine] = None,
+) -> Dict[str, Any]:
+    """
+    Export tables to partitioned Parquet files under `output_dir`.
+
+    Each run writes only rows whose updated_at (or created_at) is newer than the
+    table's stored watermark, so files accumulate as change sets: readers keep the
+    row with the latest `_watermark` per id. Deleted rows are not tracked. With
+    `full`, existing files are removed and every row is written again. Raises
+    SnapshotExportRunning if another export is running.
+    """
+    engine = engine or get_engine()
+    async with export_lock(engine):
+        return await _export_snapshots(tables, output_dir, full, engine)
+
+async def _export_snapshots(
+    tables: Optional[Sequence[str]], output_dir: str, full: bool, engine: AsyncEngine
+) -> Dict[str, Any]:
+    """export_snapshots with the export lock already held."""
+    tables = list(tables or SNAPSHOT_TABLES)
+    unknown = set(tables) - set(SNAPSHOT_TABLES)
+    if unknown:
+        raise ValueError(f"Unknown snapshot tables: {', '.join(sorted(unknown))}")
+    load_pyarrow()
+
+    os.makedirs(output_dir, exist_ok=True)
+    watermarks = read_watermarks(output_dir)
+    started = time.perf_counter()
+    report: Dict[str, Any] = {"tables": {}}
+
+    async with engine.connect() as conn:
+        # One snapshot for every table so the exported files are consistent with each other
+        conn = await conn.execution_options(isolation_level="REPEATABLE READ")
+        until = await conn.scalar(select(func.now() - timedelta(seconds=SNAPSHOT_SAFETY_LAG_SECONDS)))
+        # Unique even for runs started within the same second
+        run_id = f"{until:%Y%m%dT%H%M%S}-{uuid.uuid4().hex}"
+        for name in tables:
+            if full:
+                shutil.rmtree(os.path.join(output_dir, name), ignore_errors=True)
+            since = datetime.fromisoformat(watermarks[name]) if name in watermarks and not full else None
+            table_started = time.perf_counter()
+            result = await export_table(conn, name, output_dir, since, until, run_id)
+            result["duration_ms"] = round((time.perf_counter() - table_started) * 1000, 2)
+            report["tables"][name] = result
+
+            watermarks[name] = until.isoformat()
+            save_watermarks(output_dir, watermarks)
+            logger.info("Snapshot of %s: %s", name, result)
+
+    report["watermark"] = until.isoformat()
+    report["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return report
+
+class SnapshotRunner:
+    """
+    Run a snapshot export in the background and keep its outcome. The export
+    lock is taken before the task starts, so a request learns at once that an
+    export is already running, here or in another process.
+
+    Used by the admin endpoint so that a long export never holds an HTTP request open.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.started_at: Optional[datetime] = None
+        self.last_report: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, tables: Optional[Sequence[str]] = None, full: bool = False) -> bool:
+        """Start an export; False if one is already running."""
+        if self.running:
+            return False
+        engine = get_engine()
+        lock = contextlib.AsyncExitStack()
+        try:
+            await lock.enter_async_context(export_lock(engine))
+        except SnapshotExportRunning:
+            return False
+        self.started_at = datetime.now().astimezone()
+        self._task = asyncio.create_task(self._run(lock, engine, tables, full), name="snapshot-export")
+        return True
+
+    async def _run(self, lock: contextlib.AsyncExitStack, engine: AsyncEngine, tables, full):
+        async with lock:
+            try:
+                self.last_report = await _export_snapshots(tables, SNAPSHOT_DIR, full, engine)
+                self.last_error = None
+            except Exception as e:
+                logger.exception("Snapshot export failed")
+                self.last_error = str(e)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "last_report": self.last_report,
+            "last_error": self.last_error,
+            "watermarks": read_watermarks(SNAPSHOT_DIR),
+        }
+
+snapshot_runner = SnapshotRunner()
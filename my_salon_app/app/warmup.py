@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from fastapi import FastAPI
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from .database import get_session_factory, DB_POOL_SIZE
+from .models import Appointment, Customer, Service, ServiceCategory, Staff, Promotion, KnowledgeBase
+from .schemas import ServiceListResponse, ServiceCategoryListResponse, KnowledgeBaseListResponse
+
+logger = logging.getLogger(__name__)
+
+# Skip warmup entirely, e.g. for one-off scripts that import the app
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+# Number of pool connections opened before the first request is served
+WARMUP_POOL_CONNECTIONS = int(os.getenv("WARMUP_POOL_CONNECTIONS", min(DB_POOL_SIZE, 4)))
+# Catalog and knowledge base rows loaded during warmup (one default page)
+WARMUP_CACHE_ROWS = int(os.getenv("WARMUP_CACHE_ROWS", 100))
+
+def hot_statements() -> List:
+    """
+    Statements issued by the busiest routes.
+
+    Pagination values are bound parameters, so running each shape once with
+    LIMIT 0 compiles it into SQLAlchemy's cache and prepares it on the connection
+    (including asyncpg's enum and JSON type introspection) without reading rows.
+    """
+    statements = [
+        select(Appointment).filter(Appointment.id == 0),
+        select(Customer).filter(Customer.id == 0),
+        select(Customer).filter(Customer.phone == ""),
+        select(Service).filter(Service.id == 0),
+        select(Staff).filter(Staff.id == 0),
+    ]
+    for model in (Appointment, Customer, Service, ServiceCategory, Staff, Promotion, KnowledgeBase):
+        statements.append(select(model).offset(0).limit(0))
+        statements.append(select(func.count()).select_from(model))
+    return statements
+
+async def _warm_connection(conn: AsyncConnection):
+    for statement in hot_statements():
+        await conn.execute(statement)
+    await conn.rollback()
+
+async def open_pool_connections(engine: AsyncEngine, count: int) -> int:
+    """Open `count` connections concurrently and return them to the pool warmed up."""
+    connections = [engine.connect() for _ in range(count)]
+    try:
+        await asyncio.gather(*(conn.start() for conn in connections))
+        await asyncio.gather(*(_warm_connection(conn) for conn in connections))
+    finally:
+        for conn in connections:
+            await conn.close()
+    return count
+
+async def warm_caches():
+    """Load the service catalog and knowledge base pages and run them through their response schemas."""
+    async with get_session_factory()() as session:
+        services = (await session.execute(select(Service).limit(WARMUP_CACHE_ROWS))).scalars().all()
+        ServiceListResponse.model_validate({"items": services, "total": len(services)})
+
+        categories = (await session.execute(select(ServiceCategory).limit(WARMUP_CACHE_ROWS))).scalars().all()
+        ServiceCategoryListResponse.model_validate({"items": categories, "total": len(categories)})
+
+        entries = (await session.execute(select(KnowledgeBase).limit(WARMUP_CACHE_ROWS))).scalars().all()
+        KnowledgeBaseListResponse.model_validate({"items": entries, "total": len(entries)})
+
+async def _timed(report: Dict[str, float], name: str, func: Callable[[], Awaitable]):
+    started = time.perf_counter()
+    try:
+        await func()
+    except Exception:
+        # A failed warmup step only costs latency later; never block startup on it
+        logger.exception("Warmup step %s failed", name)
+    report[name] = round((time.perf_counter() - started) * 1000, 2)
+
+async def warm_up(app: FastAPI, engine: AsyncEngine) -> Dict[str, float]:
+    """
+    Pay connection setup, statement preparation and schema building costs at startup.
+
+    Returns the time spent in each step in milliseconds.
+    """
+    report: Dict[str, float] = {}
+    started = time.perf_counter()
+    if WARMUP_ENABLED:
+        if WARMUP_POOL_CONNECTIONS > 0:
+            await _timed(report, "pool_connections", lambda: open_pool_connections(engine, WARMUP_POOL_CONNECTIONS))
+        await _timed(report, "catalog_and_knowledge_base", warm_caches)
+
+        async def build_openapi():
+            app.openapi()
+
+        await _timed(report, "openapi_schema", build_openapi)
+    report["total"] = round((time.perf_counter() - started) * 1000, 2)
+    return report
@@ -1,15 +1,25 @@
-import uvicorn
+import argparse
+import importlib.util
 import os
+import uvicorn
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-if __name__ == "__main__":
-    # Get port from environment or use default
-    port = int(os.getenv("PORT", 8000))
-    
-    # Run the application
+def default_workers() -> int:
+    """Size the worker count to the CPUs this process may actually run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+def pool_budget(workers: int, max_connections: int) -> int:
+    """Split the global database connection limit evenly across workers."""
+    return max(1, max_connections // workers)
+
+def run_development(port: int):
+    print(f"Application is running at http://localhost:{port}")
+    print(f"API documentation available at http://localhost:{port}/docs")
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
@@ -17,6 +27,52 @@ if __name__ == "__main__":
         reload=True,  # Enable auto-reload during development
         log_level="info"
     )
-    
-    print(f"Application is running at http://localhost:{port}")
-    print(f"API documentation available at http://localhost:{port}/docs") 
\ No newline at end of file
+
+def run_production(port: int):
+    workers = int(os.getenv("WEB_CONCURRENCY", default_workers()))
+    max_connections = int(os.getenv("DB_MAX_CONNECTIONS", 100))
+
+    # Workers inherit the environment, so the pool settings read by app.database
+    # cap each worker at its share of the global connection limit
+    os.environ.setdefault("DB_POOL_SIZE", str(pool_budget(workers, max_connections)))
+    os.environ.setdefault("DB_MAX_OVERFLOW", "0")
+    os.environ.setdefault("DB_ECHO", "false")
+
+    print(
+        f"Starting {workers} workers on port {port} "
+        f"(pool size {os.environ['DB_POOL_SIZE']} per worker, {max_connections} connections total)"
+    )
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=port,
+        workers=workers,
+        loop="uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        http="httptools" if importlib.util.find_spec("httptools") else "h11",
+        backlog=int(os.getenv("BACKLOG", 2048)),
+        timeout_keep_alive=int(os.getenv("KEEP_ALIVE_SECONDS", 5)),
+        # On SIGTERM uvicorn stops accepting connections and drains in-flight requests
+        # before running the app's shutdown hooks, which dispose the engine
+        timeout_graceful_shutdown=int(os.getenv("GRACEFUL_SHUTDOWN_SECONDS", 30)),
+        proxy_headers=True,
+        access_log=os.getenv("ACCESS_LOG", "false").lower() in ("1", "true", "yes"),
+        log_level="info"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Salon Management API")
+    parser.add_argument(
+        "--production",
+        action="store_true",
+        default=os.getenv("APP_ENV") == "production",
+        help="Run multiple workers without auto-reload (default when APP_ENV=production)",
+    )
+    args = parser.parse_args()
+
+    # Get port from environment or use default
+    port = int(os.getenv("PORT", 8000))
+
+    if args.production:
+        run_production(port)
+    else:
+        run_development(port)
@@ -8,8 +8,9 @@ from sqlalchemy import text, select
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database import AsyncSessionLocal
-from app.models import Appointment, Feedback, Promotion, KnowledgeBase
+from app.models import Appointment, Feedback, Promotion, KnowledgeBase, Service
 from app.models import AppointmentStatus
+from app.pricing import snapshot_price
 
 async def add_missing_data():
     async with AsyncSessionLocal() as session:
@@ -42,6 +43,10 @@ async def add_missing_data():
                     notes="Regular client"
                 )
             ]
+            # Price each booking as the API does
+            services = {service.id: service for service in (await session.execute(select(Service))).scalars()}
+            for appointment in appointments:
+                await snapshot_price(session, appointment, services[appointment.service_id])
             session.add_all(appointments)
             await session.commit()
             print("Added appointments")
@@ -0,0 +1,25 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import get_engine
+from app.pricing import PRICE_BACKFILL_BATCH_SIZE, backfill_price_snapshots
+
+async def main(args):
+    try:
+        return await backfill_price_snapshots(args.batch_size, args.max_batches)
+    finally:
+        await get_engine().dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshot the booked price of appointments created before price snapshots existed")
+    parser.add_argument("--batch-size", type=int, default=PRICE_BACKFILL_BATCH_SIZE, help="Appointments updated per transaction")
+    parser.add_argument("--max-batches", type=int, help="Stop after this many batches (default: every appointment)")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(main(args)), indent=2))
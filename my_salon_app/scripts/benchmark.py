@@ -0,0 +1,253 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app.models import Appointment, AppointmentStatus, Customer, CustomerType, Service, Staff, Feedback, Promotion
+from app.pricing import effective_prices
+from app.routers.appointments import filter_appointments
+from app.routers.customers import filter_customers
+from app.segments import members, to_bitmap
+from app.sentiment import score_texts
+from app.schemas import AppointmentListResponse, AppointmentDetailResponse, CustomerListResponse
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+SIZES = (10, 100, 1000)
+NOW = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+PG_DIALECT = postgresql.asyncpg.dialect()
+# Segment bitmap of 100,000 customers with every tenth one in it
+SEGMENT = to_bitmap(range(0, 100000, 10))
+# Rows of the service catalog as PriceCache reads them
+CatalogRow = namedtuple("CatalogRow", ["id", "name", "price"])
+
+def time_per_call(func: Callable[[], object], repeat: int, min_time: float) -> float:
+    """Median time per call in microseconds over `repeat` runs of at least `min_time` seconds."""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        loops *= 2
+
+    samples = [elapsed / loops]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - started) / loops)
+    return statistics.median(samples) * 1e6
+
+# Query construction: what the list routes do before touching the database
+
+def build_appointment_queries():
+    filters = (1, 2, 3, "upcoming", date(2025, 1, 1), date(2025, 1, 31))
+    query = filter_appointments(select(Appointment), *filters)
+    count_query = filter_appointments(select(func.count()).select_from(Appointment), *filters)
+    return query.offset(0).limit(100), count_query
+
+def build_customer_queries():
+    query = filter_customers(select(Customer), "john", "example.com", "555")
+    count_query = filter_customers(select(func.count()).select_from(Customer), "john", "example.com", "555")
+    return query.offset(0).limit(100), count_query
+
+def compile_queries(build: Callable):
+    # A cache key is generated for every execution; compilation only happens on a cache miss
+    for query in build():
+        query._generate_cache_key()
+        query.compile(dialect=PG_DIALECT)
+
+# Sample objects shared by the hydration and serialization benchmarks
+
+def make_customer(i: int) -> Customer:
+    return Customer(
+        id=i,
+        name=f"Customer {i}",
+        phone=f"+1555{i:07d}",
+        email=f"customer{i}@example.com",
+        type=CustomerType.VIP if i % 10 == 0 else CustomerType.STANDARD,
+        preferences={"preferred_day": "Saturday", "preferred_time": "morning"},
+        loyalty_points=i % 500,
+        created_at=NOW,
+    )
+
+def make_appointment(i: int, detailed: bool = False) -> Appointment:
+    appointment = Appointment(
+        id=i,
+        customer_id=i,
+        service_id=i % 20 + 1,
+        staff_id=i % 10 + 1,
+        appointment_time=NOW + timedelta(hours=i),
+        status=AppointmentStatus.COMPLETED,
+        notes="Regular client",
+        # Column defaults are only applied on flush, so set every snapshot column
+        price_at_booking=50.0,
+        duration_at_booking=45,
+        discount_percent=10.0 if i % 5 == 0 else 0.0,
+        created_at=NOW,
+    )
+    if detailed:
+        appointment.customer = make_customer(i)
+        appointment.service = Service(
+            id=i % 20 + 1, name="Haircut", price=50.0, duration_minutes=45, created_at=NOW
+        )
+        appointment.staff = Staff(
+            id=i % 10 + 1, name="Michael Brown", role="Hair Stylist", skills=["haircut"], is_active=True, created_at=NOW
+        )
+        appointment.feedback = Feedback(
+            id=i, appointment_id=i, customer_id=i, rating=5, comments="Great service!", created_at=NOW
+        )
+    return appointment
+
+def make_promotion(i: int, services: int) -> Promotion:
+    # Every fourth promotion applies to every service, the others to one each
+    return Promotion(
+        id=i + 1,
+        title=f"Promotion {i}",
+        discount_percent=5.0 + i % 30,
+        start_date=NOW - timedelta(days=7),
+        service_id=None if i % 4 == 0 else i % services + 1,
+        is_active=True,
+    )
+
+def make_hydration_engine(size: int):
+    engine = create_engine("sqlite://")
+    Appointment.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            Appointment.__table__.insert(),
+            [
+                {
+                    "customer_id": i,
+                    "service_id": i % 20 + 1,
+                    "staff_id": i % 10 + 1,
+                    "appointment_time": NOW + timedelta(hours=i),
+                    "status": AppointmentStatus.UPCOMING,
+                    "notes": "Regular client",
+                    "price_at_booking": 50.0,
+                    "duration_at_booking": 45,
+                    "discount_percent": 10.0 if i % 5 == 0 else 0.0,
+                    "created_at": NOW,
+                }
+                for i in range(size)
+            ],
+        )
+    return engine
+
+def hydrate_orm(engine):
+    with Session(engine) as session:
+        return session.execute(select(Appointment)).scalars().all()
+
+def hydrate_core(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(Appointment.__table__)).all()
+
+def collect_benchmarks() -> Dict[str, Callable[[], object]]:
+    benchmarks: Dict[str, Callable[[], object]] = {
+        "query_build/read_appointments": build_appointment_queries,
+        "query_build/read_customers": build_customer_queries,
+        "query_compile/read_appointments": lambda: compile_queries(build_appointment_queries),
+        "query_compile/read_customers": lambda: compile_queries(build_customer_queries),
+    }
+
+    # Serialization mirrors FastAPI: validate against the response model, then dump to JSON
+    detail_list = TypeAdapter(List[AppointmentDetailResponse])
+    for size in SIZES:
+        engine = make_hydration_engine(size)
+        benchmarks[f"hydrate_orm/appointments/{size}"] = lambda engine=engine: hydrate_orm(engine)
+        benchmarks[f"hydrate_core/appointments/{size}"] = lambda engine=engine: hydrate_core(engine)
+
+        appointments = {"items": [make_appointment(i) for i in range(size)], "total": size}
+        details = [make_appointment(i, detailed=True) for i in range(size)]
+        customers = {"items": [make_customer(i) for i in range(size)], "total": size}
+        benchmarks[f"serialize/AppointmentListResponse/{size}"] = (
+            lambda payload=appointments: json.dumps(AppointmentListResponse.model_validate(payload).model_dump(mode="json"))
+        )
+        benchmarks[f"serialize/AppointmentDetailResponse/{size}"] = (
+            lambda payload=details: json.dumps(detail_list.dump_python(detail_list.validate_python(payload), mode="json"))
+        )
+        benchmarks[f"serialize/CustomerListResponse/{size}"] = (
+            lambda payload=customers: json.dumps(CustomerListResponse.model_validate(payload).model_dump(mode="json"))
+        )
+
+        # CPU cost of one sentiment pipeline chunk, i.e. what each worker process does
+        comments = [make_appointment(i, detailed=True).feedback.comments for i in range(size)]
+        benchmarks[f"score/sentiment/{size}"] = lambda comments=comments: score_texts(comments)
+
+        # Matching a campaign list against a segment, as /promotions/{id}/audience does
+        campaign = list(range(1, size * 97, 97))
+        benchmarks[f"segments/match/{size}"] = lambda campaign=campaign: members(to_bitmap(campaign) & SEGMENT)
+
+        # Pricing a catalog of `size` services, as /services/pricing does on a cache miss
+        services = [CatalogRow(i + 1, f"Service {i}", 20.0 + i % 200) for i in range(size)]
+        promotions = [make_promotion(i, size) for i in range(max(size // 10, 4))]
+        benchmarks[f"pricing/effective_prices/{size}"] = (
+            lambda services=services, promotions=promotions: effective_prices(services, promotions)
+        )
+    return benchmarks
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    regressions = []
+    for name, value in results.items():
+        previous = baseline.get(name)
+        if previous and value > previous * (1 + threshold):
+            regressions.append(f"{name}: {previous:.1f} us -> {value:.1f} us (+{(value / previous - 1) * 100:.0f}%)")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for query construction, ORM hydration and serialization")
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this string")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.1, help="Minimum seconds per timed run")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown before failing (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    results = {}
+    for name, bench in collect_benchmarks().items():
+        if args.filter not in name:
+            continue
+        results[name] = round(time_per_call(bench, args.repeat, args.min_time), 2)
+        print(f"{results[name]:>12.2f} us  {name}")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.save_baseline:
+        # Benchmarks left out by --filter keep their previous baseline
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nBaseline saved to {args.baseline}")
+        sys.exit(0)
+
+    if not baseline:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        sys.exit(1)
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\nNo regressions over {args.threshold:.0%} against {args.baseline}")
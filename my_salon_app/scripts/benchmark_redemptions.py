@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, func, select
+
+from app.database import DB_MAX_OVERFLOW, DB_POOL_SIZE, get_engine, get_session_factory
+from app.models import (
+    Appointment, AppointmentStatus, Customer, Promotion, PromotionCustomerRedemption, PromotionRedemption, Service
+)
+from app.pricing import snapshot_price
+from app.redemptions import RedemptionLimitReached, redeem_promotion
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[rank], 2)
+
+async def book(service: Service, customer_id: int, promotion_id: int, gate: asyncio.Semaphore) -> Dict[str, Any]:
+    """Book the service for the customer redeeming the promotion, as POST /appointments does."""
+    async with gate, get_session_factory()() as session:
+        started = time.perf_counter()
+        appointment = Appointment(
+            customer_id=customer_id,
+            service_id=service.id,
+            appointment_time=datetime.now(timezone.utc) + timedelta(days=1),
+            status=AppointmentStatus.UPCOMING,
+            notes="Redemption benchmark",
+        )
+        await snapshot_price(session, appointment, service)
+        session.add(appointment)
+        try:
+            await redeem_promotion(session, appointment, promotion_id)
+            await session.commit()
+            outcome = "redeemed"
+        except RedemptionLimitReached:
+            await session.rollback()
+            outcome = "rejected"
+        return {"outcome": outcome, "latency_ms": (time.perf_counter() - started) * 1000}
+
+async def main(args):
+    try:
+        factory = get_session_factory()
+        async with factory() as session:
+            service = await session.scalar(select(Service).order_by(Service.id).limit(1))
+            customer_ids = (await session.scalars(select(Customer.id).order_by(Customer.id).limit(args.customers))).all()
+            if service is None or not customer_ids:
+                return {"error": "Needs at least one service and one customer; generate data first"}
+
+            # A flash sale that every booking races for
+            now = datetime.now(timezone.utc)
+            promotion = Promotion(
+                title="Redemption benchmark flash sale",
+                discount_percent=50,
+                start_date=now - timedelta(minutes=1),
+                end_date=now + timedelta(hours=1),
+                max_redemptions=args.cap,
+                max_redemptions_per_customer=args.per_customer_cap,
+            )
+            session.add(promotion)
+            await session.commit()
+            promotion_id = promotion.id
+            session.expunge(service)
+
+        gate = asyncio.Semaphore(args.concurrency)
+        started = time.perf_counter()
+        attempts = await asyncio.gather(*(
+            book(service, customer_id, promotion_id, gate)
+            for _ in range(args.attempts_per_customer)
+            for customer_id in customer_ids
+        ))
+        elapsed = time.perf_counter() - started
+
+        async with factory() as session:
+            redemption_count = await session.scalar(
+                select(Promotion.redemption_count).filter(Promotion.id == promotion_id)
+            )
+            recorded = await session.scalar(
+                select(func.count()).select_from(PromotionRedemption).filter(PromotionRedemption.promotion_id == promotion_id)
+            )
+            most_per_customer = await session.scalar(
+                select(func.max(PromotionCustomerRedemption.redemptions))
+                .filter(PromotionCustomerRedemption.promotion_id == promotion_id)
+            )
+            if not args.keep:
+                # Through the ORM, so the trend rollups of the booked day are queued again
+                appointments = (await session.scalars(
+                    select(Appointment).filter(Appointment.id.in_(
+                        select(PromotionRedemption.appointment_id).filter(PromotionRedemption.promotion_id == promotion_id)
+                    ))
+                )).all()
+                for appointment in appointments:
+                    await session.delete(appointment)
+                await session.execute(delete(Promotion).where(Promotion.id == promotion_id))
+                await session.commit()
+
+        latencies = sorted(attempt["latency_ms"] for attempt in attempts)
+        redeemed = sum(1 for attempt in attempts if attempt["outcome"] == "redeemed")
+        expected = min(args.cap, len(customer_ids) * min(args.attempts_per_customer, args.per_customer_cap))
+        return {
+            "promotion_id": promotion_id,
+            "attempts": len(attempts),
+            "concurrency": args.concurrency,
+            "redeemed": redeemed,
+            "rejected": len(attempts) - redeemed,
+            "duration_seconds": round(elapsed, 2),
+            "attempts_per_second": round(len(attempts) / elapsed, 2) if elapsed else 0,
+            "latency_ms": {
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "max": round(latencies[-1], 2),
+            },
+            # Every cap held and nothing was lost: the counter, the recorded redemptions
+            # and the successful bookings agree, and each is exactly what the caps allow
+            "consistent": (
+                redeemed == recorded == redemption_count == expected
+                and (most_per_customer or 0) <= args.per_customer_cap
+            ),
+        }
+    finally:
+        await get_engine().dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Race concurrent bookings for a capped flash-sale promotion and check the caps held"
+    )
+    parser.add_argument("--customers", type=int, default=300, help="Distinct customers booking")
+    parser.add_argument("--attempts-per-customer", type=int, default=2, help="Bookings each customer attempts")
+    parser.add_argument("--cap", type=int, default=100, help="max_redemptions of the promotion")
+    parser.add_argument("--per-customer-cap", type=int, default=1, help="max_redemptions_per_customer of the promotion")
+    parser.add_argument("--concurrency", type=int, default=DB_POOL_SIZE + DB_MAX_OVERFLOW,
+                        help="Bookings in flight at once (default: the connection pool size)")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark promotion and its appointments")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(main(args)), indent=2))
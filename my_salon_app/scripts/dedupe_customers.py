@@ -0,0 +1,50 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import get_engine, get_session_factory
+from app.dedupe import DEDUPE_MAX_BLOCK_SIZE, find_duplicates, merge_customers
+
+async def merge_clusters(clusters) -> int:
+    merged = 0
+    async with get_session_factory()() as session:
+        for cluster in clusters:
+            # One transaction per cluster, so a failure only skips that cluster
+            if await merge_customers(session, cluster["survivor_id"], cluster["duplicate_ids"]) is None:
+                await session.rollback()
+                print(f"Skipped cluster {cluster['survivor_id']}: a customer no longer exists")
+                continue
+            await session.commit()
+            merged += len(cluster["duplicate_ids"])
+    return merged
+
+async def main(args):
+    try:
+        report = await find_duplicates(args.threshold, args.max_block_size)
+        if args.merge:
+            report["merged"] = await merge_clusters(report["clusters"])
+        return report
+    finally:
+        await get_engine().dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find and optionally merge duplicate customers")
+    parser.add_argument("--threshold", type=float, default=0.6, help="Minimum pair score counted as a duplicate")
+    parser.add_argument("--max-block-size", type=int, default=DEDUPE_MAX_BLOCK_SIZE,
+                        help="Ignore blocking keys shared by more customers than this")
+    parser.add_argument("--merge", action="store_true", help="Merge every cluster found into its oldest customer")
+    parser.add_argument("--output", help="Write the full report, including every cluster, to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    summary = {key: value for key, value in report.items() if key != "clusters"}
+    summary["clusters"] = len(report["clusters"])
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,237 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, func, text
+from sqlalchemy.orm import joinedload
+
+from app.customer_overview import OVERVIEW_QUERY
+from app.database import get_engine
+from app.models import Appointment, Customer, Feedback, Promotion, KnowledgeBase, RatingAggregate, Service, Staff
+from app.routers.appointments import filter_appointments
+from app.promotion_index import covers, running
+from app.reporting import breakdown_query, daily_service_stats
+from app.rollups import trends_query
+from app.routers.customers import filter_customers
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_plan_baseline.json")
+
+# Sequential scans that are expected whatever the table size: query -> table. Counting
+# substring (ILIKE '%...%') matches reads every row without a trigram index.
+EXPECTED_SEQ_SCANS = {
+    "read_customers?name.count": "customers",
+}
+
+async def sample_parameters(conn) -> Dict[str, Any]:
+    """
+    Pick representative parameter values from the seeded data.
+
+    The busiest customer, staff member and service are used on purpose: they
+    produce the largest result sets and therefore the worst plans.
+    """
+    row = (await conn.execute(text("""
+        SELECT
+            (SELECT customer_id FROM appointments GROUP BY customer_id ORDER BY count(*) DESC LIMIT 1),
+            (SELECT staff_id FROM appointments WHERE staff_id IS NOT NULL
+                GROUP BY staff_id ORDER BY count(*) DESC LIMIT 1),
+            (SELECT service_id FROM appointments GROUP BY service_id ORDER BY count(*) DESC LIMIT 1),
+            (SELECT max(appointment_time) FROM appointments),
+            (SELECT max(id) FROM appointments),
+            (SELECT phone FROM customers ORDER BY id DESC LIMIT 1),
+            (SELECT name FROM customers ORDER BY id DESC LIMIT 1),
+            (SELECT category FROM knowledge_base WHERE category IS NOT NULL LIMIT 1),
+            (SELECT category_id FROM services WHERE category_id IS NOT NULL LIMIT 1)
+    """))).one()
+    latest = row[3] or datetime.now()
+    return {
+        "customer_id": row[0] or 1,
+        "staff_id": row[1] or 1,
+        "service_id": row[2] or 1,
+        "date_from": (latest - timedelta(days=7)).date(),
+        "date_to": latest.date(),
+        "appointment_id": row[4] or 1,
+        "phone": row[5] or "",
+        "name_fragment": (row[6] or "a").split()[0][:4],
+        "kb_category": row[7] or "general",
+        "category_id": row[8] or 1,
+    }
+
+def router_queries(p: Dict[str, Any]) -> Dict[str, Any]:
+    """The statements issued by the routers, keyed by route and filter combination."""
+    now = datetime.now()
+    day_start = datetime.combine(p["date_to"], datetime.min.time())
+    day_end = datetime.combine(p["date_to"], datetime.max.time())
+    kb_search = KnowledgeBase.question.ilike("%massage%") | KnowledgeBase.answer.ilike("%massage%")
+    count_appointments = select(func.count()).select_from(Appointment)
+
+    return {
+        "read_appointments": select(Appointment).offset(0).limit(100),
+        "read_appointments.count": count_appointments,
+        "read_appointments?customer_id": filter_appointments(select(Appointment), customer_id=p["customer_id"]).limit(100),
+        "read_appointments?customer_id.count": filter_appointments(count_appointments, customer_id=p["customer_id"]),
+        "read_appointments?staff_id&dates": filter_appointments(
+            select(Appointment), staff_id=p["staff_id"], date_from=p["date_from"], date_to=p["date_to"]
+        ).limit(100),
+        "read_appointments?status&dates.count": filter_appointments(
+            count_appointments, status="upcoming", date_from=p["date_from"], date_to=p["date_to"]
+        ),
+        "get_today_appointments": select(Appointment).filter(
+            Appointment.appointment_time >= day_start, Appointment.appointment_time <= day_end
+        ).offset(0).limit(100),
+        "read_appointment": select(Appointment).options(
+            joinedload(Appointment.customer),
+            joinedload(Appointment.service),
+            joinedload(Appointment.staff),
+            joinedload(Appointment.feedback),
+        ).filter(Appointment.id == p["appointment_id"]),
+        "read_customers?name": filter_customers(select(Customer), name=p["name_fragment"]).limit(100),
+        "read_customers?name.count": filter_customers(select(func.count()).select_from(Customer), name=p["name_fragment"]),
+        "read_customers?pref": filter_customers(
+            select(Customer), preferences={"preferred_day": ["Saturday"], "preferred_time": ["morning"]}
+        ).limit(100),
+        "read_customers?pref.count": filter_customers(
+            select(func.count()).select_from(Customer), preferences={"preferred_day": ["Saturday"]}
+        ),
+        "find_customer_by_phone": select(Customer).filter(Customer.phone == p["phone"]),
+        "read_customer_overview": OVERVIEW_QUERY.bindparams(customer_id=p["customer_id"], limit=5),
+        "get_customer_appointments": select(Appointment).filter(Appointment.customer_id == p["customer_id"]).limit(100),
+        "read_feedback?customer_id": select(Feedback).filter(Feedback.customer_id == p["customer_id"]).limit(100),
+        "get_feedback_by_appointment": select(Feedback).filter(Feedback.appointment_id == p["appointment_id"]),
+        "get_average_rating": select(RatingAggregate).filter(RatingAggregate.dimension == "overall", RatingAggregate.key == ""),
+        "get_daily_rating_stats": select(RatingAggregate).filter(
+            RatingAggregate.dimension == "day",
+            RatingAggregate.key >= p["date_from"].isoformat(),
+            RatingAggregate.key <= p["date_to"].isoformat(),
+        ).order_by(RatingAggregate.key),
+        "get_active_promotions": select(Promotion).filter(running(now)).order_by(Promotion.id),
+        "get_active_promotions?service_id": select(Promotion).filter(running(now), covers(p["service_id"])).order_by(Promotion.id),
+        "search_knowledge_base": select(KnowledgeBase).filter(kb_search).offset(0).limit(100),
+        "get_entries_by_category": select(KnowledgeBase).filter(KnowledgeBase.category == p["kb_category"]).limit(100),
+        "get_services_by_category": select(Service).filter(Service.category_id == p["category_id"]).limit(100),
+        "read_staff_members?is_active": select(Staff).filter(Staff.is_active.is_(True)).limit(100),
+        "get_overall_trends?month": trends_query("month", "overall", 0, p["date_to"] - timedelta(days=365), p["date_to"]),
+        # The reports' default range: the last 30 days
+        "get_revenue_report?service": breakdown_query(
+            "service", p["date_to"] - timedelta(days=29), p["date_to"], func.sum(daily_service_stats.c.revenue)
+        ),
+        "get_staff_trends": trends_query("day", "staff", p["staff_id"], p["date_to"] - timedelta(days=29), p["date_to"]),
+    }
+
+def walk(node: Dict[str, Any]):
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk(child)
+
+def find_problems(plan: Dict[str, Any], seq_scan_rows: int, expected_scan: Optional[str] = None) -> List[str]:
+    problems = []
+    for node in walk(plan["Plan"]):
+        node_type = node["Node Type"]
+        loops = node.get("Actual Loops", 1)
+        if node_type == "Seq Scan" and node.get("Relation Name") != expected_scan:
+            scanned = (node.get("Actual Rows", 0) + node.get("Rows Removed by Filter", 0)) * loops
+            if scanned > seq_scan_rows:
+                problems.append(f"Seq Scan on {node.get('Relation Name')} read {scanned} rows")
+        if node_type in ("Sort", "Incremental Sort") and node.get("Sort Space Type") == "Disk":
+            problems.append(f"Sort spilled {node.get('Sort Space Used')} kB to disk ({node.get('Sort Method')})")
+        if node_type == "Hash" and node.get("Hash Batches", 1) > 1:
+            problems.append(f"Hash spilled to disk in {node['Hash Batches']} batches")
+    return problems
+
+def bind_statement(statement, dialect) -> Tuple[str, Tuple[Any, ...]]:
+    """
+    Compile a statement the way it is executed: SQL with placeholders, plus its
+    parameters converted by their column types (JSONB documents, enums, ...).
+    Rendering the values inline instead fails for types without a literal form.
+    """
+    compiled = statement.compile(dialect=dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.construct_params()
+    values = []
+    for key in compiled.positiontup:
+        value = params[key]
+        processor = compiled.binds[key].type.dialect_impl(dialect).bind_processor(dialect)
+        values.append(processor(value) if processor else value)
+    return str(compiled), tuple(values)
+
+async def explain_all(seq_scan_rows: int) -> Dict[str, Dict[str, Any]]:
+    engine = get_engine()
+    results = {}
+    async with engine.connect() as conn:
+        params = await sample_parameters(conn)
+        for name, statement in router_queries(params).items():
+            sql, values = bind_statement(statement, engine.dialect)
+            result = await conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", values)
+            plan = result.scalar()
+            plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]
+            results[name] = {
+                "total_cost": plan["Plan"]["Total Cost"],
+                "execution_ms": plan["Execution Time"],
+                "shared_read_blocks": plan["Plan"].get("Shared Read Blocks", 0),
+                "problems": find_problems(plan, seq_scan_rows, EXPECTED_SEQ_SCANS.get(name)),
+                "sql": sql,
+                "params": values,
+            }
+        await conn.rollback()
+    return results
+
+def cost_regressions(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], threshold: float) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name, {}).get("total_cost")
+        if previous and result["total_cost"] > previous * (1 + threshold):
+            regressions.append(f"{name}: cost {previous:.0f} -> {result['total_cost']:.0f}")
+    return regressions
+
+async def main(args) -> int:
+    try:
+        results = await explain_all(args.seq_scan_rows)
+    finally:
+        await get_engine().dispose()
+
+    for name, result in results.items():
+        flag = "!!" if result["problems"] else "  "
+        print(f"{flag} {result['total_cost']:>12.1f} cost {result['execution_ms']:>10.2f} ms  {name}")
+        for problem in result["problems"]:
+            print(f"       - {problem}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+
+    if args.save_baseline:
+        baseline = {name: {"total_cost": r["total_cost"]} for name, r in results.items()}
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    failures = [f"{name}: {problem}" for name, r in results.items() for problem in r["problems"]]
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            failures += cost_regressions(results, json.load(f), args.cost_threshold)
+    else:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+
+    if failures:
+        print(f"\n{len(failures)} plan problem(s):")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\nNo plan problems found")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE every router query against the local database")
+    parser.add_argument("--seq-scan-rows", type=int, default=10000, help="Flag sequential scans reading more rows than this")
+    parser.add_argument("--cost-threshold", type=float, default=0.2, help="Allowed plan cost increase over the baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file to compare plan costs against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the plan costs as the new baseline")
+    parser.add_argument("--json", help="Write full results, including the SQL and its parameters, to this file")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,31 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import get_engine
+from app.snapshots import SNAPSHOT_DIR, SNAPSHOT_TABLES, SnapshotExportRunning, export_snapshots
+
+async def main(args):
+    try:
+        return await export_snapshots(args.tables, output_dir=args.output, full=args.full)
+    except SnapshotExportRunning as e:
+        return {"error": str(e)}
+    finally:
+        await get_engine().dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export tables to partitioned Parquet snapshots for analytics")
+    parser.add_argument("--output", default=SNAPSHOT_DIR, help="Snapshot directory (default: SNAPSHOT_DIR)")
+    parser.add_argument("--tables", nargs="+", choices=list(SNAPSHOT_TABLES), help="Tables to export (default: all)")
+    parser.add_argument("--full", action="store_true", help="Ignore watermarks and rewrite every row")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    print(json.dumps(report, indent=2))
+    if "error" in report:
+        sys.exit(1)
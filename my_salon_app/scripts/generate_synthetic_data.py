@@ -0,0 +1,299 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional, Tuple
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import get_engine, raw_connection
+from app.loyalty import OPEN_LEDGER_STATEMENTS
+from app.rating_stats import REBUILD_STATEMENTS
+from app.reporting import VIEWS
+from app.rollups import RESET_STATEMENTS, refresh_rollups
+
+FIRST_NAMES = [
+    "John", "Jane", "Alice", "Michael", "Sarah", "David", "Emma", "Olivia", "Liam", "Noah",
+    "Sophia", "Mia", "Lucas", "Amelia", "Ethan", "Isabella", "Mason", "Ava", "Logan", "Harper",
+    "Priya", "Arjun", "Chen", "Yuki", "Fatima", "Omar", "Elena", "Mateo", "Zara", "Kofi",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Brown", "Wilson", "Lee", "Garcia", "Martinez", "Davis", "Lopez", "Clark",
+    "Patel", "Sharma", "Wang", "Kim", "Nguyen", "Khan", "Rossi", "Muller", "Silva", "Okafor",
+]
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+TIMES = ["morning", "afternoon", "evening"]
+CATEGORIES = {
+    "Hair": ["Haircut", "Coloring", "Highlights", "Blow Dry", "Keratin Treatment"],
+    "Massage": ["Swedish Massage", "Deep Tissue Massage", "Hot Stone Massage", "Aromatherapy Massage"],
+    "Nails": ["Manicure", "Pedicure", "Gel Nails", "Nail Art"],
+    "Skin": ["Facial", "Chemical Peel", "Microdermabrasion", "Hydrafacial"],
+    "Body": ["Body Scrub", "Body Wrap", "Waxing", "Spray Tan"],
+}
+ROLES = {
+    "Hair Stylist": ["haircut", "coloring", "styling", "highlights"],
+    "Massage Therapist": ["swedish", "deep tissue", "hot stone", "aromatherapy"],
+    "Nail Technician": ["manicure", "pedicure", "nail art", "gel"],
+    "Esthetician": ["facial", "peel", "waxing", "microdermabrasion"],
+}
+COMMENTS = {
+    1: ["Terrible experience, very rude staff.", "Waited an hour and the service was awful."],
+    2: ["Not great, the room was cold.", "Disappointing, expected much better."],
+    3: ["It was okay.", "Average service, nothing special."],
+    4: ["Good service, will come back.", "Very relaxing, friendly staff."],
+    5: ["Excellent service, highly recommend!", "Amazing experience, best massage ever!", "Great service, very satisfied!"],
+}
+KB_TOPICS = {
+    "booking": ["How do I book an appointment?", "Can I book online?", "How far ahead can I book?"],
+    "policies": ["What is your cancellation policy?", "Do you charge a late fee?", "Can I reschedule?"],
+    "pricing": ["Do you offer gift cards?", "Are there membership discounts?", "Do you accept credit cards?"],
+    "wellness": ["What are the benefits of massage?", "How often should I get a facial?", "Is hot stone massage safe?"],
+    "general": ["What are your opening hours?", "Is parking available?", "Do you have wifi?"],
+}
+
+def skewed_weights(count: int, exponent: float) -> List[float]:
+    """Cumulative Zipf-like weights: a few entities get most of the traffic."""
+    return list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, count + 1)))
+
+class SyntheticData:
+    """
+    Deterministic generator of related, skewed salon data.
+
+    Ids are assigned by the generator so that rows can reference each other
+    without round trips; every table must be empty (or truncated) before loading.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.now = datetime(2026, 1, 1, tzinfo=timezone.utc) if args.fixed_now else datetime.now(timezone.utc)
+        self.service_prices: List[Tuple[float, int]] = []
+        self.service_categories: List[int] = []
+
+    def service_categories_rows(self) -> Iterator[tuple]:
+        for category_id, name in enumerate(CATEGORIES, start=1):
+            yield (category_id, name, f"{name} treatments", self.now - timedelta(days=self.args.days))
+
+    def services_rows(self) -> Iterator[tuple]:
+        names = [(category_id, base) for category_id, bases in enumerate(CATEGORIES.values(), start=1) for base in bases]
+        for service_id in range(1, self.args.services + 1):
+            category_id, base = names[(service_id - 1) % len(names)]
+            variant = (service_id - 1) // len(names)
+            name = base if variant == 0 else f"{base} {['Express', 'Deluxe', 'Signature', 'Premium'][variant % 4]} {variant}"
+            duration = self.rng.choice([30, 45, 60, 75, 90, 120])
+            price = round(duration * self.rng.uniform(0.8, 2.5), 2)
+            self.service_prices.append((price, duration))
+            self.service_categories.append(category_id)
+            yield (service_id, name, price, duration, f"{name} by our specialists", category_id,
+                   self.now - timedelta(days=self.args.days))
+
+    def staff_rows(self) -> Iterator[tuple]:
+        roles = list(ROLES.items())
+        for staff_id in range(1, self.args.staff + 1):
+            role, skills = roles[staff_id % len(roles)]
+            name = f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}"
+            yield (staff_id, name, role, json.dumps(self.rng.sample(skills, self.rng.randint(1, len(skills)))),
+                   self.rng.random() < 0.9, self.now - timedelta(days=self.rng.randint(0, self.args.days)))
+
+    def customer_identity(self, customer_id: int) -> Tuple[str, str, Optional[str]]:
+        """Name and email derived from the id, so near-duplicates can reproduce them."""
+        mixed = (customer_id * 2654435761) % 2**32
+        first = FIRST_NAMES[mixed % len(FIRST_NAMES)]
+        last = LAST_NAMES[(mixed // len(FIRST_NAMES)) % len(LAST_NAMES)]
+        email = f"{first.lower()}.{last.lower()}{customer_id}@example.com" if mixed % 10 < 7 else None
+        return first, last, email
+
+    def customers_rows(self) -> Iterator[tuple]:
+        duplicated = set()
+        for customer_id in range(1, self.args.customers + 1):
+            first, last, email = self.customer_identity(customer_id)
+            phone = f"+1555{customer_id:07d}"
+            if customer_id > 1 and self.rng.random() < self.args.duplicate_rate:
+                original = self.rng.randint(1, customer_id - 1)
+                if original not in duplicated:
+                    # Same person as an earlier customer, entered with another phone format,
+                    # a misspelled last name and a differently cased email
+                    duplicated.add(original)
+                    first, last, email = self.customer_identity(original)
+                    digits = f"555{original:07d}"
+                    phone = f"({digits[:3]}) {digits[3:6]}-{digits[6:]}"
+                    cut = self.rng.randrange(1, len(last))
+                    last = last[:cut] + last[cut + 1:]
+                    email = email.upper() if email else None
+            customer_type = "VIP" if self.rng.random() < 0.05 else "STANDARD"
+            preferences = json.dumps({"preferred_day": self.rng.choice(DAYS), "preferred_time": self.rng.choice(TIMES)})
+            yield (customer_id, f"{first} {last}", phone, email, customer_type, preferences,
+                   self.rng.randint(0, 500), self.now - timedelta(days=self.rng.randint(0, self.args.days)))
+
+    def appointments_chunks(self) -> Iterator[Tuple[List[tuple], List[tuple]]]:
+        """Yield (appointments, feedback) chunks so memory stays bounded by the chunk size."""
+        customer_weights = skewed_weights(self.args.customers, 0.6)
+        staff_weights = skewed_weights(self.args.staff, 0.4)
+        service_weights = skewed_weights(self.args.services, 0.9)
+        customers = range(1, self.args.customers + 1)
+        staff = range(1, self.args.staff + 1)
+        services = range(1, self.args.services + 1)
+        span_minutes = (self.args.days + 30) * 24 * 60
+        start = self.now - timedelta(days=self.args.days)
+
+        appointment_id = 0
+        feedback_id = 0
+        remaining = self.args.appointments
+        while remaining > 0:
+            size = min(self.args.chunk_size, remaining)
+            remaining -= size
+            appointments, feedback = [], []
+            picked_customers = self.rng.choices(customers, cum_weights=customer_weights, k=size)
+            picked_staff = self.rng.choices(staff, cum_weights=staff_weights, k=size)
+            picked_services = self.rng.choices(services, cum_weights=service_weights, k=size)
+            for customer_id, staff_id, service_id in zip(picked_customers, picked_staff, picked_services):
+                appointment_id += 1
+                day = start + timedelta(minutes=self.rng.randrange(span_minutes))
+                appointment_time = day.replace(hour=self.rng.randint(9, 19), minute=self.rng.choice((0, 15, 30, 45)))
+                if appointment_time < self.now:
+                    status = "COMPLETED" if self.rng.random() < 0.88 else "CANCELLED"
+                else:
+                    status = "UPCOMING" if self.rng.random() < 0.95 else "CANCELLED"
+                created_at = min(appointment_time - timedelta(days=self.rng.randint(0, 30)), self.now)
+                # Prices rise about 5% a year, so older bookings were cheaper than today's price
+                price, duration = self.service_prices[service_id - 1]
+                years_ago = max((self.now - created_at).days, 0) / 365
+                price_at_booking = round(price / 1.05 ** years_ago, 2)
+                discount = self.rng.choice((10.0, 15.0, 20.0, 25.0)) if self.rng.random() < 0.1 else 0.0
+                appointments.append((
+                    appointment_id, customer_id, service_id,
+                    staff_id if self.rng.random() < 0.95 else None,
+                    appointment_time, status, None, price_at_booking, duration, discount, created_at,
+                ))
+                if status == "COMPLETED" and self.rng.random() < self.args.feedback_rate:
+                    feedback_id += 1
+                    rating = self.rng.choices((1, 2, 3, 4, 5), weights=(3, 5, 12, 35, 45))[0]
+                    comments = self.rng.choice(COMMENTS[rating]) if self.rng.random() < 0.8 else None
+                    created_at = min(appointment_time + timedelta(hours=self.rng.randint(1, 72)), self.now)
+                    feedback.append((feedback_id, appointment_id, customer_id, rating, comments, created_at))
+            yield appointments, feedback
+
+    def promotions_rows(self) -> Iterator[tuple]:
+        for promotion_id in range(1, self.args.promotions + 1):
+            start_date = self.now + timedelta(days=self.rng.randint(-self.args.days, 60))
+            end_date = start_date + timedelta(days=self.rng.randint(3, 90)) if self.rng.random() < 0.9 else None
+            service_id = self.rng.randint(1, self.args.services) if self.rng.random() < 0.7 else None
+            discount = self.rng.choice([5, 10, 15, 20, 25, 30, 40, 50])
+            yield (promotion_id, f"Promotion {promotion_id}", f"{discount}% off", float(discount), start_date,
+                   end_date, service_id, self.rng.random() < 0.85, start_date - timedelta(days=7))
+
+    def knowledge_base_rows(self) -> Iterator[tuple]:
+        topics = [(category, question) for category, questions in KB_TOPICS.items() for question in questions]
+        for entry_id in range(1, self.args.kb + 1):
+            category, question = topics[(entry_id - 1) % len(topics)]
+            if entry_id > len(topics):
+                question = f"{question} ({entry_id})"
+            yield (entry_id, question, f"Answer to: {question}", category, self.now - timedelta(days=self.rng.randint(0, 365)))
+
+TABLES = {
+    "service_categories": ["id", "name", "description", "created_at"],
+    "services": ["id", "name", "price", "duration_minutes", "description", "category_id", "created_at"],
+    "staff": ["id", "name", "role", "skills", "is_active", "created_at"],
+    "customers": ["id", "name", "phone", "email", "type", "preferences", "loyalty_points", "created_at"],
+    "appointments": [
+        "id", "customer_id", "service_id", "staff_id", "appointment_time", "status", "notes",
+        "price_at_booking", "duration_at_booking", "discount_percent", "created_at",
+    ],
+    "feedback": ["id", "appointment_id", "customer_id", "rating", "comments", "created_at"],
+    "promotions": ["id", "title", "description", "discount_percent", "start_date", "end_date", "service_id", "is_active", "created_at"],
+    "knowledge_base": ["id", "question", "answer", "category", "created_at"],
+}
+
+async def copy_rows(conn, table: str, rows) -> int:
+    """Stream rows from a generator into `table` with COPY and return the row count."""
+    started = time.perf_counter()
+    status = await conn.copy_records_to_table(table, records=rows, columns=TABLES[table])
+    count = int(status.split()[-1])
+    print(f"  {table}: {count} rows in {time.perf_counter() - started:.1f}s")
+    return count
+
+async def generate(args):
+    data = SyntheticData(args)
+    started = time.perf_counter()
+    async with raw_connection() as conn:
+        async with conn.transaction():
+            if args.truncate:
+                await conn.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+            else:
+                for table in TABLES:
+                    if await conn.fetchval(f"SELECT EXISTS (SELECT 1 FROM {table})"):
+                        raise SystemExit(f"Table {table} is not empty; pass --truncate to replace existing data")
+
+            print("Loading reference data...")
+            await copy_rows(conn, "service_categories", data.service_categories_rows())
+            await copy_rows(conn, "services", data.services_rows())
+            await copy_rows(conn, "staff", data.staff_rows())
+            await copy_rows(conn, "customers", data.customers_rows())
+            await copy_rows(conn, "promotions", data.promotions_rows())
+            await copy_rows(conn, "knowledge_base", data.knowledge_base_rows())
+
+            print("Loading appointments and feedback...")
+            appointments = feedback = 0
+            chunk_started = time.perf_counter()
+            for appointment_rows, feedback_rows in data.appointments_chunks():
+                await conn.copy_records_to_table("appointments", records=appointment_rows, columns=TABLES["appointments"])
+                if feedback_rows:
+                    await conn.copy_records_to_table("feedback", records=feedback_rows, columns=TABLES["feedback"])
+                appointments += len(appointment_rows)
+                feedback += len(feedback_rows)
+                rate = appointments / (time.perf_counter() - chunk_started)
+                print(f"  appointments: {appointments} ({rate:,.0f} rows/s), feedback: {feedback}")
+
+            # Generated balances already cover the generated history; record them in the ledger
+            print("Opening the loyalty ledger...")
+            for statement in OPEN_LEDGER_STATEMENTS:
+                await conn.execute(statement)
+
+            print("Building rating aggregates...")
+            for statement in REBUILD_STATEMENTS:
+                await conn.execute(statement)
+            for statement in RESET_STATEMENTS:
+                await conn.execute(statement)
+
+            print("Refreshing reporting views...")
+            for view in VIEWS:
+                await conn.execute(f"REFRESH MATERIALIZED VIEW {view}")
+
+            # Ids were assigned explicitly, so move the serial sequences past them
+            for table in TABLES:
+                await conn.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 0) + 1, false) FROM {table}"
+                )
+
+        print("Analyzing tables...")
+        await conn.execute(f"ANALYZE {', '.join(TABLES)}, loyalty_transactions, rating_aggregates, {', '.join(VIEWS)}")
+
+    print("Building trend rollups...")
+    await refresh_rollups()
+    await get_engine().dispose()
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate production-scale synthetic salon data with COPY")
+    parser.add_argument("--customers", type=int, default=200_000)
+    parser.add_argument("--staff", type=int, default=2_000)
+    parser.add_argument("--services", type=int, default=200)
+    parser.add_argument("--appointments", type=int, default=2_000_000)
+    parser.add_argument("--promotions", type=int, default=500)
+    parser.add_argument("--kb", type=int, default=2_000, help="Knowledge base entries")
+    parser.add_argument("--days", type=int, default=730, help="Days of appointment history")
+    parser.add_argument("--feedback-rate", type=float, default=0.3, help="Share of completed appointments with feedback")
+    parser.add_argument("--duplicate-rate", type=float, default=0.01, help="Share of customers that are near-duplicates")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="Appointments generated per COPY")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--fixed-now", action="store_true", help="Anchor dates to 2026-01-01 for fully reproducible data")
+    parser.add_argument("--truncate", action="store_true", help="Truncate all tables before loading")
+    args = parser.parse_args()
+
+    asyncio.run(generate(args))
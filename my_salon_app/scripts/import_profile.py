@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List
+
+# Run imports from the project root so `app` resolves like it does under uvicorn
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_importtime(module: str) -> List[Dict[str, Any]]:
+    """Import `module` in a fresh interpreter with -X importtime and parse its report."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append({
+            "module": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+    return entries
+
+def summarize(module: str, top: int) -> Dict[str, Any]:
+    entries = run_importtime(module)
+    target = next((e for e in entries if e["module"] == module), None)
+
+    # Self time grouped by top-level package shows which dependency dominates
+    packages: Dict[str, int] = defaultdict(int)
+    for entry in entries:
+        packages[entry["module"].split(".")[0]] += entry["self_us"]
+
+    return {
+        "module": module,
+        "total_ms": round(target["cumulative_us"] / 1000, 2) if target else None,
+        "modules_imported": len(entries),
+        "top_packages_ms": {
+            name: round(us / 1000, 2)
+            for name, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        },
+        "top_modules_cumulative_ms": {
+            e["module"]: round(e["cumulative_us"] / 1000, 2)
+            for e in sorted(entries, key=lambda e: e["cumulative_us"], reverse=True)[:top]
+        },
+    }
+
+def print_summary(summary: Dict[str, Any]):
+    print(f"\n{summary['module']}: {summary['total_ms']} ms, {summary['modules_imported']} modules imported")
+    print("  Self time by package:")
+    for name, ms in summary["top_packages_ms"].items():
+        print(f"    {ms:>9.2f} ms  {name}")
+    print("  Slowest modules (cumulative):")
+    for name, ms in summary["top_modules_cumulative_ms"].items():
+        print(f"    {ms:>9.2f} ms  {name}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize `python -X importtime` for application modules")
+    parser.add_argument("modules", nargs="*", default=["app.main", "app.database"])
+    parser.add_argument("--top", type=int, default=15, help="Number of packages and modules to list")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    summaries = [summarize(module, args.top) for module in args.modules]
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+    else:
+        for summary in summaries:
+            print_summary(summary)
@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+# Reuse the endpoint defaults and fixture payloads of the functional test script
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from test_api import BASE_URL, test_data
+
+# Default request mix: weights of each scenario
+DEFAULT_MIX = {"booking": 1, "front_desk": 3, "chatbot": 3, "caller_id": 3}
+
+KB_SEARCH_TERMS = ["massage", "cancel", "gift", "hours", "price", "facial", "booking", "parking"]
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[rank], 2)
+
+def latency_summary(latencies: List[float]) -> Dict[str, Optional[float]]:
+    values = sorted(latencies)
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "mean": round(sum(values) / len(values), 2) if values else None,
+        "max": round(values[-1], 2) if values else None,
+    }
+
+class Stats:
+    """Latency and error bookkeeping per endpoint label."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.error_types: Dict[str, int] = defaultdict(int)
+        self.scenarios: Dict[str, int] = defaultdict(int)
+
+    def record(self, label: str, latency_ms: float, error: Optional[str] = None):
+        self.latencies[label].append(latency_ms)
+        if error:
+            self.errors[label] += 1
+            self.error_types[error] += 1
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        all_latencies = [value for values in self.latencies.values() for value in values]
+        total = len(all_latencies)
+        total_errors = sum(self.errors.values())
+        return {
+            "duration_seconds": round(elapsed, 2),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0,
+            "error_rate": round(total_errors / total, 4) if total else 0,
+            "errors": dict(self.error_types),
+            "latency_ms": latency_summary(all_latencies),
+            "scenarios": dict(self.scenarios),
+            "endpoints": {
+                label: {
+                    "requests": len(values),
+                    "error_rate": round(self.errors[label] / len(values), 4),
+                    "latency_ms": latency_summary(values),
+                }
+                for label, values in sorted(self.latencies.items())
+            },
+        }
+
+class LoadTest:
+    """Drive realistic request scenarios against the API from concurrent workers."""
+
+    def __init__(self, client: httpx.AsyncClient, stats: Stats, rng: random.Random):
+        self.client = client
+        self.stats = stats
+        self.rng = rng
+        self.customer_phones: List[str] = []
+        self.service_ids: List[int] = []
+        self.staff_ids: List[int] = []
+        self.kb_categories: List[str] = []
+        self.created_appointments: List[int] = []
+
+    async def request(self, label: str, method: str, url: str, expected=(200,), **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.stats.record(label, (time.perf_counter() - started) * 1000, type(e).__name__)
+            return None
+        latency_ms = (time.perf_counter() - started) * 1000
+        error = None if response.status_code in expected else f"HTTP {response.status_code}"
+        self.stats.record(label, latency_ms, error)
+        return response
+
+    async def setup(self):
+        """Collect ids to work with, creating a minimal fixture set when the database is empty."""
+        services = (await self.client.get("/api/services", params={"limit": 100})).json()["items"]
+        if not services:
+            category = (await self.client.post("/api/service-categories", json=test_data["service_category"]["create"])).json()
+            service = dict(test_data["service"]["create"], category_id=category["id"])
+            services = [(await self.client.post("/api/services", json=service)).json()]
+        self.service_ids = [service["id"] for service in services]
+
+        staff = (await self.client.get("/api/staff", params={"is_active": True, "limit": 100})).json()["items"]
+        if not staff:
+            staff = [(await self.client.post("/api/staff", json=test_data["staff"]["create"])).json()]
+        self.staff_ids = [member["id"] for member in staff]
+
+        customers = (await self.client.get("/api/customers", params={"limit": 100})).json()["items"]
+        if not customers:
+            customers = [(await self.client.post("/api/customers", json=test_data["customer"]["create"])).json()]
+        self.customer_phones = [customer["phone"] for customer in customers]
+
+        entries = (await self.client.get("/api/knowledge-base", params={"limit": 100})).json()["items"]
+        self.kb_categories = sorted({entry["category"] for entry in entries if entry.get("category")})
+
+    async def booking(self):
+        """Customer books online: browse the catalog, identify, book and view the booking."""
+        await self.request("GET /api/services", "GET", "/api/services")
+        await self.request("GET /api/promotions/active/now", "GET", "/api/promotions/active/now")
+        await self.request("GET /api/staff", "GET", "/api/staff", params={"is_active": True})
+        phone = self.rng.choice(self.customer_phones)
+        response = await self.request(
+            "GET /api/customers/search/phone/{phone}", "GET", f"/api/customers/search/phone/{phone}"
+        )
+        if response is None or response.status_code != 200:
+            return
+        appointment = {
+            "customer_id": response.json()["id"],
+            "service_id": self.rng.choice(self.service_ids),
+            "staff_id": self.rng.choice(self.staff_ids),
+            "appointment_time": (datetime.now() + timedelta(days=self.rng.randint(1, 30), hours=self.rng.randint(9, 18))).isoformat(),
+            "notes": "load test",
+        }
+        response = await self.request("POST /api/appointments", "POST", "/api/appointments", json=appointment)
+        if response is not None and response.status_code == 200:
+            appointment_id = response.json()["id"]
+            self.created_appointments.append(appointment_id)
+            await self.request("GET /api/appointments/{id}", "GET", f"/api/appointments/{appointment_id}")
+
+    async def front_desk(self):
+        """Front desk screen polling today's schedule."""
+        today = datetime.now().date().isoformat()
+        await self.request("GET /api/appointments/today/", "GET", "/api/appointments/today/")
+        await self.request(
+            "GET /api/appointments?status&date",
+            "GET",
+            "/api/appointments",
+            params={"status": "upcoming", "date_from": today, "date_to": today},
+        )
+
+    async def chatbot(self):
+        """Chatbot answering questions from the knowledge base."""
+        term = self.rng.choice(KB_SEARCH_TERMS)
+        await self.request("GET /api/knowledge-base/search/", "GET", "/api/knowledge-base/search/", params={"query": term})
+        if self.kb_categories:
+            category = self.rng.choice(self.kb_categories)
+            await self.request("GET /api/knowledge-base/category/{category}", "GET", f"/api/knowledge-base/category/{category}")
+        await self.request("GET /api/promotions/active/now", "GET", "/api/promotions/active/now")
+
+    async def caller_id(self):
+        """Phone system looking up incoming callers; some callers are unknown."""
+        if self.rng.random() < 0.8:
+            phone = self.rng.choice(self.customer_phones)
+        else:
+            phone = f"+1555{self.rng.randint(0, 9999999):07d}"
+        await self.request(
+            "GET /api/customers/search/phone/{phone}",
+            "GET",
+            f"/api/customers/search/phone/{phone}",
+            expected=(200, 404),
+        )
+
+    async def worker(self, scenarios: List[Callable], weights: List[float], deadline: float):
+        while time.perf_counter() < deadline:
+            scenario = self.rng.choices(scenarios, weights)[0]
+            self.stats.scenarios[scenario.__name__] += 1
+            await scenario()
+
+    async def cleanup(self):
+        for appointment_id in self.created_appointments:
+            await self.client.delete(f"/api/appointments/{appointment_id}")
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+async def run(args) -> Dict[str, Any]:
+    stats = Stats()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        load_test = LoadTest(client, stats, random.Random(args.seed))
+        await load_test.setup()
+
+        mix = parse_mix(args.mix)
+        unknown = set(mix) - set(DEFAULT_MIX)
+        if unknown:
+            raise ValueError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        scenarios = [getattr(load_test, name) for name in mix]
+        weights = list(mix.values())
+
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(load_test.worker(scenarios, weights, deadline) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        if not args.keep_data:
+            await load_test.cleanup()
+
+    report = stats.report(elapsed)
+    report["config"] = {
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "duration_seconds": args.duration,
+        "mix": mix,
+        "seed": args.seed,
+    }
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent load test for the Salon Management API")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--concurrency", type=int, default=20, help="Number of concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="Test duration in seconds")
+    parser.add_argument(
+        "--mix",
+        default=",".join(f"{name}={weight}" for name, weight in DEFAULT_MIX.items()),
+        help="Scenario weights, e.g. booking=1,front_desk=3,chatbot=3,caller_id=3",
+    )
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--keep-data", action="store_true", help="Keep appointments created by the booking scenario")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
@@ -0,0 +1,25 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import get_engine
+from app.loyalty import LOYALTY_BATCH_SIZE, run_loyalty_batch
+
+async def main(args):
+    try:
+        return await run_loyalty_batch(args.batch_size)
+    finally:
+        await get_engine().dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Accrue loyalty points for completed appointments and expire old points")
+    parser.add_argument("--batch-size", type=int, default=LOYALTY_BATCH_SIZE,
+                        help="Appointments accrued or accruals expired per statement")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(main(args)), indent=2))
@@ -0,0 +1,26 @@
+import asyncio
+import os
+import sys
+import time
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import get_engine, raw_connection
+from app.rating_stats import REBUILD_STATEMENTS
+
+async def rebuild():
+    started = time.perf_counter()
+    try:
+        async with raw_connection() as conn:
+            # One transaction: readers keep seeing the old aggregates until the new ones commit
+            async with conn.transaction():
+                for statement in REBUILD_STATEMENTS:
+                    await conn.execute(statement)
+                rows = await conn.fetchval("SELECT count(*) FROM rating_aggregates")
+    finally:
+        await get_engine().dispose()
+    print(f"Rebuilt {rows} rating aggregates in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    asyncio.run(rebuild())
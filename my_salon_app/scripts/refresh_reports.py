@@ -0,0 +1,25 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import get_engine
+from app.reporting import refresh_reports
+
+async def main(args):
+    try:
+        return await refresh_reports(concurrently=not args.blocking)
+    finally:
+        await get_engine().dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the revenue, cancellation and utilization reporting views")
+    parser.add_argument("--blocking", action="store_true",
+                        help="Refresh without CONCURRENTLY: faster, but readers wait until it finishes")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(main(args)), indent=2))
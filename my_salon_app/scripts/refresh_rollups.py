@@ -0,0 +1,35 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.database import get_engine, get_session_factory
+from app.rollups import RESET_STATEMENTS, ROLLUP_REFRESH_BATCH_DAYS, refresh_rollups
+
+async def main(args):
+    try:
+        if args.rebuild:
+            async with get_session_factory()() as session:
+                for statement in RESET_STATEMENTS:
+                    await session.execute(text(statement))
+                await session.commit()
+        return await refresh_rollups(args.batch_days, args.max_batches)
+    finally:
+        await get_engine().dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the trend rollups of days changed since the last refresh")
+    parser.add_argument("--batch-days", type=int, default=ROLLUP_REFRESH_BATCH_DAYS,
+                        help="Days recomputed per transaction")
+    parser.add_argument("--max-batches", type=int, help="Stop after this many batches (default: the whole queue)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Drop the rollups and recompute every day with appointments")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(main(args)), indent=2))
@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import get_engine
+from app.sentiment import score_texts
+from app.sentiment_pipeline import (
+    SENTIMENT_BATCH_SIZE,
+    configure_pool,
+    score_comments,
+    score_feedback,
+    shutdown_pool,
+)
+
+SAMPLE_COMMENTS = [
+    "Terrible experience, very rude staff.",
+    "Waited an hour and the service was awful.",
+    "Not great, the room was cold.",
+    "Disappointing, expected much better.",
+    "It was okay.",
+    "Average service, nothing special.",
+    "Good service, will come back.",
+    "Very relaxing, friendly staff.",
+    "Excellent service, highly recommend!",
+    "The massage was lovely but the front desk was not very welcoming and we waited far too long.",
+]
+
+async def benchmark(rows: int, batch_size: int, workers: int):
+    """Scoring throughput without the database: in-process versus the process pool."""
+    rng = random.Random(42)
+    comments = [rng.choice(SAMPLE_COMMENTS) for _ in range(rows)]
+    batches = [comments[start:start + batch_size] for start in range(0, rows, batch_size)]
+
+    started = time.perf_counter()
+    for batch in batches:
+        score_texts(batch)
+    in_process = time.perf_counter() - started
+
+    # Start the workers before timing; the API pays this once at the first run
+    await score_comments(comments[:workers])
+    started = time.perf_counter()
+    for batch in batches:
+        await score_comments(batch)
+    pooled = time.perf_counter() - started
+    shutdown_pool()
+
+    return {
+        "rows": rows,
+        "batch_size": batch_size,
+        "workers": workers,
+        "in_process_rows_per_second": round(rows / in_process),
+        "pool_rows_per_second": round(rows / pooled),
+    }
+
+async def main(args):
+    # Unlike the API process, the script has the host to itself
+    configure_pool(args.workers)
+    if args.benchmark:
+        return await benchmark(args.benchmark, args.batch_size, args.workers)
+    try:
+        return await score_feedback(args.batch_size, args.max_batches)
+    finally:
+        shutdown_pool()
+        await get_engine().dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score feedback comments that have no sentiment score yet")
+    parser.add_argument("--batch-size", type=int, default=SENTIMENT_BATCH_SIZE, help="Rows scored and written per batch")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Scoring processes (default: one per CPU)")
+    parser.add_argument("--max-batches", type=int, help="Stop after this many batches (default: backfill everything)")
+    parser.add_argument("--benchmark", type=int, metavar="ROWS",
+                        help="Measure scoring throughput on ROWS sample comments instead of touching the database")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(main(args)), indent=2))
@@ -4,6 +4,7 @@ from sqlalchemy import text, select
 from app.database import AsyncSessionLocal
 from app.models import Customer, Staff, Service, Appointment, Feedback, Promotion, KnowledgeBase
 from app.models import CustomerType, AppointmentStatus
+from app.pricing import snapshot_price
 
 async def seed_data():
     async with AsyncSessionLocal() as session:
@@ -132,6 +133,9 @@ async def seed_data():
                     notes="Regular client"
                 )
             ]
+            # Price each booking as the API does
+            for appointment in appointments:
+                await snapshot_price(session, appointment, services[appointment.service_id - 1])
             session.add_all(appointments)
             await session.commit()
             
@@ -0,0 +1,38 @@
+import json
+import subprocess
+import sys
+
+import benchmark
+
+def test_every_benchmark_runs():
+    for name, bench in benchmark.collect_benchmarks().items():
+        bench()
+
+def test_baseline_covers_every_benchmark():
+    with open(benchmark.BASELINE_PATH) as f:
+        baseline = json.load(f)
+    assert set(baseline) == set(benchmark.collect_benchmarks())
+
+def test_compare_reports_regressions_over_the_threshold():
+    baseline = {"a": 100.0, "b": 100.0, "c": 100.0}
+    results = {"a": 114.0, "b": 130.0, "new": 1.0}
+    regressions = benchmark.compare(results, baseline, threshold=0.15)
+    assert len(regressions) == 1 and regressions[0].startswith("b: ")
+
+def run_benchmark(name_filter, *args):
+    command = [sys.executable, benchmark.__file__, "--filter", name_filter, "--repeat", "1", "--min-time", "0", *args]
+    return subprocess.run(command, capture_output=True, text=True)
+
+def test_missing_baseline_fails(tmp_path):
+    # The query benchmarks use sqlalchemy.func, which the runner must not shadow
+    result = run_benchmark("query_", "--baseline", str(tmp_path / "baseline.json"))
+    assert result.returncode == 1, result.stderr
+    assert "query_compile/read_customers" in result.stdout
+    assert "No baseline" in result.stdout
+
+def test_filtered_save_keeps_other_baselines(tmp_path):
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"other": 1.0}))
+    assert run_benchmark("segments/match/10", "--baseline", str(path), "--save-baseline").returncode == 0
+    baseline = json.loads(path.read_text())
+    assert set(baseline) == {"other", "segments/match/10", "segments/match/100", "segments/match/1000"}
@@ -0,0 +1,64 @@
+import csv
+import gzip
+import threading
+
+from app.bulk_import import import_records
+from tests.conftest import run
+
+CUSTOMERS_CSV = "name,phone,email\nAda Lovelace,+15550000001,ada@example.com\nNo Phone,,\n"
+
+def test_import_endpoint(client):
+    files = {"file": ("customers.csv", CUSTOMERS_CSV.encode(), "text/csv")}
+    response = client.post("/api/admin/imports/customers", files=files)
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert report["rows"] == 2 and report["inserted"] == 1 and report["error_count"] == 1
+    assert client.get("/api/customers").json()["total"] == 1
+
+def test_import_endpoint_decompresses_gzip(client):
+    files = {"file": ("customers.csv.gz", gzip.compress(CUSTOMERS_CSV.encode()), "application/gzip")}
+    response = client.post("/api/admin/imports/customers", files=files, params={"dry_run": True})
+    assert response.status_code == 200, response.text
+    assert response.json()["inserted"] == 1
+    assert client.get("/api/customers").json()["total"] == 0
+
+def test_uploads_are_read_off_the_event_loop(db):
+    class Upload:
+        def __init__(self, text):
+            self.lines = iter(text.splitlines(keepends=True))
+            self.threads = set()
+
+        def __iter__(self):
+            return self
+
+        def __next__(self):
+            self.threads.add(threading.current_thread())
+            return next(self.lines)
+
+    upload = Upload(CUSTOMERS_CSV)
+    run(import_records("customers", upload, "csv", dry_run=True))
+    assert upload.threads and threading.main_thread() not in upload.threads
+
+def test_unknown_import_entity_is_rejected(client):
+    files = {"file": ("bookings.csv", b"id\n1\n", "text/csv")}
+    assert client.post("/api/admin/imports/bookings", files=files).status_code == 400
+
+def test_conflicting_rows_are_updated_or_skipped(db):
+    run(import_records("customers", CUSTOMERS_CSV.splitlines(keepends=True), "csv"))
+    renamed = CUSTOMERS_CSV.replace("Ada Lovelace", "Ada King")
+    skipped = run(import_records("customers", renamed.splitlines(keepends=True), "csv", on_conflict="skip"))
+    assert skipped["inserted"] == 0 and skipped["updated"] == 0
+    updated = run(import_records("customers", renamed.splitlines(keepends=True), "csv"))
+    assert updated["inserted"] == 0 and updated["updated"] == 1
+
+def test_row_errors_are_reported_with_their_row_number(db):
+    report = run(import_records("customers", CUSTOMERS_CSV.splitlines(keepends=True), "csv", dry_run=True))
+    assert [error["row"] for error in report["errors"]] == [2]
+
+def test_benchmark(db):
+    from bulk_import import benchmark, sample_customers
+
+    assert len(list(csv.DictReader(sample_customers(10)))) == 10
+    report = run(benchmark(50, None))
+    assert report["inserted"] == 50 and report["error_count"] == 0
+    assert run(benchmark(50, 10 ** 9))["error_count"] == 1
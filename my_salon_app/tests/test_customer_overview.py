@@ -0,0 +1,61 @@
+import time
+
+from app.customer_overview import ALL_CUSTOMERS, OverviewCache
+
+def test_cache_evicts_least_recently_used():
+    cache = OverviewCache(ttl=60, size=2)
+    cache.set(1, 5, {"id": 1})
+    cache.set(2, 5, {"id": 2})
+    assert cache.get(1, 5) == {"id": 1}
+    cache.set(3, 5, {"id": 3})
+    assert cache.get(2, 5) is None
+    assert cache.get(1, 5) == {"id": 1} and cache.get(3, 5) == {"id": 3}
+
+def test_cache_expires_and_invalidates():
+    cache = OverviewCache(ttl=60)
+    cache.set(1, 5, {})
+    cache.set(1, 10, {})
+    cache.set(2, 5, {})
+    cache.invalidate([1])
+    assert cache.get(1, 5) is None and cache.get(1, 10) is None and cache.get(2, 5) == {}
+    cache.invalidate([ALL_CUSTOMERS])
+    assert cache.get(2, 5) is None
+
+    cache.ttl = 0.001
+    cache.set(3, 5, {})
+    time.sleep(0.01)
+    assert cache.get(3, 5) is None
+    # A TTL of 0 disables the cache
+    cache.ttl = 0
+    cache.set(4, 5, {})
+    assert cache.get(4, 5) is None
+
+def test_overview(create, client):
+    customer = create.customer()
+    service = create.service(price=80.0)
+    visit = create.appointment(customer, service, status="completed", days=-2)
+    create.feedback(visit, rating=4)
+    upcoming = create.appointment(customer, service)
+
+    response = client.get(f"/api/customers/{customer['id']}/overview")
+    assert response.status_code == 200, response.text
+    overview = response.json()
+    assert overview["customer"]["id"] == customer["id"]
+    assert overview["lifetime_visits"] == 1 and overview["total_spend"] == 80.0
+    assert overview["average_rating"] == 4.0 and overview["feedback_count"] == 1
+    assert [item["id"] for item in overview["upcoming_appointments"]] == [upcoming["id"]]
+    assert [(item["id"], item["rating"]) for item in overview["recent_appointments"]] == [(visit["id"], 4)]
+
+    # A committed write drops the cached overview
+    create.appointment(customer, service, status="completed", days=-1)
+    assert client.get(f"/api/customers/{customer['id']}/overview").json()["lifetime_visits"] == 2
+
+def test_overview_limit_and_missing_customer(create, client):
+    customer = create.customer()
+    service = create.service()
+    for days in (1, 2, 3):
+        create.appointment(customer, service, days=days)
+    overview = client.get(f"/api/customers/{customer['id']}/overview", params={"limit": 2}).json()
+    assert len(overview["upcoming_appointments"]) == 2
+    assert client.get("/api/customers/999/overview").status_code == 404
+    assert client.get(f"/api/customers/{customer['id']}/overview", params={"limit": 0}).status_code == 422
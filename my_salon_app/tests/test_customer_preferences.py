@@ -0,0 +1,49 @@
+import asyncio
+from datetime import date
+
+import explain_queries
+from app.database import get_engine
+from app.routers.customers import preference_documents
+
+SAMPLE_PARAMETERS = {
+    "customer_id": 1, "staff_id": 1, "service_id": 1, "date_from": date(2025, 1, 1), "date_to": date(2025, 1, 8),
+    "appointment_id": 1, "phone": "", "name_fragment": "a", "kb_category": "general", "category_id": 1,
+}
+
+def test_preference_documents():
+    assert preference_documents("preferred_day", "Saturday") == [
+        {"preferred_day": "Saturday"},
+        {"preferred_day": ["Saturday"]},
+    ]
+    assert {"contact": {"sms": True}} in preference_documents("contact.sms", "true")
+    assert {"floor": [2]} in preference_documents("floor", "2")
+
+def test_filter_on_preferences(create, client):
+    saturday = create.customer(preferences={"preferred_day": "Saturday", "contact": {"channel": "sms"}})
+    weekend = create.customer(preferences={"preferred_day": ["Saturday", "Sunday"]})
+    monday = create.customer(preferences={"preferred_day": "Monday"})
+    create.customer()
+
+    def ids(params):
+        response = client.get("/api/customers", params=params)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert body["total"] == len(body["items"])
+        return {customer["id"] for customer in body["items"]}
+
+    assert ids({"pref.preferred_day": "Saturday"}) == {saturday["id"], weekend["id"]}
+    assert ids({"pref.preferred_day": "Sunday"}) == {weekend["id"]}
+    assert ids({"pref.contact.channel": "sms"}) == {saturday["id"]}
+    assert ids([("pref.preferred_day", "Sunday"), ("pref.preferred_day", "Monday")]) == {weekend["id"], monday["id"]}
+
+def test_explain_binds_jsonb_parameters(db):
+    # Every router query, including the JSONB preference filters, is explained with bound parameters
+    async def explain():
+        try:
+            return await explain_queries.explain_all(seq_scan_rows=10000)
+        finally:
+            await get_engine().dispose()
+
+    results = asyncio.run(explain())
+    assert set(results) == set(explain_queries.router_queries(SAMPLE_PARAMETERS))
+    assert results["read_customers?pref"]["params"][0] == '{"preferred_day": "Saturday"}'
@@ -0,0 +1,52 @@
+from app.dedupe import DisjointSet, find_duplicates, normalize_name, normalize_phone, score_pair
+from app.segments import members, segment_index
+from tests.conftest import run
+
+def test_normalization():
+    assert normalize_phone("+1 (555) 000-1234") == normalize_phone("5550001234") == "5550001234"
+    assert normalize_phone("123") is None
+    assert normalize_name("Smith, John") == normalize_name("john smith")
+
+def test_score_pair():
+    score, reasons = score_pair(("Jon Smith", "555-000-1234", None), ("John Smith", "+15550001234", "j@example.com"))
+    assert reasons[0] == "phone" and reasons[1].startswith("name")
+    assert 0.6 < score < 1.0
+    assert score_pair(("Ann Lee", None, None), ("Bob Ray", None, None)) == (0.0, [])
+
+def test_lowest_id_survives():
+    clusters = DisjointSet()
+    clusters.union(5, 3)
+    clusters.union(9, 5)
+    assert clusters.find(9) == 3
+
+def test_find_duplicates(create):
+    original = create.customer(name="John Smith", phone="+1 (555) 000-1234")
+    duplicate = create.customer(name="Jon Smith", phone="5550001234")
+    create.customer(name="Ann Lee")
+    report = run(find_duplicates(threshold=0.6))
+    assert report["customers"] == 3
+    assert [(c["survivor_id"], c["duplicate_ids"]) for c in report["clusters"]] == [(original["id"], [duplicate["id"]])]
+
+def test_merge_endpoint(create, client):
+    survivor = create.customer()
+    duplicate = create.customer(email="dup@example.com")
+    category = create.category()
+    service = create.service(category_id=category["id"])
+    appointment = create.appointment(duplicate, service, status="completed", days=-1)
+    run(segment_index.rebuild())
+
+    response = client.post(f"/api/customers/{survivor['id']}/merge", json={"duplicate_ids": [duplicate["id"]]})
+    assert response.status_code == 200, response.text
+    assert response.json()["email"] == "dup@example.com"
+    assert client.get(f"/api/customers/{duplicate['id']}").status_code == 404
+    assert client.get(f"/api/appointments/{appointment['id']}").json()["customer_id"] == survivor["id"]
+    # The bulk delete and re-pointed visits reach the segment bitmaps
+    assert members(segment_index.bitmap(None)) == [survivor["id"]]
+    assert members(segment_index.bitmap(f"category:{category['id']}")) == [survivor["id"]]
+
+def test_merge_rejects_self_and_unknown_customers(create, client):
+    customer = create.customer()
+    path = f"/api/customers/{customer['id']}/merge"
+    assert client.post(path, json={"duplicate_ids": [customer["id"]]}).status_code == 400
+    assert client.post(path, json={"duplicate_ids": [999]}).status_code == 404
+    assert client.post(path, json={"duplicate_ids": []}).status_code == 422
@@ -0,0 +1,41 @@
+import json
+
+from explain_queries import BASELINE_PATH, cost_regressions, find_problems, router_queries
+from tests.test_customer_preferences import SAMPLE_PARAMETERS
+
+def plan(*nodes):
+    root = dict(nodes[0], Plans=list(nodes[1:]))
+    return {"Plan": root}
+
+def test_large_sequential_scans_are_flagged():
+    scan = {"Node Type": "Seq Scan", "Relation Name": "appointments", "Actual Rows": 10, "Rows Removed by Filter": 20000}
+    assert find_problems(plan({"Node Type": "Limit"}, scan), seq_scan_rows=10000) == [
+        "Seq Scan on appointments read 20010 rows"
+    ]
+    assert find_problems(plan(scan), seq_scan_rows=50000) == []
+
+def test_expected_scans_are_not_flagged():
+    scan = {"Node Type": "Seq Scan", "Relation Name": "customers", "Actual Rows": 50000}
+    assert find_problems(plan(scan), seq_scan_rows=10000, expected_scan="customers") == []
+    assert find_problems(plan(scan), seq_scan_rows=10000, expected_scan="staff") != []
+
+def test_looped_scans_count_every_loop():
+    scan = {"Node Type": "Seq Scan", "Relation Name": "staff", "Actual Rows": 100, "Actual Loops": 200}
+    assert find_problems(plan(scan), seq_scan_rows=10000) == ["Seq Scan on staff read 20000 rows"]
+
+def test_spills_are_flagged():
+    sort = {"Node Type": "Sort", "Sort Space Type": "Disk", "Sort Space Used": 2048, "Sort Method": "external merge"}
+    hash_node = {"Node Type": "Hash", "Hash Batches": 4}
+    in_memory = {"Node Type": "Sort", "Sort Space Type": "Memory"}
+    problems = find_problems(plan({"Node Type": "Hash Join"}, sort, hash_node, in_memory), seq_scan_rows=10000)
+    assert problems == ["Sort spilled 2048 kB to disk (external merge)", "Hash spilled to disk in 4 batches"]
+
+def test_cost_regressions():
+    baseline = {"a": {"total_cost": 100.0}, "b": {"total_cost": 100.0}}
+    results = {"a": {"total_cost": 119.0}, "b": {"total_cost": 121.0}, "new": {"total_cost": 1e6}}
+    assert cost_regressions(results, baseline, threshold=0.2) == ["b: cost 100 -> 121"]
+
+def test_baseline_covers_every_router_query():
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+    assert set(baseline) == set(router_queries(SAMPLE_PARAMETERS))
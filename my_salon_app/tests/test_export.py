@@ -0,0 +1,51 @@
+import csv
+import gzip
+import io
+import json
+
+def test_ndjson_export(create, client):
+    customers = [create.customer(preferences={"preferred_day": "Saturday"}) for _ in range(3)]
+    response = client.get("/api/customers/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert 'filename="customers.ndjson"' in response.headers["content-disposition"]
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == [customer["id"] for customer in customers]
+    assert rows[0]["preferences"] == {"preferred_day": "Saturday"}
+
+def test_csv_export_with_filters(create, client):
+    service = create.service()
+    other = create.service()
+    customer = create.customer()
+    booked = create.appointment(customer, service)
+    create.appointment(customer, other)
+    response = client.get("/api/appointments/export", params={"format": "csv", "service_id": service["id"]})
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["id"]) for row in rows] == [booked["id"]]
+
+def test_gzip_export(create, client):
+    create.staff(skills=["haircut", "coloring"])
+    response = client.get("/api/staff/export", params={"format": "csv", "gzip": True})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    assert 'filename="staff.csv.gz"' in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.content).decode())))
+    assert json.loads(rows[0]["skills"]) == ["haircut", "coloring"]
+
+def test_export_spans_several_batches(create, client, monkeypatch):
+    from app import export
+
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+    created = [create.category() for _ in range(5)]
+    response = client.get("/api/service-categories/export")
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [category["id"] for category in created]
+
+def test_every_list_resource_exports(client):
+    for resource in ("customers", "staff", "services", "service-categories", "appointments", "feedback", "promotions", "knowledge-base"):
+        response = client.get(f"/api/{resource}/export", params={"format": "csv"})
+        assert response.status_code == 200, resource
+
+def test_unknown_format_is_rejected(client):
+    response = client.get("/api/customers/export", params={"format": "xml"})
+    assert response.status_code == 400
@@ -0,0 +1,70 @@
+import asyncio
+import random
+
+import httpx
+import pytest
+
+import load_test
+from load_test import LoadTest, Stats, latency_summary, parse_mix, percentile
+
+def test_percentile_is_nearest_rank():
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([7.0], 99) == 7
+    assert percentile([], 50) is None
+
+def test_latency_summary():
+    summary = latency_summary([30.0, 10.0, 20.0])
+    assert summary == {"p50": 20.0, "p95": 30.0, "p99": 30.0, "mean": 20.0, "max": 30.0}
+    assert latency_summary([])["mean"] is None
+
+def test_stats_report():
+    stats = Stats()
+    stats.record("GET /a", 10)
+    stats.record("GET /a", 30, "HTTP 500")
+    stats.record("GET /b", 20)
+    report = stats.report(elapsed=2)
+    assert report["requests"] == 3
+    assert report["throughput_rps"] == 1.5
+    assert report["error_rate"] == round(1 / 3, 4)
+    assert report["errors"] == {"HTTP 500": 1}
+    assert report["endpoints"]["GET /a"]["error_rate"] == 0.5
+    assert report["endpoints"]["GET /b"]["latency_ms"]["max"] == 20
+
+def test_parse_mix():
+    assert parse_mix("booking=1, chatbot=2.5,caller_id") == {"booking": 1, "chatbot": 2.5, "caller_id": 1}
+
+def test_scenarios_run_against_the_app(client):
+    from app.main import app
+
+    async def scenario():
+        stats = Stats()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            test = LoadTest(http, stats, random.Random(1))
+            await test.setup()
+            for name in load_test.DEFAULT_MIX:
+                await getattr(test, name)()
+            created = list(test.created_appointments)
+            await test.cleanup()
+            remaining = (await http.get("/api/appointments")).json()["total"]
+        return stats, created, remaining
+
+    stats, created, remaining = asyncio.run(scenario())
+    report = stats.report(elapsed=1)
+    assert report["requests"] > 0
+    assert report["errors"] == {}, report["endpoints"]
+    assert len(created) == 1
+    assert remaining == 0
+
+def test_unknown_scenario_is_rejected(monkeypatch):
+    async def setup(self):
+        pass
+
+    monkeypatch.setattr(LoadTest, "setup", setup)
+    args = type("Args", (), {"concurrency": 1, "timeout": 1, "base_url": "http://test", "seed": 1, "mix": "checkout=1"})
+    with pytest.raises(ValueError, match="checkout"):
+        asyncio.run(load_test.run(args))
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from app.database import get_session_factory
+from app.loyalty import adjust_points, run_loyalty_batch
+from app.models import LoyaltyTransactionType
+from tests.conftest import run
+
+async def execute(statement: str, **params):
+    async with get_session_factory()() as session:
+        await session.execute(text(statement), params)
+        await session.commit()
+
+def ledger(client, customer: dict) -> dict:
+    response = client.get(f"/api/customers/{customer['id']}/loyalty")
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_opening_balance_is_recorded(create, client):
+    customer = create.customer(loyalty_points=40)
+    assert ledger(client, customer)["balance"] == 40
+    assert [(item["type"], item["points"]) for item in ledger(client, customer)["items"]] == [("adjustment", 40)]
+
+def test_completed_appointments_accrue_once(create, client):
+    customer = create.customer()
+    service = create.service(price=120.0)
+    appointment = create.appointment(customer, service, status="completed", days=-1)
+    client.put(f"/api/appointments/{appointment['id']}/status", params={"status": "completed"})
+    accruals = [item for item in ledger(client, customer)["items"] if item["type"] == "accrual"]
+    assert [(item["appointment_id"], item["points"]) for item in accruals] == [(appointment["id"], 120)]
+    assert accruals[0]["expires_at"] is not None
+    assert ledger(client, customer)["balance"] == 120
+    # The batch finds nothing left to accrue
+    assert run(run_loyalty_batch())["accrued"] == 0
+
+def test_batch_accrues_completions_made_outside_the_api(create, client):
+    customer = create.customer()
+    service = create.service(price=50.0)
+    appointments = [create.appointment(customer, service, days=-day) for day in (1, 2, 3)]
+    run(execute("UPDATE appointments SET status = 'COMPLETED'"))
+
+    report = run(run_loyalty_batch(batch_size=2))
+    assert report["accrued"] == 3 and report["points_accrued"] == 150 and report["batches"] >= 2
+    assert ledger(client, customer)["balance"] == 150
+    assert run(run_loyalty_batch())["accrued"] == 0
+    assert {item["appointment_id"] for item in ledger(client, customer)["items"]} == {a["id"] for a in appointments}
+
+def test_expiry_never_debits_below_zero(create, client):
+    customer = create.customer()
+    service = create.service(price=100.0)
+    create.appointment(customer, service, status="completed", days=-1)
+    redeemed = client.post(f"/api/customers/{customer['id']}/loyalty", json={"points": -70, "type": "redemption"})
+    assert redeemed.json()["balance"] == 30
+    run(execute("UPDATE loyalty_transactions SET expires_at = now() - interval '1 day' WHERE type = 'ACCRUAL'"))
+
+    report = run(run_loyalty_batch())
+    assert report["expired"] == 1 and report["points_expired"] == 30
+    assert ledger(client, customer)["balance"] == 0
+    assert ledger(client, customer)["items"][0]["points"] == -30
+    assert run(run_loyalty_batch())["expired"] == 0
+
+def test_redemptions_cannot_overdraw(create, client):
+    customer = create.customer(loyalty_points=50)
+    path = f"/api/customers/{customer['id']}/loyalty"
+    assert client.post(path, json={"points": -60, "type": "redemption"}).status_code == 400
+    assert client.post(path, json={"points": 10, "type": "redemption"}).status_code == 400
+    assert client.post(path, json={"points": 10, "type": "expiry"}).status_code == 400
+    assert client.post("/api/customers/999/loyalty", json={"points": 10}).status_code == 404
+    assert client.post(path, json={"points": -50, "type": "redemption"}).json()["balance"] == 0
+
+def test_concurrent_redemptions(create, client):
+    customer = create.customer(loyalty_points=100)
+
+    async def redeem():
+        async with get_session_factory()() as session:
+            try:
+                await adjust_points(session, customer["id"], -30, LoyaltyTransactionType.REDEMPTION)
+            except ValueError:
+                return False
+            await session.commit()
+            return True
+
+    async def redeem_all():
+        return await asyncio.gather(*(redeem() for _ in range(6)))
+
+    assert sum(run(redeem_all())) == 3
+    assert ledger(client, customer)["balance"] == 10
+
+def test_adjust_points_of_missing_customer(db):
+    async def adjust():
+        async with get_session_factory()() as session:
+            return await adjust_points(session, 999, 10)
+
+    assert run(adjust()) is None
+
+@pytest.mark.parametrize("points", [0, 1])
+def test_set_balance_through_customer_update(create, client, points):
+    customer = create.customer(loyalty_points=5)
+    response = client.put(f"/api/customers/{customer['id']}", json={"loyalty_points": points})
+    assert response.status_code == 200, response.text
+    items = ledger(client, customer)["items"]
+    assert ledger(client, customer)["balance"] == points
+    assert items[0]["points"] == points - 5
@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import main
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def assert_mounted_once(app: FastAPI):
+    routes = [(route.path, frozenset(getattr(route, "methods", None) or ())) for route in app.routes]
+    assert len(routes) == len(set(routes))
+
+def test_import_does_not_load_routers_or_subsystems():
+    code = (
+        "import sys, app.main\n"
+        "lazy = ('app.routers', 'app.schemas', 'app.loyalty', 'app.promotion_index', 'app.reporting',\n"
+        "        'app.rollups', 'app.segments', 'app.sentiment_pipeline', 'app.warmup', 'multiprocessing')\n"
+        "print(sorted(name for name in sys.modules if name.startswith(lazy)))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+def test_include_routers_is_idempotent():
+    app = FastAPI()
+    main.include_routers(app, ["staff"])
+    routes = len(app.routes)
+    main.include_routers(app, ["staff", "services"])
+    paths = [route.path for route in app.routes]
+    assert "/api/staff" in paths and "/api/services" in paths
+    assert len(app.routes) > routes
+    assert_mounted_once(app)
+    assert app.state.routers == {"staff", "services"}
+
+def test_unknown_router_is_rejected():
+    with pytest.raises(ValueError, match="bookings"):
+        main.include_routers(FastAPI(), ["bookings"])
+
+def test_enabled_routers(monkeypatch):
+    monkeypatch.delenv("ENABLED_ROUTERS", raising=False)
+    assert main.enabled_routers() == list(main.ROUTERS)
+    monkeypatch.setenv("ENABLED_ROUTERS", " appointments, customers ,")
+    assert main.enabled_routers() == ["appointments", "customers"]
+
+def test_background_tasks():
+    names = [task.name for task in main.background_tasks()]
+    assert names == ["loyalty-batch", "sentiment-scoring", "rollup-refresh", "report-refresh", "segment-rebuild"]
+
+def test_routers_are_mounted_on_startup(db):
+    with TestClient(main.app) as client:
+        assert client.get("/api/services").status_code == 200
+        assert "/api/customers" in client.get("/openapi.json").json()["paths"]
+        assert "routers" in main.app.state.startup_report
+    # Restarting the app mounts nothing twice
+    with TestClient(main.app):
+        assert_mounted_once(main.app)
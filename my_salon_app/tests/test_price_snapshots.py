@@ -0,0 +1,60 @@
+from sqlalchemy import text
+
+import benchmark
+from app import database
+from app.pricing import backfill_price_snapshots
+from tests.conftest import run
+
+def test_booking_snapshots_price_duration_and_discount(create):
+    service = create.service(price=80.0, duration_minutes=45)
+    create.promotion(discount_percent=15.0, service_id=service["id"])
+    appointment = create.appointment(create.customer(), service)
+    assert appointment["price_at_booking"] == 80.0
+    assert appointment["duration_at_booking"] == 45
+    assert appointment["discount_percent"] == 15.0
+
+def test_price_edits_keep_booked_prices(create, client):
+    service = create.service(price=80.0)
+    appointment = create.appointment(create.customer(), service)
+    response = client.put(f"/api/services/{service['id']}", json={"price": 120.0, "duration_minutes": 90})
+    assert response.status_code == 200, response.text
+
+    booked = client.get(f"/api/appointments/{appointment['id']}").json()
+    assert booked["price_at_booking"] == 80.0
+    assert booked["duration_at_booking"] == 60
+
+def test_moving_to_another_service_reprices(create, client):
+    appointment = create.appointment(create.customer(), create.service(price=80.0))
+    other = create.service(price=30.0, duration_minutes=20)
+    response = client.put(f"/api/appointments/{appointment['id']}", json={"service_id": other["id"]})
+    assert response.status_code == 200, response.text
+    assert response.json()["price_at_booking"] == 30.0
+    assert response.json()["duration_at_booking"] == 20
+
+def test_backfill_fills_missing_snapshots(create):
+    service = create.service(price=70.0, duration_minutes=30)
+    appointment = create.appointment(create.customer(), service)
+
+    async def clear_snapshot():
+        async with database.get_engine().begin() as conn:
+            await conn.execute(text("UPDATE appointments SET price_at_booking = NULL, duration_at_booking = NULL"))
+
+    async def snapshot():
+        async with database.get_engine().connect() as conn:
+            result = await conn.execute(
+                text("SELECT price_at_booking, duration_at_booking FROM appointments WHERE id = :id"),
+                {"id": appointment["id"]},
+            )
+            return tuple(result.one())
+
+    run(clear_snapshot())
+    report = run(backfill_price_snapshots(batch_size=10))
+    assert report["filled"] == 1
+    assert run(snapshot()) == (70.0, 30)
+
+def test_benchmark_appointments_serialize():
+    # Unflushed ORM objects get no column defaults, so the fixture sets the snapshot itself
+    appointment = benchmark.make_appointment(5, detailed=True)
+    assert appointment.discount_percent == 10.0
+    assert appointment.price_at_booking is not None and appointment.duration_at_booking is not None
+    benchmark.AppointmentDetailResponse.model_validate(appointment)
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+from app.database import get_session_factory
+from app.pricing import effective_prices, price_cache
+from app.promotion_index import promotion_index
+from tests.conftest import run
+
+def service(id: int, price: float = 80.0):
+    return SimpleNamespace(id=id, name=f"Service {id}", price=price)
+
+def promotion(id: int, discount_percent: float, service_id: int = None, **caps):
+    fields = {"max_redemptions": None, "max_redemptions_per_customer": None, "segment": None, **caps}
+    return SimpleNamespace(id=id, discount_percent=discount_percent, service_id=service_id, **fields)
+
+def test_best_discount_per_service():
+    prices = effective_prices(
+        [service(1), service(2), service(3, price=19.99)],
+        [promotion(1, 10), promotion(2, 25, service_id=1), promotion(3, 5, service_id=2)],
+    )
+    assert [(p["promotion_id"], p["discount_percent"], p["final_price"]) for p in prices.values()] == [
+        (2, 25, 60.0),
+        (1, 10, 72.0),
+        (1, 10, 17.99),
+    ]
+
+def test_service_promotion_wins_a_tie():
+    prices = effective_prices([service(1)], [promotion(1, 10), promotion(2, 10, service_id=1)])
+    assert prices[1]["promotion_id"] == 2
+
+def test_redeemed_only_promotions_are_ignored():
+    promotions = [
+        promotion(1, 50, max_redemptions=10),
+        promotion(2, 40, max_redemptions_per_customer=1),
+        promotion(3, 30, segment="vip"),
+    ]
+    assert effective_prices([service(1)], promotions)[1] == {
+        "service_id": 1, "name": "Service 1", "price": 80.0, "discount_percent": 0, "promotion_id": None, "final_price": 80.0,
+    }
+
+def test_pricing_endpoint(create, client):
+    cut = create.service(price=50.0)
+    color = create.service(price=120.0)
+    create.promotion(discount_percent=20.0, service_id=color["id"])
+
+    response = client.get("/api/services/pricing")
+    assert response.status_code == 200, response.text
+    assert [(item["service_id"], item["final_price"]) for item in response.json()["items"]] == [
+        (cut["id"], 50.0),
+        (color["id"], 96.0),
+    ]
+    selected = client.get("/api/services/pricing", params={"service_ids": [color["id"], color["id"]]}).json()
+    assert selected["total"] == 1
+    assert client.get("/api/services/pricing", params={"service_ids": [999]}).status_code == 404
+
+def test_pricing_follows_writes(create, client):
+    cut = create.service(price=50.0)
+    assert client.get("/api/services/pricing").json()["items"][0]["final_price"] == 50.0
+    client.put(f"/api/services/{cut['id']}", json={"price": 60.0})
+    assert client.get("/api/services/pricing").json()["items"][0]["final_price"] == 60.0
+    create.promotion(discount_percent=50.0)
+    assert client.get("/api/services/pricing").json()["items"][0]["final_price"] == 30.0
+
+def test_prices_are_kept_per_catalog_and_promotion_version(create, client):
+    create.service()
+
+    async def prices():
+        async with get_session_factory()() as session:
+            return await price_cache.prices(session)
+
+    # Not kept while the promotion index cannot be trusted
+    assert run(prices()) is not run(prices())
+    run(promotion_index.refresh())
+    first = run(prices())
+    assert run(prices()) is first
+    promotion_index.invalidate()
+    assert run(prices()) is not first
@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.promotion_index import ActivePromotionIndex, automatic, promotion_index
+from app.schemas import PromotionCreate
+from tests.conftest import run
+
+def at(**delta) -> str:
+    return (datetime.now(timezone.utc) + timedelta(**delta)).isoformat()
+
+def test_automatic_promotions_are_uncapped_and_untargeted():
+    fields = {"title": "Spring", "discount_percent": 10, "start_date": at()}
+    assert automatic(PromotionCreate(**fields))
+    assert not automatic(PromotionCreate(**fields, max_redemptions=5))
+    assert not automatic(PromotionCreate(**fields, max_redemptions_per_customer=1))
+    assert not automatic(PromotionCreate(**fields, segment="vip"))
+
+def test_unloaded_index_is_not_trusted():
+    index = ActivePromotionIndex(max_age=60)
+    assert index.active() is None and index.version is None
+
+def test_refresh_loads_running_promotions(create):
+    service = create.service()
+    other = create.service()
+    running = create.promotion()
+    for_service = create.promotion(service_id=service["id"], end_date=at(hours=1))
+    upcoming = create.promotion(start_date=at(minutes=30))
+    create.promotion(start_date=at(days=-3), end_date=at(days=-1))
+    create.promotion(is_active=False)
+
+    index = ActivePromotionIndex(max_age=60)
+    run(index.refresh())
+    assert [promotion.id for promotion in index.active()] == [running["id"], for_service["id"]]
+    assert [promotion.id for promotion in index.active(service["id"])] == [running["id"], for_service["id"]]
+    assert [promotion.id for promotion in index.active(other["id"])] == [running["id"]]
+    # The set is reloaded when the upcoming promotion starts
+    assert index.next_boundary.isoformat() == datetime.fromisoformat(upcoming["start_date"]).isoformat()
+    assert index.version == index.loaded_at
+
+    # Past a boundary, or after a write, callers read the database
+    index.next_boundary = datetime.now(timezone.utc)
+    assert index.active() is None
+    run(index.refresh())
+    index.invalidate()
+    assert index.active() is None
+
+def test_refresh_racing_a_write_is_not_trusted(db):
+    index = ActivePromotionIndex(max_age=60)
+
+    async def refresh_during_write():
+        refresh = asyncio.create_task(index.refresh())
+        # Let the reload start its query before the write commits
+        await asyncio.sleep(0)
+        index.invalidate()
+        await refresh
+
+    run(refresh_during_write())
+    assert index.loaded_at is None
+
+def test_active_endpoint_serves_memory_and_database_alike(create, client):
+    service = create.service()
+    create.promotion(service_id=service["id"])
+    create.promotion(start_date=at(days=1))
+    from_database = client.get("/api/promotions/active/now", params={"service_id": service["id"]}).json()
+    assert from_database["total"] == 1
+
+    run(promotion_index.refresh())
+    assert promotion_index.active() is not None
+    assert client.get("/api/promotions/active/now", params={"service_id": service["id"]}).json() == from_database
+    # A write through the API drops the set until it is reloaded
+    create.promotion()
+    assert promotion_index.active() is None
+    assert client.get("/api/promotions/active/now").json()["total"] == 2
@@ -0,0 +1,39 @@
+from datetime import date, timedelta
+
+EMPTY_HISTOGRAM = {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}
+
+def test_stats_routes_are_not_taken_for_feedback_ids(client):
+    response = client.get("/api/feedback/stats")
+    assert response.status_code == 200, response.text
+    assert response.json() == {"count": 0, "average_rating": None, "histogram": EMPTY_HISTOGRAM}
+    assert client.get("/api/feedback/stats/average").json() == {"average_rating": 0.0}
+    assert client.get("/api/feedback/stats/daily").json() == {"items": []}
+    assert client.get("/api/feedback/999").status_code == 404
+
+def test_aggregates_follow_feedback_writes(create, client):
+    customer = create.customer()
+    staff = create.staff()
+    service = create.service()
+    first = create.appointment(customer, service, status="completed", days=-1, staff_id=staff["id"])
+    second = create.appointment(customer, service, status="completed", days=-2)
+    kept = create.feedback(first, rating=5)
+    removed = create.feedback(second, rating=2)
+
+    summary = client.get("/api/feedback/stats").json()
+    assert summary["count"] == 2 and summary["average_rating"] == 3.5
+    assert summary["histogram"] == {**EMPTY_HISTOGRAM, "2": 1, "5": 1}
+    assert client.get(f"/api/feedback/stats/staff/{staff['id']}").json()["count"] == 1
+    assert client.get(f"/api/feedback/stats/services/{service['id']}").json()["count"] == 2
+
+    assert client.put(f"/api/feedback/{kept['id']}", json={"rating": 4}).status_code == 200
+    assert client.delete(f"/api/feedback/{removed['id']}").status_code == 200
+    summary = client.get("/api/feedback/stats").json()
+    assert summary == {"count": 1, "average_rating": 4.0, "histogram": {**EMPTY_HISTOGRAM, "4": 1}}
+    assert client.get("/api/feedback/stats/average").json() == {"average_rating": 4.0}
+
+    today = client.get("/api/feedback/stats/daily").json()["items"]
+    assert [(item["date"], item["count"]) for item in today] == [(date.today().isoformat(), 1)]
+
+def test_daily_stats_reject_inverted_ranges(client):
+    params = {"date_from": date.today().isoformat(), "date_to": (date.today() - timedelta(days=1)).isoformat()}
+    assert client.get("/api/feedback/stats/daily", params=params).status_code == 400
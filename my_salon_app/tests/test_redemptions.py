@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from app import snapshots
+from app.database import get_session_factory
+from app.models import Appointment, AppointmentStatus, Promotion, Service
+from app.pricing import snapshot_price
+from app.redemptions import RedemptionLimitReached, redeem_promotion
+from tests.conftest import run
+
+def book(client, customer: dict, service: dict, promotion: dict):
+    payload = {
+        "customer_id": customer["id"],
+        "service_id": service["id"],
+        "appointment_time": (datetime.now(timezone.utc) + timedelta(days=1)).isoformat(),
+        "promotion_id": promotion["id"],
+    }
+    return client.post("/api/appointments", json=payload)
+
+def redemptions(client, promotion: dict) -> int:
+    return client.get(f"/api/promotions/{promotion['id']}/redemptions").json()["total"]
+
+def test_promotion_cap(create, client):
+    service = create.service()
+    promotion = create.promotion(discount_percent=30.0, max_redemptions=2)
+    # Capped promotions are never applied without being redeemed
+    assert create.appointment(create.customer(), service)["discount_percent"] == 0
+
+    first = book(client, create.customer(), service, promotion)
+    assert first.status_code == 200 and first.json()["discount_percent"] == 30.0
+    assert book(client, create.customer(), service, promotion).status_code == 200
+    rejected = book(client, create.customer(), service, promotion)
+    assert rejected.status_code == 409 and "fully redeemed" in rejected.json()["detail"]
+    assert redemptions(client, promotion) == 2
+
+    # A cancelled booking gives its redemption back
+    client.put(f"/api/appointments/{first.json()['id']}/status", params={"status": "cancelled"})
+    assert redemptions(client, promotion) == 1
+    assert book(client, create.customer(), service, promotion).status_code == 200
+
+def test_per_customer_cap(create, client):
+    service = create.service()
+    customer = create.customer()
+    promotion = create.promotion(max_redemptions_per_customer=1)
+    assert book(client, customer, service, promotion).status_code == 200
+    assert book(client, customer, service, promotion).status_code == 409
+    assert book(client, create.customer(), service, promotion).status_code == 200
+
+def test_promotions_that_do_not_apply(create, client):
+    customer = create.customer()
+    service = create.service()
+    upcoming = create.promotion(start_date=(datetime.now(timezone.utc) + timedelta(days=1)).isoformat())
+    other_service = create.promotion(service_id=create.service()["id"])
+    vip_only = create.promotion(segment="vip")
+    for promotion in (upcoming, other_service, vip_only):
+        assert book(client, customer, service, promotion).status_code == 400
+    assert book(client, customer, service, {"id": 999}).status_code == 404
+    # Nothing was kept from the failed bookings
+    assert client.get("/api/appointments").json()["total"] == 0
+
+def test_merged_customers_share_their_per_customer_count(create, client):
+    service = create.service()
+    survivor = create.customer()
+    duplicate = create.customer()
+    promotion = create.promotion(max_redemptions_per_customer=2)
+    assert book(client, survivor, service, promotion).status_code == 200
+    assert book(client, duplicate, service, promotion).status_code == 200
+    client.post(f"/api/customers/{survivor['id']}/merge", json={"duplicate_ids": [duplicate["id"]]})
+    assert book(client, survivor, service, promotion).status_code == 409
+
+def test_concurrent_bookings_never_exceed_the_cap(create):
+    promotion_id = create.promotion(max_redemptions=3)["id"]
+    service_id = create.service()["id"]
+    customer_ids = [create.customer()["id"] for _ in range(10)]
+
+    async def book_concurrently(customer_id: int) -> bool:
+        async with get_session_factory()() as session:
+            service = await session.get(Service, service_id)
+            appointment = Appointment(
+                customer_id=customer_id,
+                service_id=service.id,
+                appointment_time=datetime.now(timezone.utc) + timedelta(days=1),
+                status=AppointmentStatus.UPCOMING,
+            )
+            await snapshot_price(session, appointment, service)
+            session.add(appointment)
+            try:
+                await redeem_promotion(session, appointment, promotion_id)
+            except RedemptionLimitReached:
+                await session.rollback()
+                return False
+            await session.commit()
+            return True
+
+    async def book_all():
+        booked = await asyncio.gather(*(book_concurrently(customer_id) for customer_id in customer_ids))
+        async with get_session_factory()() as session:
+            count = await session.scalar(select(Promotion.redemption_count).filter(Promotion.id == promotion_id))
+        return booked, count
+
+    booked, count = run(book_all())
+    assert sum(booked) == count == 3
+
+def test_redemptions_advance_the_snapshot_watermark(create, client, tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshots, "SNAPSHOT_SAFETY_LAG_SECONDS", 0)
+
+    def exported_promotions() -> int:
+        summary = run(snapshots.export_snapshots(["promotions"], output_dir=str(tmp_path)))
+        return summary["tables"]["promotions"]["rows"]
+
+    service = create.service()
+    promotion = create.promotion(max_redemptions=5)
+    assert exported_promotions() == 1
+    booked = book(client, create.customer(), service, promotion).json()
+    assert exported_promotions() == 1
+    client.put(f"/api/appointments/{booked['id']}/status", params={"status": "cancelled"})
+    assert exported_promotions() == 1
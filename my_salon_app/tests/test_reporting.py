@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.reporting import refresh_reports
+from tests.conftest import run
+
+def day(days_ago: int) -> str:
+    return (datetime.now(timezone.utc) - timedelta(days=days_ago)).date().isoformat()
+
+@pytest.fixture
+def bookings(create):
+    """Two days of bookings for one category, with one stylist idle."""
+    customer = create.customer()
+    category = create.category(name="Hair")
+    service = create.service(name="Cut", price=60.0, duration_minutes=60, category_id=category["id"])
+    stylist = create.staff(name="Busy")
+    idle = create.staff(name="Idle")
+    create.appointment(customer, service, status="completed", days=-1, staff_id=stylist["id"])
+    create.appointment(customer, service, status="cancelled", days=-1, staff_id=stylist["id"])
+    create.appointment(customer, service, status="completed", days=-2, staff_id=stylist["id"])
+    # The views are only read after a refresh
+    run(refresh_reports(concurrently=False))
+    return {"category": category, "service": service, "stylist": stylist, "idle": idle}
+
+def test_refresh_is_concurrent_by_default(db):
+    assert run(refresh_reports())["views"] == ["report_daily_service_stats"]
+
+def test_revenue(client, bookings):
+    params = {"date_from": day(7), "date_to": day(0)}
+    report = client.get("/api/reports/revenue", params=params).json()
+    assert report["total_revenue"] == 120.0
+    assert [(item["key"], item["completions"], item["revenue"]) for item in report["items"]] == [
+        (day(2), 1, 60.0),
+        (day(1), 1, 60.0),
+    ]
+    by_category = client.get("/api/reports/revenue", params={**params, "group_by": "category"}).json()["items"]
+    assert by_category == [{"key": bookings["category"]["id"], "name": "Hair", "completions": 2, "revenue": 120.0}]
+
+def test_cancellations(client, bookings):
+    params = {"date_from": day(7), "date_to": day(0), "group_by": "staff"}
+    items = client.get("/api/reports/cancellations", params=params).json()["items"]
+    assert items == [{
+        "key": bookings["stylist"]["id"], "name": "Busy", "bookings": 3, "cancellations": 1, "cancellation_rate": 33.33,
+    }]
+
+def test_utilization(client, bookings):
+    params = {"date_from": day(1), "date_to": day(0)}
+    items = client.get("/api/reports/utilization", params=params).json()["items"]
+    assert [(item["name"], item["appointments"], item["booked_minutes"]) for item in items] == [("Busy", 1, 60), ("Idle", 0, 0)]
+    assert items[0]["available_minutes"] == 960 and items[0]["utilization"] == 6.25
+    only = client.get("/api/reports/utilization", params={**params, "staff_id": bookings["idle"]["id"]}).json()["items"]
+    assert [item["name"] for item in only] == ["Idle"]
+
+def test_report_parameters_are_validated(client):
+    assert client.get("/api/reports/revenue", params={"group_by": "customer"}).status_code == 400
+    params = {"date_from": day(0), "date_to": day(1)}
+    for path in ("/api/reports/revenue", "/api/reports/cancellations", "/api/reports/utilization"):
+        assert client.get(path, params=params).status_code == 400
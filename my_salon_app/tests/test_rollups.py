@@ -0,0 +1,59 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from app.rollups import bucket_start, refresh_rollups, trend_range
+from tests.conftest import run
+
+@pytest.mark.parametrize("granularity, start", [("day", date(2024, 5, 16)), ("week", date(2024, 5, 13)), ("month", date(2024, 5, 1))])
+def test_bucket_start(granularity, start):
+    assert bucket_start(granularity, date(2024, 5, 16)) == start
+
+def test_default_trend_ranges():
+    today = date(2024, 5, 16)
+    assert trend_range("day", None, today) == (date(2024, 4, 17), today)
+    assert trend_range("week", None, today) == (date(2024, 2, 26), today)
+    assert trend_range("month", None, today) == (date(2023, 6, 1), today)
+    # An explicit start moves to the start of its bucket
+    assert trend_range("month", date(2024, 3, 20), today) == (date(2024, 3, 1), today)
+
+def day(days_ago: int) -> date:
+    return (datetime.now(timezone.utc) - timedelta(days=days_ago)).date()
+
+def test_trends_follow_refreshes(create, client):
+    customer = create.customer()
+    staff = create.staff()
+    service = create.service(price=60.0)
+    create.appointment(customer, service, status="completed", days=-1, staff_id=staff["id"])
+    create.appointment(customer, service, status="cancelled", days=-1)
+    completed = create.appointment(customer, service, status="completed", days=-3)
+    create.feedback(completed, rating=4)
+
+    params = {"date_from": day(7).isoformat(), "date_to": day(0).isoformat()}
+    # Writes only queue their days until the next refresh
+    assert client.get("/api/reports/trends", params=params).json()["items"] == []
+    report = run(refresh_rollups())
+    assert report["days"] == 2 and report["batches"] == 1
+
+    items = client.get("/api/reports/trends", params=params).json()["items"]
+    assert [(item["bucket"], item["bookings"], item["cancellations"], item["completions"]) for item in items] == [
+        (day(3).isoformat(), 1, 0, 1),
+        (day(1).isoformat(), 2, 1, 1),
+    ]
+    assert [item["revenue"] for item in items] == [60.0, 60.0]
+    assert (items[0]["rating_count"], items[0]["average_rating"]) == (1, 4.0)
+
+    monthly = client.get("/api/reports/trends", params={**params, "granularity": "month"}).json()["items"]
+    assert sum(item["bookings"] for item in monthly) == 3
+    staff_items = client.get(f"/api/reports/trends/staff/{staff['id']}", params=params).json()["items"]
+    assert [item["completions"] for item in staff_items] == [1]
+    service_items = client.get(f"/api/reports/trends/services/{service['id']}", params=params).json()["items"]
+    assert sum(item["bookings"] for item in service_items) == 3
+
+    # Nothing is left to refresh
+    assert run(refresh_rollups())["days"] == 0
+
+def test_trend_parameters_are_validated(client):
+    assert client.get("/api/reports/trends", params={"granularity": "hour"}).status_code == 400
+    params = {"date_from": "2024-05-02", "date_to": "2024-05-01"}
+    assert client.get("/api/reports/trends", params=params).status_code == 400
@@ -0,0 +1,38 @@
+import os
+
+import run
+
+def test_pool_budget_splits_connections_across_workers():
+    assert run.pool_budget(4, 100) == 25
+    assert run.pool_budget(3, 100) == 33
+    assert run.pool_budget(200, 100) == 1
+
+def test_default_workers_is_at_least_one():
+    assert run.default_workers() >= 1
+
+def test_production_mode_sizes_pools_per_worker(monkeypatch):
+    calls = []
+    monkeypatch.setattr(run.uvicorn, "run", lambda app, **kwargs: calls.append((app, kwargs)))
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    monkeypatch.setenv("DB_MAX_CONNECTIONS", "40")
+    for name in ("DB_POOL_SIZE", "DB_MAX_OVERFLOW"):
+        monkeypatch.delenv(name, raising=False)
+
+    run.run_production(8000)
+
+    (app, kwargs), = calls
+    assert app == "app.main:app"
+    assert kwargs["workers"] == 4
+    assert "reload" not in kwargs
+    assert os.environ["DB_POOL_SIZE"] == "10"
+    assert os.environ["DB_MAX_OVERFLOW"] == "0"
+
+def test_production_mode_keeps_explicit_pool_settings(monkeypatch):
+    monkeypatch.setattr(run.uvicorn, "run", lambda app, **kwargs: None)
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.delenv("DB_MAX_OVERFLOW", raising=False)
+
+    run.run_production(8000)
+
+    assert os.environ["DB_POOL_SIZE"] == "3"
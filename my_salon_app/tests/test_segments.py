@@ -0,0 +1,97 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.segments import SegmentIndex, is_segment, members, segment_index, to_bitmap
+
+def loaded_index(**bitmaps) -> SegmentIndex:
+    index = SegmentIndex()
+    index.loaded_at = datetime.now(timezone.utc)
+    for name, value in bitmaps.items():
+        setattr(index, name, value)
+    return index
+
+def test_bitmaps_round_trip():
+    assert to_bitmap([]) == 0
+    assert to_bitmap([0, 3, 9]) == 0b1000001001
+    assert members(to_bitmap([700, 5, 64, 5])) == [5, 64, 700]
+    assert members(0) == []
+
+@pytest.mark.parametrize("segment, valid", [("vip", True), ("lapsed", True), ("category:12", True), ("category:", False), ("gold", False)])
+def test_is_segment(segment, valid):
+    assert is_segment(segment) is valid
+
+def test_lapsed_customers_visited_but_not_recently():
+    index = loaded_index(customers=to_bitmap([1, 2, 3]), visited=to_bitmap([1, 2]), recent=to_bitmap([2]))
+    assert members(index.bitmap("lapsed")) == [1]
+    assert index.bitmap(None) == index.customers
+
+def test_customer_writes_and_visits_are_applied():
+    index = loaded_index()
+    index.apply([("service", (7, 4)), ("customer", (3, True)), ("customer", (5, False))])
+    index.apply([("visit", (5, 7, datetime.now(timezone.utc))), ("visit", (3, 7, datetime(2020, 1, 1)))])
+    assert members(index.bitmap("vip")) == [3]
+    assert members(index.bitmap("category:4")) == [3, 5]
+    assert members(index.bitmap("lapsed")) == [3]
+    # A downgraded customer leaves the VIP segment
+    index.apply([("customer", (3, False))])
+    assert index.bitmap("vip") == 0
+
+def test_deleted_customers_leave_every_segment():
+    index = loaded_index(
+        customers=to_bitmap([1, 2]), vip=to_bitmap([1, 2]), visited=to_bitmap([1, 2]),
+        recent=to_bitmap([1]), categories={4: to_bitmap([1, 2])},
+    )
+    index.apply([("delete", (1,))])
+    for segment in (None, "vip", "category:4"):
+        assert members(index.bitmap(segment)) == [2]
+    assert index.visited == index.bitmap("lapsed") == to_bitmap([2])
+
+def test_merged_customers_pass_their_visits_to_the_survivor():
+    index = loaded_index(
+        customers=to_bitmap([1, 2, 3]), vip=to_bitmap([2]), visited=to_bitmap([2, 3]),
+        recent=to_bitmap([3]), categories={4: to_bitmap([2]), 5: to_bitmap([3])},
+    )
+    index.apply([("merge", (1, (2, 3)))])
+    assert members(index.bitmap(None)) == [1]
+    # VIP status is the survivor's own
+    assert index.bitmap("vip") == 0
+    assert members(index.visited) == members(index.recent) == [1]
+    assert members(index.bitmap("category:4")) == members(index.bitmap("category:5")) == [1]
+
+def test_changes_during_a_rebuild_are_replayed():
+    index = SegmentIndex()
+    index._replay = []
+    index.apply([("customer", (9, True))])
+    assert index._replay == [("customer", (9, True))]
+    # Not loaded yet: the rebuild reads the change from the database
+    assert index.vip == 0
+
+def test_audience_follows_customer_writes(create, client):
+    vip = create.customer(type="vip")
+    standard = create.customer()
+    promotion = create.promotion(segment="vip")
+    audience = client.get(f"/api/promotions/{promotion['id']}/audience")
+    assert audience.status_code == 200
+    assert audience.json()["items"] == [vip["id"]]
+
+    client.put(f"/api/customers/{standard['id']}", json={"type": "vip"})
+    assert client.delete(f"/api/customers/{vip['id']}").status_code == 200
+    audience = client.get(f"/api/promotions/{promotion['id']}/audience", params={"customer_ids": [vip["id"], standard["id"]]})
+    assert audience.json() == {"segment": "vip", "items": [standard["id"]], "total": 1}
+
+def test_audience_of_an_unknown_promotion(client):
+    assert client.get("/api/promotions/999/audience").status_code == 404
+
+def test_rebuild_reads_segments_from_the_database(create, client):
+    from tests.conftest import run
+
+    customer = create.customer()
+    category = create.category()
+    service = create.service(category_id=category["id"])
+    create.appointment(customer, service, status="completed", days=-1)
+    segment_index.__init__()
+    report = run(segment_index.rebuild())
+    assert report["customers"] == 1 and report["segments"] == 4
+    assert members(segment_index.bitmap(f"category:{category['id']}")) == [customer["id"]]
+    assert segment_index.bitmap("lapsed") == 0
@@ -0,0 +1,58 @@
+import pytest
+
+from app.sentiment import score_text, score_texts, tokenize
+from app import sentiment_pipeline
+from app.sentiment_pipeline import configure_pool, score_comments, score_feedback, shutdown_pool
+from tests.conftest import run
+
+def test_tokenize_drops_apostrophes():
+    assert tokenize("Didn't LOVE it, ok?") == ["didnt", "love", "it", "ok"]
+
+@pytest.mark.parametrize("text", [None, "", "The appointment was on Tuesday"])
+def test_neutral_or_unknown_comments_score_zero(text):
+    assert score_text(text) == 0.0
+
+def test_scores_follow_valence_modifiers():
+    good = score_text("The stylist was good")
+    assert 0 < good < score_text("The stylist was very good") < score_text("The stylist was very good!!")
+    assert score_text("The stylist was not good") < 0 < score_text("The staff was not rude")
+    # Sentiment after "but" outweighs what came before it
+    assert score_text("Lovely room but rude staff") < 0 < score_text("Rude staff but lovely room")
+    assert all(-1 <= score <= 1 for score in score_texts(["worst worst worst!!!!", "best best best!!!!"]))
+
+def test_pool_size():
+    # One scoring process per API worker unless configured
+    assert sentiment_pipeline.SENTIMENT_WORKERS == 1
+    comments = ["great", "awful", None, "not good", "very relaxing"]
+    configure_pool(2)
+    try:
+        assert run(score_comments(comments)) == score_texts(comments)
+        assert sentiment_pipeline.get_pool()._max_workers == 2
+    finally:
+        configure_pool(sentiment_pipeline.SENTIMENT_WORKERS)
+    assert sentiment_pipeline._pool is None
+
+def test_unscored_feedback_is_scored_in_the_pool(create, client):
+    customer = create.customer()
+    service = create.service()
+    feedback = [
+        create.feedback(create.appointment(customer, service, days=-day), comments=comments)
+        for day, comments in ((1, "Excellent, relaxing massage"), (2, "Rude and late"), (3, None))
+    ]
+    supplied = create.feedback(create.appointment(customer, service, days=-4), comments="Awful")
+    assert client.put(f"/api/feedback/{supplied['id']}", json={"sentiment_score": 0.5}).status_code == 200
+    try:
+        report = run(score_feedback(batch_size=1))
+        assert report["scored"] == report["written"] == 2 and report["batches"] == 2
+        scores = [client.get(f"/api/feedback/{item['id']}").json()["sentiment_score"] for item in feedback]
+        assert scores[0] > 0 > scores[1] and scores[2] is None
+        # Scores set by clients are kept
+        assert client.get(f"/api/feedback/{supplied['id']}").json()["sentiment_score"] == 0.5
+
+        # An edited comment loses its score and is scored again
+        client.put(f"/api/feedback/{feedback[0]['id']}", json={"comments": "Terrible haircut"})
+        assert client.get(f"/api/feedback/{feedback[0]['id']}").json()["sentiment_score"] is None
+        assert run(score_feedback())["written"] == 1
+        assert client.get(f"/api/feedback/{feedback[0]['id']}").json()["sentiment_score"] < 0
+    finally:
+        shutdown_pool()
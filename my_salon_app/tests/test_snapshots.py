@@ -0,0 +1,88 @@
+import os
+import re
+import time
+
+import psycopg2
+import pyarrow.parquet as pq
+import pytest
+
+from app import sentiment_pipeline, snapshots
+from app.snapshots import EXPORT_LOCK_KEY, SnapshotExportRunning, export_snapshots, read_watermarks
+from tests.conftest import TEST_DATABASE_URL, run
+
+@pytest.fixture
+def no_lag(monkeypatch):
+    monkeypatch.setattr(snapshots, "SNAPSHOT_SAFETY_LAG_SECONDS", 0)
+
+def exported_rows(output_dir) -> int:
+    return run(export_snapshots(["feedback"], output_dir=str(output_dir)))["tables"]["feedback"]["rows"]
+
+def test_incremental_export_picks_up_edited_feedback(create, client, no_lag, tmp_path):
+    feedback = create.feedback(create.appointment(create.customer(), create.service(), status="completed"))
+    assert exported_rows(tmp_path) == 1
+    assert "feedback" in read_watermarks(str(tmp_path))
+    assert exported_rows(tmp_path) == 0
+
+    response = client.put(f"/api/feedback/{feedback['id']}", json={"comments": "Even better the second time"})
+    assert response.status_code == 200, response.text
+    assert exported_rows(tmp_path) == 1
+
+def test_sentiment_scores_advance_the_watermark(create, no_lag, tmp_path):
+    create.feedback(create.appointment(create.customer(), create.service(), status="completed"), comments="Lovely")
+    assert exported_rows(tmp_path) == 1
+
+    try:
+        assert run(sentiment_pipeline.score_feedback())["written"] == 1
+    finally:
+        sentiment_pipeline.shutdown_pool()
+    assert exported_rows(tmp_path) == 1
+
+def test_full_export_rewrites_the_table(create, no_lag, tmp_path):
+    create.feedback(create.appointment(create.customer(), create.service(), status="completed"))
+    exported_rows(tmp_path)
+    report = run(export_snapshots(["feedback"], output_dir=str(tmp_path), full=True))
+    assert report["tables"]["feedback"]["rows"] == 1
+    assert pq.read_table(tmp_path / "feedback").num_rows == 1
+
+def test_unknown_snapshot_table_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="bookings"):
+        run(export_snapshots(["bookings"], output_dir=str(tmp_path)))
+
+def test_file_names_are_unique_per_run(create, no_lag, tmp_path):
+    create.feedback(create.appointment(create.customer(), create.service(), status="completed"))
+    run(export_snapshots(["feedback"], output_dir=str(tmp_path)))
+    run(export_snapshots(["feedback"], output_dir=str(tmp_path), full=True))
+    names = [name for _, _, files in os.walk(tmp_path / "feedback") for name in files]
+    assert len(names) == 1
+    assert re.fullmatch(r"part-\d{8}T\d{6}-[0-9a-f]{32}-00000\.parquet", names[0])
+
+@pytest.fixture
+def export_lock_held(db):
+    """The export lock, held by another process."""
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (EXPORT_LOCK_KEY,))
+    yield conn
+    conn.close()
+
+def test_exports_never_run_concurrently(export_lock_held, tmp_path):
+    with pytest.raises(SnapshotExportRunning):
+        run(export_snapshots(["feedback"], output_dir=str(tmp_path)))
+    assert not os.path.exists(tmp_path / "_watermarks.json")
+
+def test_export_endpoint(client, export_lock_held, tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", str(tmp_path))
+    assert client.post("/api/admin/snapshots", params={"tables": "bookings"}).status_code == 400
+    assert client.post("/api/admin/snapshots", params={"tables": "feedback"}).status_code == 409
+
+    export_lock_held.close()
+    response = client.post("/api/admin/snapshots", params={"tables": "feedback"})
+    assert response.status_code == 202, response.text
+    deadline = time.monotonic() + 10
+    while (status := client.get("/api/admin/snapshots").json())["running"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert status["last_error"] is None and status["last_report"]["tables"]["feedback"]["rows"] == 0
+    assert "feedback" in status["watermarks"]
+    # The runner released the lock
+    assert run(export_snapshots(["feedback"], output_dir=str(tmp_path)))["tables"]["feedback"]["rows"] == 0
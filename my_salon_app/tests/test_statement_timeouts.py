@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.database import get_db_with_timeout, is_statement_timeout
+from app.main import app
+from app.middleware import CancelOnDisconnectMiddleware
+
+class QueryCanceled(Exception):
+    sqlstate = "57014"
+
+async def first_session(dependency):
+    async for session in dependency():
+        return session
+
+def test_route_timeout_can_be_overridden_per_route(monkeypatch):
+    monkeypatch.setenv("STATEMENT_TIMEOUT_SLOW_ROUTE_MS", "50")
+    session = asyncio.run(first_session(get_db_with_timeout("slow_route", 5000)))
+    assert session.info["statement_timeout_ms"] == 50
+
+    session = asyncio.run(first_session(get_db_with_timeout("other_route", 5000)))
+    assert session.info["statement_timeout_ms"] == 5000
+
+def test_statement_timeout_cancels_slow_query(db):
+    async def slow_query():
+        async for session in get_db_with_timeout("slow_route", 100)():
+            with pytest.raises(DBAPIError) as info:
+                await session.execute(text("SELECT pg_sleep(5)"))
+            return info.value
+
+    assert is_statement_timeout(asyncio.run(slow_query()))
+
+def test_statement_timeout_becomes_504():
+    handler = app.exception_handlers[DBAPIError]
+    response = asyncio.run(handler(None, DBAPIError("SELECT 1", {}, QueryCanceled())))
+    assert response.status_code == 504
+
+    with pytest.raises(DBAPIError):
+        asyncio.run(handler(None, DBAPIError("SELECT 1", {}, Exception("connection refused"))))
+
+def test_client_disconnect_cancels_handler():
+    async def scenario():
+        cancelled = asyncio.Event()
+
+        async def slow_handler(scope, receive, send):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def receive():
+            await asyncio.sleep(0.05)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            pass
+
+        await asyncio.wait_for(CancelOnDisconnectMiddleware(slow_handler)({"type": "http"}, receive, send), 1)
+        return cancelled.is_set()
+
+    assert asyncio.run(scenario())
+
+def test_completed_response_is_not_cancelled():
+    async def scenario():
+        sent = []
+
+        async def handler(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        async def receive():
+            await asyncio.Event().wait()
+
+        async def send(message):
+            sent.append(message["type"])
+
+        await asyncio.wait_for(CancelOnDisconnectMiddleware(handler)({"type": "http"}, receive, send), 1)
+        return sent
+
+    assert asyncio.run(scenario()) == ["http.response.start", "http.response.body"]
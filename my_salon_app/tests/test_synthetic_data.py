@@ -0,0 +1,70 @@
+import argparse
+
+from sqlalchemy import text
+
+from app import database
+from generate_synthetic_data import TABLES, SyntheticData, generate, skewed_weights
+from tests.conftest import run
+
+def make_args(**overrides) -> argparse.Namespace:
+    args = dict(
+        customers=200, staff=10, services=20, appointments=1000, promotions=10, kb=30, days=60,
+        feedback_rate=0.3, duplicate_rate=0.05, chunk_size=300, seed=42, fixed_now=True, truncate=True,
+    )
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+def generate_all(data: SyntheticData) -> dict:
+    rows = {
+        "service_categories": list(data.service_categories_rows()),
+        "services": list(data.services_rows()),
+        "staff": list(data.staff_rows()),
+        "customers": list(data.customers_rows()),
+        "promotions": list(data.promotions_rows()),
+        "knowledge_base": list(data.knowledge_base_rows()),
+        "appointments": [],
+        "feedback": [],
+    }
+    for appointments, feedback in data.appointments_chunks():
+        rows["appointments"] += appointments
+        rows["feedback"] += feedback
+    return rows
+
+def test_skewed_weights_favor_the_first_entities():
+    weights = skewed_weights(100, 0.9)
+    assert len(weights) == 100
+    assert weights == sorted(weights)
+    assert weights[9] > weights[-1] / 2
+
+def test_generation_is_deterministic():
+    assert generate_all(SyntheticData(make_args())) == generate_all(SyntheticData(make_args()))
+    assert generate_all(SyntheticData(make_args(seed=7)))["customers"] != generate_all(SyntheticData(make_args()))["customers"]
+
+def test_rows_match_their_columns_and_references():
+    args = make_args()
+    rows = generate_all(SyntheticData(args))
+    for table, columns in TABLES.items():
+        assert all(len(row) == len(columns) for row in rows[table]), table
+    assert len(rows["appointments"]) == args.appointments
+    appointments = {row[0]: row for row in rows["appointments"]}
+    for feedback in rows["feedback"]:
+        appointment = appointments[feedback[1]]
+        assert appointment[5] == "COMPLETED" and appointment[1] == feedback[2]
+    # Some customers are entered twice with another phone format
+    assert any(row[2].startswith("(") for row in rows["customers"])
+
+def test_generated_data_loads(db, client):
+    run(generate(make_args()))
+
+    async def counts():
+        async with database.get_engine().connect() as conn:
+            return {table: (await conn.execute(text(f"SELECT count(*) FROM {table}"))).scalar() for table in TABLES}
+
+    loaded = run(counts())
+    assert loaded["appointments"] == 1000
+    assert loaded["customers"] == 200
+    assert client.get("/api/customers").json()["total"] == 200
+    # Sequences were moved past the generated ids
+    response = client.post("/api/customers", json={"name": "New Customer", "phone": "+19990000000"})
+    assert response.status_code == 200, response.text
+    assert response.json()["id"] == 201